@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Import old snapshots of 'data/' into the price history
+
+Crawls were saved as 'discounted_to_json-YYYY-MM-DD.json' and as sqlite files
+with a 'deals' table. Older files have euro floats, newer ones integer cents.
+The unit is never guessed per value: a json file with a float price is all
+euros, a 'deals' table with INTEGER columns all cents and one with REAL
+columns all euros.
+'backfill' finds these files, parses them in worker processes into 'Product'
+rows with prices in cents and writes them into one 'PriceHistory'.
+
+Imported files are recorded by the sha256 of their content in the table
+'imported_files', so running it again only imports new or changed files.
+
+    python rewe_dl/backfill.py [data/] [--history data/price_history.sqlite3] [--workers 4]
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import glob
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import argparse
+from typing import Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+import codec
+from formatter import euros_to_cents
+from constants import PRODUCT_FIELDS, Product
+from history import DATA_FOLDER, PriceHistory, day
+
+log = logging.getLogger(__name__)
+
+# the market of the examples - old snapshots have no store id
+DEFAULT_STORE_ID = "8534540"
+
+PATTERNS = ("*.json", "*.jsonl", "*.sqlite3")
+
+DATE_IN_NAME = re.compile(r"(\d{4}-\d{2}-\d{2})")
+
+CREATE_IMPORTED_FILES = """
+CREATE TABLE IF NOT EXISTS imported_files (
+sha256 TEXT PRIMARY KEY,
+path TEXT,
+rows INTEGER,
+imported TEXT
+);
+"""
+
+PRICE_FIELDS = ("price", "old_price", "saved")
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def to_cents(value, cents: bool = False) -> int | None:
+    """cents of a price in euros - or already in 'cents'"""
+    if value is None or value == "":
+        return None
+    if cents:
+        return int(round(float(value)))
+
+    return euros_to_cents(value)
+
+
+def normalize(md: dict, cents: bool = False) -> tuple:
+    """'Product' row of an old product dict - prices in cents, 'cents' the unit of its file"""
+    values = {field: md.get(field) for field in PRODUCT_FIELDS}
+    price, old_price, saved = (to_cents(values[field], cents) for field in PRICE_FIELDS)
+
+    old_price = old_price or price
+    if saved is None and price is not None:
+        saved = old_price - price
+
+    values.update(product_id=str(values["product_id"]), price=price, old_price=old_price, saved=saved)
+
+    return tuple(values[field] for field in PRODUCT_FIELDS)
+
+
+def _in_cents(records: list[dict]) -> bool:
+    """json keeps the type - the old parser saved euro floats, 'save_to_json' saves int cents"""
+    for md in records:
+        for field in PRICE_FIELDS:
+            value = md.get(field)
+            if isinstance(value, float) or (isinstance(value, str) and "." in value):
+                return False
+
+    return True
+
+
+def _json_records(text: str) -> Iterator[dict]:
+    """the products of a json array, of json lines or of concatenated objects ('save_to_json')"""
+    try:
+        data = codec.loads(text)
+    except ValueError:
+        decoder, idx = json.JSONDecoder(), 0
+        while True:
+            while idx < len(text) and text[idx].isspace():
+                idx += 1
+            if idx == len(text):
+                return
+
+            item, idx = decoder.raw_decode(text, idx)
+            yield from item if isinstance(item, list) else [item]
+    else:
+        yield from data if isinstance(data, list) else [data]
+
+
+def _date_of_file(path: str) -> str:
+    """the date in the file name - else the day it was last modified"""
+    found = DATE_IN_NAME.search(os.path.basename(path))
+    if found:
+        return found.group(1)
+
+    return time.strftime("%Y-%m-%d", time.localtime(os.path.getmtime(path)))
+
+
+def read_json(path: str) -> dict[str, list[tuple]]:
+    with open(path, encoding="utf-8") as fp:
+        records = [md for md in _json_records(fp.read()) if isinstance(md, dict) and md.get("product_id")]
+
+    cents = _in_cents(records)
+
+    return {_date_of_file(path): [normalize(md, cents) for md in records]} if records else {}
+
+
+def read_sqlite(path: str) -> dict[str, list[tuple]]:
+    connector = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'deals'"
+        if not connector.execute(query).fetchone():
+            return {}
+
+        types = {row[1]: row[2].upper() for row in connector.execute("PRAGMA table_info(deals)")}
+        columns = list(types)
+        # REAL columns are euros - decided by the schema, not the values
+        cents = not any(types.get(field) == "REAL" for field in PRICE_FIELDS)
+
+        by_date = {}
+        for row in connector.execute("SELECT * FROM deals"):
+            md = dict(zip(columns, row))
+            date = day(md.get("date") or md.get("time") or _date_of_file(path))
+            by_date.setdefault(date, []).append(normalize(md, cents))
+    finally:
+        connector.close()
+
+    return by_date
+
+
+def read_file(path: str) -> dict[str, list[tuple]]:
+    """the 'Product' rows of a snapshot by day - runs in the workers"""
+    if path.endswith(".sqlite3"):
+        return read_sqlite(path)
+
+    return read_json(path)
+
+
+def discover(folder: str = DATA_FOLDER, exclude: tuple = ()) -> list[str]:
+    """the snapshot files of 'folder', oldest name first"""
+    exclude = {os.path.abspath(path) for path in exclude}
+    paths = set()
+
+    for pattern in PATTERNS:
+        paths.update(glob.glob(os.path.join(folder, pattern)))
+
+    return sorted(path for path in paths if os.path.abspath(path) not in exclude)
+
+
+def backfill(
+    folder: str = DATA_FOLDER,
+    history: str = None,
+    store_id: str = DEFAULT_STORE_ID,
+    max_workers: int = None,
+) -> dict:
+    """import the snapshots of 'folder' into the price history 'history' - files, rows and skipped files
+
+    Files without products (e.g. the response cache) are recorded as imported with 0 rows.
+    """
+    stats = {"files": 0, "skipped": 0, "rows": 0, "inserted": 0, "updated": 0}
+
+    with PriceHistory(history) as price_history:
+        connector = price_history.connector
+        with connector:
+            connector.execute(CREATE_IMPORTED_FILES)
+
+        # the history itself and its WAL files are in 'folder' too
+        paths = discover(folder, exclude=(price_history.path,))
+        imported = {row[0] for row in connector.execute("SELECT sha256 FROM imported_files")}
+
+        # path -> hash, copies of a file are imported once
+        todo = {}
+        for path in paths:
+            sha256 = file_hash(path)
+            if sha256 in imported:
+                stats["skipped"] += 1
+            else:
+                todo[path] = sha256
+                imported.add(sha256)
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for path, by_date in zip(todo, executor.map(read_file, todo)):
+                rows = 0
+                for date, products in by_date.items():
+                    written = price_history.write((Product(*row) for row in products), store_id, date)
+                    stats["inserted"] += written["inserted"]
+                    stats["updated"] += written["updated"]
+                    rows += len(products)
+
+                # only after its rows - an interrupted import is done again, the upsert keeps it idempotent
+                with connector:
+                    connector.execute(
+                        "INSERT OR REPLACE INTO imported_files VALUES (?, ?, ?, ?)",
+                        (todo[path], os.path.basename(path), rows, time.strftime("%Y-%m-%d %H:%M:%S")),
+                    )
+
+                log.info(f"Imported {rows} rows of {path}")
+                stats["files"] += 1
+                stats["rows"] += rows
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", nargs="?", default=DATA_FOLDER)
+    parser.add_argument("--history", default=None, help="default 'data/price_history.sqlite3'")
+    parser.add_argument("--store-id", default=DEFAULT_STORE_ID)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    start = time.perf_counter()
+    stats = backfill(args.folder, args.history, args.store_id, args.workers)
+    print(f"{stats} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
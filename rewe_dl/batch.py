@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Columnar batches of parsed products
+
+A 'ProductBatch' keeps one column per field instead of one object per product:
+prices are contiguous 'array("q")' of cents, repeating strings (product, brand,
+picture) are dictionary encoded - an 'array("i")' of codes into a list of the
+distinct values. Numeric columns and codes are shared with numpy and arrow
+without a copy when those are installed.
+
+    batch = Parser().parse_batch(search_result)
+    batch = batch.select(batch.to_numpy()["saved"] >= 100).sort_by("saved", reverse=True)
+    table = batch.to_arrow()
+
+While numpy arrays or arrow tables of a batch are alive, it can not grow.
+"""
+
+from __future__ import annotations
+
+import logging
+from array import array
+from operator import sub
+from itertools import compress
+from typing import Any, Callable, Iterable, Iterator
+
+from extract import extract_search_result
+from constants import Product
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+log = logging.getLogger(__name__)
+
+# integer cents
+NUMERIC_COLUMNS = ("price", "old_price", "saved")
+# dictionary encoded
+DICTIONARY_COLUMNS = ("product", "brand", "picture")
+# mostly unique - plain lists
+STRING_COLUMNS = ("product_id", "nan")
+
+COLUMNS = ("product", "product_id", "nan", "brand", "price", "old_price", "saved", "picture")
+
+
+class DictionaryColumn:
+    """codes into the distinct values in order of appearance"""
+
+    __slots__ = ("codes", "_index", "_values")
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.codes = array("i")
+        self._index = {}
+        self._values = None
+
+        self.extend(values)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, idx: int) -> str:
+        return self.values[self.codes[idx]]
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self.values.__getitem__, self.codes)
+
+    @property
+    def values(self) -> list[str]:
+        """the dictionary - distinct values, 'codes' index into it"""
+        if self._values is None:
+            self._values = list(self._index)
+
+        return self._values
+
+    def extend(self, values: Iterable[str]) -> None:
+        index = self._index
+        setdefault = index.setdefault
+
+        self.codes.extend([setdefault(value, len(index)) for value in values])
+        self._values = None
+
+    def take(self, indices: Iterable[int]) -> DictionaryColumn:
+        """the rows at 'indices' - with the same dictionary"""
+        column = DictionaryColumn()
+        column.codes = array("i", map(self.codes.__getitem__, indices))
+        column._index = dict(self._index)
+
+        return column
+
+
+class ProductBatch:
+    def __init__(self):
+        self.price = array("q")
+        self.old_price = array("q")
+        self.saved = array("q")
+
+        self.product = DictionaryColumn()
+        self.brand = DictionaryColumn()
+        self.picture = DictionaryColumn()
+
+        self.product_id = []
+        self.nan = []
+
+    def __repr__(self):
+        return f"ProductBatch({len(self)} products)"
+
+    def __len__(self):
+        return len(self.price)
+
+    def __getitem__(self, idx: int) -> Product:
+        return Product(
+            "rewe.de",
+            self.product[idx],
+            f"https://rewe.de/produkte/{self.nan[idx]}",
+            self.product_id[idx],
+            self.price[idx],
+            self.old_price[idx],
+            self.saved[idx],
+            self.brand[idx],
+            self.picture[idx],
+        )
+
+    def __iter__(self) -> Iterator[Product]:
+        """a 'Product' per row - only for output, the batch itself stays columnar"""
+        return map(self.__getitem__, range(len(self)))
+
+    @classmethod
+    def from_products(
+        cls, products: Iterable[dict], extract: Callable[[dict], tuple] = extract_search_result
+    ) -> ProductBatch:
+        return cls().extend(products, extract)
+
+    def extend(
+        self, products: Iterable[dict], extract: Callable[[dict], tuple] = extract_search_result
+    ) -> ProductBatch:
+        """append raw API products - 'extract' returns the fields in the order of 'SEARCH_RESULT_FIELDS'"""
+        rows = [extract(product) for product in products]
+        if not rows:
+            return self
+
+        product, product_id, nan, brand, old_price, price, picture = zip(*rows)
+
+        self.price.extend(price)
+        # no 'regularPrice' - not discounted
+        old_price = array("q", [old or new for old, new in zip(old_price, price)])
+        self.old_price.extend(old_price)
+        self.saved.extend(map(sub, old_price, price))
+
+        self.product.extend(product)
+        self.brand.extend(brand)
+        self.picture.extend(picture)
+        self.product_id.extend(product_id)
+        self.nan.extend(nan)
+
+        return self
+
+    def column(self, name: str) -> array | DictionaryColumn | list:
+        if name not in COLUMNS:
+            raise KeyError(name)
+
+        return getattr(self, name)
+
+    def take(self, indices: Iterable[int]) -> ProductBatch:
+        """a new batch of the rows at 'indices' in that order"""
+        indices = list(indices)
+
+        batch = ProductBatch()
+        for name in NUMERIC_COLUMNS:
+            setattr(batch, name, array("q", map(getattr(self, name).__getitem__, indices)))
+        for name in DICTIONARY_COLUMNS:
+            setattr(batch, name, getattr(self, name).take(indices))
+        for name in STRING_COLUMNS:
+            setattr(batch, name, list(map(getattr(self, name).__getitem__, indices)))
+
+        return batch
+
+    def select(self, mask: Iterable[bool]) -> ProductBatch:
+        """the rows where 'mask' is true - a list of bools or a numpy bool array"""
+        if numpy is not None and isinstance(mask, numpy.ndarray):
+            return self.take(numpy.flatnonzero(mask).tolist())
+
+        return self.take(compress(range(len(self)), mask))
+
+    def discounted(self) -> ProductBatch:
+        """the rows with 'saved' above zero"""
+        return self.select(map((0).__lt__, self.saved))
+
+    def argsort(self, name: str, reverse: bool = False) -> list[int]:
+        """stable order of the rows by column 'name'"""
+        column = self.column(name)
+
+        if numpy is not None and name in NUMERIC_COLUMNS:
+            values = numpy.frombuffer(column, dtype=numpy.int64)
+            return numpy.argsort(-values if reverse else values, kind="stable").tolist()
+
+        return sorted(range(len(self)), key=column.__getitem__, reverse=reverse)
+
+    def sort_by(self, name: str = "saved", reverse: bool = False) -> ProductBatch:
+        return self.take(self.argsort(name, reverse=reverse))
+
+    def to_numpy(self) -> dict[str, Any]:
+        """numeric columns and the codes of dictionary columns without a copy
+
+        the dictionaries are under '<name>_values', 'product_id' and 'nan' are object arrays
+        """
+        if numpy is None:
+            raise ImportError("'to_numpy' needs numpy - pip install numpy")
+
+        arrays = {}
+        for name in NUMERIC_COLUMNS:
+            arrays[name] = numpy.frombuffer(getattr(self, name), dtype=numpy.int64)
+        for name in DICTIONARY_COLUMNS:
+            column = getattr(self, name)
+            arrays[name] = numpy.frombuffer(column.codes, dtype=numpy.int32)
+            arrays[f"{name}_values"] = numpy.array(column.values, dtype=object)
+        for name in STRING_COLUMNS:
+            arrays[name] = numpy.array(getattr(self, name), dtype=object)
+
+        return arrays
+
+    def to_arrow(self) -> pyarrow.Table:
+        """a table in the order of 'COLUMNS' - numeric buffers and codes are not copied"""
+        if pyarrow is None:
+            raise ImportError("'to_arrow' needs pyarrow - pip install pyarrow")
+
+        length = len(self)
+
+        def from_buffer(data: array, type_):
+            return pyarrow.Array.from_buffers(type_, length, [None, pyarrow.py_buffer(data)])
+
+        arrays = []
+        for name in COLUMNS:
+            column = getattr(self, name)
+
+            if name in NUMERIC_COLUMNS:
+                arrays.append(from_buffer(column, pyarrow.int64()))
+            elif name in DICTIONARY_COLUMNS:
+                codes = from_buffer(column.codes, pyarrow.int32())
+                arrays.append(pyarrow.DictionaryArray.from_arrays(codes, pyarrow.array(column.values)))
+            else:
+                arrays.append(pyarrow.array(column, type=pyarrow.string()))
+
+        return pyarrow.Table.from_arrays(arrays, names=list(COLUMNS))
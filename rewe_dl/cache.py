@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Caching for STORE and friends
+
+ResponseCache - persistent HTTP response cache
+    Responses of GET requests are stored in a sqlite3 file under 'data/'.
+    Entries expire after a TTL per endpoint, the least recently used ones are
+    evicted when the cache grows above 'max_size' and expired entries with an
+    'ETag' or 'Last-Modified' header are revalidated with a conditional request.
+
+        set_cache(ResponseCache(ttls={"/suggestions": 24 * 3600}))
+
+memoize - bounded, TTL-aware memoization of methods
+    Keyed on the store_id of the instance plus the arguments, so 'self' is not
+    kept alive. Generators are cached page by page and every call gets a new one.
+
+        @memoize(maxsize=64, ttl=600)
+        def search(self, search_term): ...
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import types
+import sqlite3
+import hashlib
+import inspect
+import logging
+import threading
+from typing import Callable, NamedTuple
+from functools import wraps
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl
+
+import httpx
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FOLDER = os.path.join(os.path.dirname(PROJECT_DIR), "data")
+
+log = logging.getLogger(__name__)
+
+# first matching part of the url path wins - prices change, markets and suggestions rarely do
+DEFAULT_TTLS = {
+    "/product-tiles": 15 * 60,
+    "/products": 60 * 60,
+    "/suggestions": 24 * 60 * 60,
+    "/userdata": 60 * 60,
+    "/marketselection": 7 * 24 * 60 * 60,
+}
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str = None,
+        ttl: float = 60 * 60,
+        ttls: dict[str, float] = None,
+        max_size: int = 256 * 1024 * 1024,
+    ):
+        """'ttl' is used for urls not matching any key of 'ttls',
+        'max_size' is the upper bound of all stored bodies in bytes
+        """
+        self.path = str(path or os.path.join(DATA_FOLDER, "http_cache.sqlite3"))
+        self.ttl = float(ttl)
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.max_size = int(max_size)
+
+        self.hits = self.misses = self.revalidated = 0
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            url TEXT,
+            body BLOB,
+            content_type TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            expires REAL,
+            accessed REAL,
+            size INTEGER
+            )
+            """
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._connection.commit()
+
+    def __repr__(self):
+        return f"ResponseCache({self.path!r})"
+
+    @staticmethod
+    def key(method: str, url: str, params: dict | str | None = None, store_id: str = None) -> str:
+        """same request - same key, independent of the order of params
+        and if they are part of 'url' or passed separately
+        """
+        parts = urlsplit(url)
+
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if isinstance(params, str):
+            query += parse_qsl(params, keep_blank_values=True)
+        elif params:
+            query += [(str(k), str(v)) for k, v in params.items()]
+
+        normalized = json.dumps(
+            [method.upper(), f"{parts.scheme}://{parts.netloc}{parts.path}", sorted(query), store_id],
+            separators=(",", ":"),
+        )
+
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def ttl_for(self, url: str) -> float:
+        path = urlsplit(url).path
+        for part, ttl in self.ttls.items():
+            if part in path:
+                return float(ttl)
+
+        return self.ttl
+
+    def fetch(
+        self,
+        url: str,
+        params: dict | str | None,
+        send: Callable[[dict], httpx.Response],
+        store_id: str = None,
+    ) -> httpx.Response:
+        """return a cached response for 'url' and 'params'
+        'send(headers)' is only called when the network is needed
+        """
+        key = self.key("get", url, params, store_id)
+        entry = self._get(key)
+        now = time.time()
+
+        if entry and entry["expires"] > now:
+            self.hits += 1
+            self._touch(key, now)
+            return self._response(entry, url)
+
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = send(headers)
+
+        if entry and response.status_code == 304:
+            self.revalidated += 1
+            self._touch(key, now, expires=now + self.ttl_for(url))
+            return self._response(entry, url)
+
+        self.misses += 1
+        if response.status_code == 200:
+            self.put(key, url, response)
+
+        return response
+
+    def put(self, key: str, url: str, response: httpx.Response) -> None:
+        now = time.time()
+        body = response.content
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    url,
+                    body,
+                    response.headers.get("content-type", "application/json"),
+                    response.headers.get("etag"),
+                    response.headers.get("last-modified"),
+                    now + self.ttl_for(url),
+                    now,
+                    len(body),
+                ),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        """delete least recently used entries till the cache fits 'max_size'"""
+        (total,) = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_size:
+            return
+
+        rows = self._connection.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            evicted.append((key,))
+            total -= size
+
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        log.debug(f"Evicted {len(evicted)} cached responses")
+
+    def _get(self, key: str) -> dict | None:
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT body, content_type, etag, last_modified, expires FROM responses WHERE key = ?",
+                (key,),
+            )
+            row = cursor.fetchone()
+
+        if not row:
+            return None
+
+        return dict(zip(("body", "content_type", "etag", "last_modified", "expires"), row))
+
+    def _touch(self, key: str, now: float, expires: float = None) -> None:
+        with self._lock:
+            if expires:
+                self._connection.execute(
+                    "UPDATE responses SET accessed = ?, expires = ? WHERE key = ?", (now, expires, key)
+                )
+            else:
+                self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+
+    @staticmethod
+    def _response(entry: dict, url: str) -> httpx.Response:
+        headers = {"content-type": entry["content_type"], "x-rewe-dl-cache": "hit"}
+        if entry["etag"]:
+            headers["etag"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["last-modified"] = entry["last_modified"]
+
+        return httpx.Response(200, content=entry["body"], headers=headers, request=httpx.Request("GET", url))
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "entries": entries,
+            "size": size,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+_cache = None
+
+
+def set_cache(cache: ResponseCache = None, **kwargs) -> ResponseCache:
+    """enable the response cache for every GET request of 'STORE'
+    'kwargs' are passed to a new 'ResponseCache' if 'cache' is not given
+    """
+    global _cache
+
+    _cache = cache if cache is not None else ResponseCache(**kwargs)
+
+    return _cache
+
+
+def disable_cache() -> None:
+    global _cache
+
+    _cache = None
+
+
+def get_cache() -> ResponseCache | None:
+    """return the response cache - None if caching is disabled (the default)"""
+    return _cache
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+def _store_id(obj) -> str | None:
+    """'STORE_ID' of a STORE-like object or of its 'STORE' attribute"""
+    store_id = getattr(obj, "STORE_ID", None)
+    if store_id is None:
+        store_id = getattr(getattr(obj, "STORE", None), "STORE_ID", None)
+
+    return store_id
+
+
+def memoize(maxsize: int = 128, ttl: float | None = 600):
+    """cache results of a function or method for 'ttl' seconds ('None' - forever),
+    at most 'maxsize' results, least recently used ones are dropped first.
+
+    The wrapped function gets 'cache_info()' and 'cache_clear()' like 'functools.lru_cache'.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters)
+        is_method = bool(parameters) and parameters[0] == "self"
+
+        lock = threading.Lock()
+        entries = OrderedDict()
+        stats = {"hits": 0, "misses": 0}
+
+        def make_key(args, kwargs):
+            if is_method:
+                # bind positional arguments to their names - search("ja") == search(search_term="ja")
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = dict(bound.arguments)
+                instance = arguments.pop("self")
+
+                return (_store_id(instance), tuple(arguments.items()))
+
+            return (None, args, tuple(sorted(kwargs.items())))
+
+        def lookup(key):
+            with lock:
+                entry = entries.get(key)
+                if entry is None:
+                    return None
+
+                expires, value, is_generator = entry
+                if expires is not None and expires <= time.monotonic():
+                    del entries[key]
+                    return None
+
+                entries.move_to_end(key)
+                stats["hits"] += 1
+
+                return (value, is_generator)
+
+        def store(key, value, is_generator=False):
+            expires = time.monotonic() + ttl if ttl is not None else None
+            with lock:
+                entries[key] = (expires, value, is_generator)
+                entries.move_to_end(key)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+
+        def recording(key, generator):
+            """yield from 'generator', cache all items once it is exhausted"""
+            items = []
+            for item in generator:
+                items.append(item)
+                yield item
+
+            store(key, items, is_generator=True)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = make_key(args, kwargs)
+                hash(key)
+            except TypeError:
+                # unhashable arguments - nothing to cache
+                return func(*args, **kwargs)
+
+            cached = lookup(key)
+            if cached is not None:
+                value, is_generator = cached
+                return (item for item in value) if is_generator else value
+
+            with lock:
+                stats["misses"] += 1
+
+            result = func(*args, **kwargs)
+            if isinstance(result, types.GeneratorType):
+                return recording(key, result)
+
+            store(key, result)
+
+            return result
+
+        def cache_info() -> CacheInfo:
+            with lock:
+                return CacheInfo(stats["hits"], stats["misses"], maxsize, len(entries))
+
+        def cache_clear() -> None:
+            with lock:
+                entries.clear()
+                stats.update(hits=0, misses=0)
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Category hierarchy of a store
+
+The "category" facet of a search page is a tree of constraints:
+{"name": ..., "slug": ..., "count": ..., "subFacetConstraints": [...]}.
+'CategoryTree' is built from it in one pass and keeps every category by slug
+and by name with its parent, children and product count.
+
+    tree = CategoryTree.from_search_result(pages)
+    tree["obst-gemuese"].children       # ['obst', 'gemuese']
+    tree.leaf_slugs()                   # crawl these - every product once
+
+Trees are saved per store as json under 'data/' and loaded while younger than the TTL.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import logging
+from typing import Iterable, Iterator
+from dataclasses import field, asdict, dataclass
+
+import codec
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FOLDER = os.path.join(os.path.dirname(PROJECT_DIR), "data")
+
+log = logging.getLogger(__name__)
+
+SUB = "subFacetConstraints"
+
+
+@dataclass
+class Category:
+    slug: str
+    name: str
+    count: int = 0
+    parent: str | None = None
+    children: list[str] = field(default_factory=list)
+    # the constraint without its sub constraints - as returned by 'STORE.categories'
+    data: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def is_leaf(self) -> bool:
+        return not self.children
+
+
+class CategoryTree:
+    def __init__(self, store_id: str = None):
+        self.store_id = store_id
+        self.created = time.time()
+
+        self.roots = []
+        self.by_slug = {}
+        self.by_name = {}
+
+    def __repr__(self):
+        return f"CategoryTree(store_id={self.store_id}, categories={len(self)})"
+
+    def __len__(self):
+        return len(self.by_slug)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self.by_slug
+
+    def __getitem__(self, slug: str) -> Category:
+        return self.by_slug[slug]
+
+    def __iter__(self) -> Iterator[Category]:
+        return iter(self.by_slug.values())
+
+    @staticmethod
+    def category_constraints(page: dict) -> list[dict]:
+        """'facetConstraints' of the "category" facet of a search page"""
+        for facet in page.get("facets", []):
+            if (facet.get("name") or "").lower() == "category":
+                return facet.get("facetConstraints", [])
+
+        return []
+
+    @classmethod
+    def from_search_result(cls, search_result: Iterable[dict], store_id: str = None) -> CategoryTree:
+        """the categories of all pages - the same slug on several pages is added once"""
+        tree = cls(store_id)
+        for page in search_result:
+            tree.add_constraints(cls.category_constraints(page))
+
+        return tree
+
+    def add_constraints(self, constraints: list[dict], parent: str = None) -> None:
+        """add 'constraints' and all their sub constraints below 'parent'"""
+        # explicit stack - one visit per constraint
+        stack = [(constraint, parent) for constraint in reversed(constraints)]
+
+        while stack:
+            constraint, parent = stack.pop()
+            slug = constraint.get("slug")
+            if slug is None or slug in self.by_slug:
+                continue
+
+            data = {key: value for key, value in constraint.items() if key != SUB}
+            name, count = constraint.get("name", ""), constraint.get("count", 0)
+            self._index(Category(slug, name, count, parent, data=data))
+
+            stack.extend((sub, slug) for sub in reversed(constraint.get(SUB) or []))
+
+    def _index(self, category: Category) -> None:
+        self.by_slug[category.slug] = category
+        self.by_name.setdefault(category.name, category)
+
+        if category.parent is None:
+            self.roots.append(category.slug)
+        else:
+            self.by_slug[category.parent].children.append(category.slug)
+
+    def get(self, slug: str) -> Category | None:
+        return self.by_slug.get(slug)
+
+    def find(self, name: str) -> Category | None:
+        """the first category named 'name'"""
+        return self.by_name.get(name)
+
+    def names(self) -> list[str]:
+        return list(self.by_name)
+
+    def slugs(self) -> list[str]:
+        return list(self.by_slug)
+
+    def leaves(self) -> list[Category]:
+        return [category for category in self if category.is_leaf]
+
+    def leaf_slugs(self) -> list[str]:
+        """slugs without sub categories - together they hold every product once"""
+        return [category.slug for category in self.leaves()]
+
+    def path(self, slug: str) -> list[str]:
+        """slugs from the root down to 'slug'"""
+        path = []
+        while slug is not None:
+            path.append(slug)
+            slug = self.by_slug[slug].parent
+
+        return path[::-1]
+
+    def descendants(self, slug: str) -> list[str]:
+        """all slugs below 'slug', depth first"""
+        result = []
+        stack = list(reversed(self.by_slug[slug].children))
+        while stack:
+            child = stack.pop()
+            result.append(child)
+            stack.extend(reversed(self.by_slug[child].children))
+
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "store_id": self.store_id,
+            "created": self.created,
+            "categories": [asdict(category) for category in self],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> CategoryTree:
+        tree = cls(data.get("store_id"))
+        tree.created = data.get("created", tree.created)
+
+        # parents come before their children
+        for category in data.get("categories", []):
+            tree._index(Category(**{**category, "children": []}))
+
+        return tree
+
+    @staticmethod
+    def file_name(store_id: str, folder: str = None) -> str:
+        return os.path.join(folder or DATA_FOLDER, f"categories-{store_id}.json")
+
+    def save(self, folder: str = None) -> str:
+        path = self.file_name(self.store_id, folder)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write(codec.dumps(self.to_dict(), ensure_ascii=False))
+
+        return path
+
+    @classmethod
+    def load(cls, store_id: str, ttl: float | None = 24 * 60 * 60, folder: str = None) -> CategoryTree | None:
+        """the saved tree of 'store_id' - None if there is none or it is older than 'ttl' seconds"""
+        path = cls.file_name(store_id, folder)
+
+        try:
+            with open(path, "rb") as fp:
+                tree = cls.from_dict(codec.loads(fp.read()))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError, KeyError) as e:
+            log.warning(f"Ignoring broken category tree {path}: {e}")
+            return None
+
+        if ttl is not None and time.time() - tree.created > ttl:
+            return None
+
+        return tree
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Managed HTTP clients
+
+Every client made by 'make_client' shares one connection pool (the transport),
+so a crawl of thousands of requests reuses a handful of keep-alive connections.
+Each client still has its own headers and cookies, closing it leaves the pool open.
+
+    # before the first request - tune the shared pool
+    configure(max_connections=40, http2=True, retries=3)
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import importlib.util
+
+import httpx
+
+log = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional 'h2' package - 'pip install httpx[http2]'
+HAS_HTTP2 = importlib.util.find_spec("h2") is not None
+
+OPTIONS = {
+    "http2": HAS_HTTP2,
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 30.0,
+    "timeout": 15.0,
+    "connect_timeout": 5.0,
+    # connection errors only - see 'retry.py' for status codes
+    "retries": 2,
+}
+
+_lock = threading.Lock()
+_transport = None
+_session = None
+_async_session = None
+
+
+def configure(**options) -> dict:
+    """change the pool, HTTP/2, timeout and retry 'OPTIONS'
+    the old pool is closed, all clients send their next requests through a new one
+    - the timeout of clients made before stays
+    """
+    global _transport
+
+    unknown = set(options) - set(OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown client options: {', '.join(sorted(unknown))}")
+
+    if options.get("http2") and not HAS_HTTP2:
+        log.warning("http2 requested but 'h2' is not installed - using HTTP/1.1")
+        options["http2"] = False
+
+    with _lock:
+        OPTIONS.update(options)
+        old_transport, _transport = _transport, None
+
+    if old_transport is not None:
+        old_transport.close()
+
+    return dict(OPTIONS)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPTIONS["max_connections"],
+        max_keepalive_connections=OPTIONS["max_keepalive_connections"],
+        keepalive_expiry=OPTIONS["keepalive_expiry"],
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(OPTIONS["timeout"], connect=OPTIONS["connect_timeout"])
+
+
+def get_transport() -> httpx.HTTPTransport:
+    """the connection pool shared by all clients of 'make_client'"""
+    global _transport
+
+    with _lock:
+        if _transport is None:
+            _transport = httpx.HTTPTransport(
+                http2=OPTIONS["http2"], limits=_limits(), retries=OPTIONS["retries"]
+            )
+
+        return _transport
+
+
+class SharedTransport(httpx.BaseTransport):
+    """the transport of the clients of 'make_client' - sends through the current shared pool
+    or 'transport', closing a client does not close them
+    """
+
+    def __init__(self, transport: httpx.BaseTransport = None):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return (self.transport or get_transport()).handle_request(request)
+
+    def close(self) -> None:
+        pass
+
+
+_shared_transport = SharedTransport()
+
+
+def make_client(headers: dict = None, cookies: dict = None, **kwargs) -> httpx.Client:
+    """a client with its own headers and cookies on the shared connection pool"""
+    kwargs.setdefault("transport", _shared_transport)
+    kwargs.setdefault("timeout", _timeout())
+    kwargs.setdefault("follow_redirects", True)
+
+    return httpx.Client(headers=headers, cookies=cookies, **kwargs)
+
+
+def make_async_client(headers: dict = None, cookies: dict = None, **kwargs) -> httpx.AsyncClient:
+    """same as 'make_client' for asyncio - the pool is bound to the running event loop"""
+    kwargs.setdefault(
+        "transport",
+        httpx.AsyncHTTPTransport(http2=OPTIONS["http2"], limits=_limits(), retries=OPTIONS["retries"]),
+    )
+    kwargs.setdefault("timeout", _timeout())
+    kwargs.setdefault("follow_redirects", True)
+
+    return httpx.AsyncClient(headers=headers, cookies=cookies, **kwargs)
+
+
+def set_session(
+    current_session: httpx.Client = None,
+    default_headers: dict = {},
+    default_cookies: dict = {},
+    **kwargs,
+) -> httpx.Client:
+    """
+    # all default - session without headers nor cookies
+    set_session()
+
+    OR
+
+    # default session - with custom made 'default_headers' and 'default_cookies'
+    set_session(None,
+                default_headers={"default_key": "default_value"},
+                default_cookies={})
+
+    OR
+
+    # custom session
+    my_custom_session = httpx.Client(headers={"key": "value"},
+                                     cookies={"key": "value"})
+    set_session(current_session=my_custom_session)
+
+    """
+    global _session
+
+    if not current_session:
+        current_session = make_client(headers=default_headers, cookies=default_cookies)
+
+    else:
+        current_session.headers.update(**kwargs.get("headers", {}))
+
+    _session = current_session
+
+    return _session
+
+
+def get_session(create: bool = True) -> httpx.Client | None:
+    """the global session - a default one is made if 'create' and none is set"""
+    if _session is None and create:
+        return set_session()
+
+    return _session
+
+
+def set_async_session(
+    current_session: httpx.AsyncClient = None,
+    default_headers: dict = {},
+    default_cookies: dict = {},
+    **kwargs,
+) -> httpx.AsyncClient:
+    """Same as 'set_session' but for the 'httpx.AsyncClient' used by 'AsyncSTORE'
+
+    # custom async session
+    set_async_session(current_session=httpx.AsyncClient(headers={"key": "value"}))
+    """
+    global _async_session
+
+    if not current_session:
+        current_session = make_async_client(headers=default_headers, cookies=default_cookies)
+
+    else:
+        current_session.headers.update(**kwargs.get("headers", {}))
+
+    _async_session = current_session
+
+    return _async_session
+
+
+def get_async_session() -> httpx.AsyncClient | None:
+    return _async_session
+
+
+async def close_async_session() -> None:
+    global _async_session
+
+    if _async_session:
+        await _async_session.aclose()
+        _async_session = None
+
+
+@atexit.register
+def close_session():
+    if _session:
+        _session.close()
+
+    if _transport:
+        _transport.close()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""JSON encoding and decoding with the fastest installed backend
+
+'orjson' is used for 'loads' and 'dumps', 'msgspec' for 'loads' only,
+else the stdlib 'json'. Output follows the stdlib arguments (ensure_ascii,
+indent, separators, sort_keys, default). orjson writes the compact separators
+and an indent of 2 or 4. Whenever it can not produce exactly the stdlib output
+- the default separators, other layouts, keys which are no str, huge ints -
+the stdlib is used. Left differences of orjson: NaN/Infinity are written as null
+and floats which Python writes in exponent notation are spelled another way
+(1e-05 - 0.00001, 1e+20 - 1e20), the value is the same.
+
+    # force a backend - or set REWE_DL_JSON=json
+    set_backend("json")
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import logging
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+log = logging.getLogger(__name__)
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+
+def available_backends() -> list[str]:
+    return [name for name, module in zip(BACKENDS, (orjson, msgspec, json)) if module is not None]
+
+
+def set_backend(name: str = None) -> str:
+    """use 'name' - default the first one of 'available_backends'"""
+    global backend
+
+    if name is None:
+        name = available_backends()[0]
+
+    if name not in available_backends():
+        raise ValueError(f"JSON backend '{name}' is not installed - choose one of {available_backends()}")
+
+    backend = name
+
+    return backend
+
+
+def loads(data: bytes | str) -> Any:
+    """same as 'json.loads'"""
+    if backend == "orjson":
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN, Infinity, ints above 64 bit or really invalid - let json decide
+            pass
+
+    elif backend == "msgspec":
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError:
+            pass
+
+    return json.loads(data)
+
+
+def dumps(
+    obj: Any,
+    indent: int | None = None,
+    sort_keys: bool = False,
+    ensure_ascii: bool = True,
+    separators: tuple[str, str] | None = None,
+    default: Callable[[Any], Any] | None = None,
+) -> str:
+    """same as 'json.dumps' with the same arguments"""
+    if backend == "orjson":
+        layout = _orjson_layout(indent, separators)
+        if layout is not None:
+            option, reformat = layout
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+
+            try:
+                text = orjson.dumps(obj, default=default, option=option).decode()
+            except orjson.JSONEncodeError:
+                # ints above 64 bit, circular data or 'default' failed - json has the right answer
+                text = None
+
+            if text is not None:
+                text = reformat(text) if reformat else text
+                return _escape_non_ascii(text) if ensure_ascii else text
+
+    return json.dumps(
+        obj,
+        indent=indent,
+        sort_keys=sort_keys,
+        ensure_ascii=ensure_ascii,
+        separators=separators,
+        default=default,
+    )
+
+
+def dump(obj: Any, fp, **kwargs) -> None:
+    """same as 'json.dump'"""
+    fp.write(dumps(obj, **kwargs))
+
+
+# json escapes DEL too with ensure_ascii
+NON_ASCII = re.compile(r"[^\x00-\x7e]")
+
+
+def _escape(match: re.Match) -> str:
+    code = ord(match.group())
+    if code < 0x10000:
+        return f"\\u{code:04x}"
+
+    # surrogate pair like json
+    code -= 0x10000
+    return f"\\u{0xD800 | (code >> 10):04x}\\u{0xDC00 | (code & 0x3FF):04x}"
+
+
+def _escape_non_ascii(text: str) -> str:
+    """the 'ensure_ascii' output of json - non ascii only occurs in strings"""
+    return text if text.isascii() and "\x7f" not in text else NON_ASCII.sub(_escape, text)
+
+
+def _indent_4(text: str) -> str:
+    """the indent=2 output of orjson with an indent of 4"""
+    depth = 1
+    while "\n" + "  " * depth in text:
+        depth += 1
+
+    # deepest first - raw '\r' and '\n' are never inside strings, '\r' marks done lines
+    for level in range(depth - 1, 0, -1):
+        text = text.replace("\n" + "  " * level, "\r" + "    " * level)
+
+    return text.replace("\r", "\n")
+
+
+def _orjson_layout(
+    indent: int | None, separators: tuple[str, str] | None
+) -> tuple[int, Callable[[str], str] | None] | None:
+    """options and a rewrite of the output for the same layout as json - None if orjson can not write it
+
+    the default separators (", ", ": ") are left to json - rewriting the output of orjson is not faster
+    """
+    # datetime and dataclasses go to 'default' like with json
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    separators = tuple(separators or ())
+
+    if indent is None:
+        return (option, None) if separators == (",", ":") else None
+
+    # json uses (",", ": ") with an indent
+    if separators not in ((), (",", ": ")):
+        return None
+
+    if indent == 2:
+        return option | orjson.OPT_INDENT_2, None
+
+    if indent == 4:
+        return option | orjson.OPT_INDENT_2, _indent_4
+
+    return None
+
+
+backend = set_backend(os.environ.get("REWE_DL_JSON") or None)
@@ -5,26 +5,69 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import asdict, dataclass
+from operator import attrgetter
+from dataclasses import dataclass
 
 log = logging.getLogger(__name__)
 
+PRODUCT_FIELDS = ("store", "product", "link", "product_id", "price", "old_price", "saved", "brand", "picture")
+
 
 @dataclass
 class Product:
+    """One parsed product - slotted, so a row costs no per instance '__dict__'.
+
+    Read like the dicts it replaces - product["price"], product.get("brand") -
+    and turn into a dict or a tuple in field order only when needed.
+    """
+
+    __slots__ = PRODUCT_FIELDS
+
     store: str
     product: str
     link: str
     product_id: str
-    price: float
-    old_price: float
-    saved: float
+    # integer cents - 'formatter.format_euros' for output
+    price: int
+    old_price: int
+    saved: int
     brand: str
     picture: str
 
+    def to_dict(self) -> dict:
+        return dict(zip(PRODUCT_FIELDS, _row(self)))
+
+    def to_row(self) -> tuple:
+        """the values in field order - e.g. for sql"""
+        return _row(self)
+
+    def __getitem__(self, key: str):
+        if key not in PRODUCT_FIELDS:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in PRODUCT_FIELDS else default
+
+    def __contains__(self, key: str) -> bool:
+        return key in PRODUCT_FIELDS
+
+    def keys(self) -> tuple:
+        return PRODUCT_FIELDS
+
+    def values(self) -> tuple:
+        return _row(self)
+
+    def items(self):
+        return zip(PRODUCT_FIELDS, _row(self))
+
     # test
     def dict(self):
-        return {k: str(v) for k, v in asdict(self).items()}
+        return {k: str(v) for k, v in self.items()}
+
+
+_row = attrgetter(*PRODUCT_FIELDS)
 
 
 """
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Skip products which were already seen in a crawl
+
+Categories overlap - a parent slug returns the products of all its children -
+so crawling many slugs returns the same products again and again. A
+'DedupIndex' remembers (store_id, product_id) and filters the raw products
+before they are parsed.
+
+    index = DedupIndex(store_id="8534540")
+    for slug in slugs:
+        products = index.filter(products_of(slug))
+    index.stats()  # {"checked": 900, "duplicates": 450, "ratio": 0.5, ...}
+
+The "exact" mode keeps a set of keys. The "bloom" mode keeps a fixed size
+bit array instead - a few bytes per product for very large runs - and wrongly
+reports about 'error_rate' of the new products as seen.
+"""
+
+from __future__ import annotations
+
+import math
+import hashlib
+import logging
+from typing import Iterable, Iterator
+
+log = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """set membership in 'capacity' * ~1.2 * log2(1 / 'error_rate') bits"""
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError(f"invalid capacity {capacity} or error_rate {error_rate}")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def __repr__(self):
+        return f"BloomFilter(capacity={self.capacity}, error_rate={self.error_rate}, count={self.count})"
+
+    def _positions(self, key: str) -> Iterator[int]:
+        # double hashing - two 64 bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+        for idx in range(self.hashes):
+            yield (first + idx * second) % self.size
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def add(self, key: str) -> bool:
+        """add 'key' - returns True if it was (probably) in the filter before"""
+        bits = self.bits
+        present = True
+
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                present = False
+                bits[pos >> 3] |= mask
+
+        if not present:
+            self.count += 1
+
+        return present
+
+
+class DedupIndex:
+    def __init__(
+        self, store_id: str = None, mode: str = "exact", capacity: int = 1_000_000, error_rate: float = 0.001
+    ):
+        """'store_id' - default store of the keys
+        'mode' - "exact" or "bloom", 'capacity' and 'error_rate' size the bloom filter
+        """
+        if mode not in ("exact", "bloom"):
+            raise ValueError(f"'mode' has to be 'exact' or 'bloom', not {mode!r}")
+
+        self.store_id = store_id
+        self.mode = mode
+        self._keys = set() if mode == "exact" else BloomFilter(capacity, error_rate)
+
+        self.checked = self.duplicates = 0
+
+    def __repr__(self):
+        return f"DedupIndex(mode={self.mode}, checked={self.checked}, duplicates={self.duplicates})"
+
+    def __len__(self):
+        """unique products so far"""
+        return self.checked - self.duplicates
+
+    def _key(self, product_id: str, store_id: str = None) -> str:
+        return f"{store_id or self.store_id}:{product_id}"
+
+    def __contains__(self, product_id: str) -> bool:
+        return self._key(product_id) in self._keys
+
+    def seen(self, product_id: str, store_id: str = None) -> bool:
+        """add the product - returns True if it was seen before"""
+        key = self._key(product_id, store_id)
+        self.checked += 1
+
+        if self.mode == "exact":
+            duplicate = key in self._keys
+            self._keys.add(key)
+        else:
+            duplicate = self._keys.add(key)
+
+        self.duplicates += duplicate
+
+        return duplicate
+
+    def filter(self, products: Iterable[dict], store_id: str = None, key: str = "id") -> Iterator[dict]:
+        """the raw products of 'products' not seen before - 'key' is the product id of search results,
+        "productId" for product-tiles
+        """
+        for product in products:
+            if not self.seen(product.get(key, ""), store_id):
+                yield product
+
+    @property
+    def ratio(self) -> float:
+        """share of duplicates among all checked products"""
+        return self.duplicates / self.checked if self.checked else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "unique": len(self),
+            "ratio": round(self.ratio, 4),
+        }
@@ -17,18 +17,25 @@ DATA_FOLDER = os.path.join(os.path.dirname(PROJECT_ROOT), "data")
 sys.path.append(PROJECT_ROOT)
 
 from rewe import STORE
+from cache import set_cache
 from parser import Parser
 from postprocessor.metadata import MetadataPP
 
 log = logging.getLogger(__name__)
 
+# only the best deals of all pages - ranked by 'saved'
+TOP_DEALS = 300
+
 
 def main():
+    # reuse responses from 'data/http_cache.sqlite3' until their TTL runs out
+    set_cache()
+
     my_store = STORE(store_id="8534540")
 
     discounted_products = my_store.get_discounted_products()
 
-    all_products = Parser().parse_search_results_products(discounted_products)
+    all_products = Parser().parse_search_results_products(discounted_products, top=TOP_DEALS)
 
     todays_date = datetime.today().strftime("%Y-%m-%d")
     this_file = Path(__file__).stem
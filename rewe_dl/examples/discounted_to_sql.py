@@ -7,32 +7,33 @@ from __future__ import annotations
 import os
 import sys
 import logging
-from pathlib import Path
-from datetime import datetime
 
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.dirname(PROJECT_DIR))
 
 from rewe import STORE
+from cache import set_cache
 from parser import Parser
 from postprocessor.sql import SqlPP
 
 log = logging.getLogger(__name__)
 
+# only the best deals of all pages - ranked by 'saved'
+TOP_DEALS = 300
+
 
 def main():
+    # reuse responses from 'data/http_cache.sqlite3' until their TTL runs out
+    set_cache()
+
     my_store = STORE(store_id="8534540")
 
     discounted_products = my_store.get_discounted_products()
 
-    all_products = Parser().parse_search_results_products(discounted_products)
-
-    this_file = Path(__file__).stem
-    todays_date = datetime.today().strftime("%Y-%m-%d")
-
-    file_name = f"{this_file}-{todays_date}.sqlite3"
+    all_products = Parser().parse_search_results_products(discounted_products, top=TOP_DEALS)
 
-    SqlPP.save_to_sql(all_products, file_name)
+    # one 'data/price_history.sqlite3' for all days instead of a file per day
+    SqlPP.save_to_history(all_products, store_id=my_store.STORE_ID)
 
 
 if __name__ == "__main__":
@@ -13,10 +13,14 @@ sys.path.insert(0, os.path.dirname(PROJECT_DIR))
 log = logging.getLogger(__name__)
 
 from rewe import Cli
+from cache import set_cache
 from postprocessor.sql import SqlPP
 
 
 def main():
+    # reuse responses from 'data/http_cache.sqlite3' until their TTL runs out
+    set_cache()
+
     MY_STORE_ID: str = "8534540"
     # MY_STORE_ID: str = "8888888"
 
@@ -34,7 +38,7 @@ def main():
 
     offers = Cli(store_id=MY_STORE_ID).from_links(my_basket)
 
-    SqlPP.save_to_sql(offers, file_name="my_basket.sqlite3")
+    SqlPP.save_to_history(offers, store_id=MY_STORE_ID)
 
 
 if __name__ == "__main__":
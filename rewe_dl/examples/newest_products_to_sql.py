@@ -6,24 +6,27 @@ from __future__ import annotations
 
 import os
 import sys
-from pathlib import Path
 
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.dirname(PROJECT_DIR))
 
 from rewe import STORE
+from cache import set_cache
 from parser import Parser
 from postprocessor.sql import SqlPP
 
 
 def main():
-    search_results = STORE().get_new_products()
+    # reuse responses from 'data/http_cache.sqlite3' until their TTL runs out
+    set_cache()
 
-    all_products = Parser().parse_search_results_products(search_results)
+    my_store = STORE()
+
+    search_results = my_store.get_new_products()
 
-    this_file = Path(__file__).stem
+    all_products = Parser().parse_search_results_products(search_results)
 
-    SqlPP.save_to_sql(all_products, file_name=f"{this_file}.sqlite3")
+    SqlPP.save_to_history(all_products, store_id=my_store.STORE_ID)
 
 
 if __name__ == "__main__":
@@ -14,6 +14,7 @@ PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.dirname(PROJECT_DIR))
 
 from rewe import Cli
+from formatter import format_euros, euros_to_cents
 from postprocessor.notify import NotifyPP
 
 log = logging.getLogger(__name__)
@@ -27,26 +28,28 @@ def compare(my_basket: Iterator = [], type: str = None, limit_price: float = 2.3
         return
 
     product_mds = Cli().from_links(my_basket)
+    # prices are cents
+    limit_cents = euros_to_cents(limit_price)
 
     for product_md in product_mds:
-        current_price = product_md.get("price", float())
+        current_price = product_md.price
 
         if type.lower() == "below":
             op = operator.lt
         elif type.lower() == "above":
             op = operator.gt
 
-        if op(current_price, limit_price):
+        if op(current_price, limit_cents):
             NotifyPP.apprise(
-                title=product_md.get("product"),
-                body=f"Price {type} {limit_price} euro: {current_price}",
+                title=product_md.product,
+                body=f"Price {type} {format_euros(limit_cents)}: {format_euros(current_price)}",
             )
 
             """
             NotifyPP(product_md, {}).matrix(
                 url=product_md.get("link"),
                 title=product_md.get("product"),
-                body=f"Price {type} {limit_price} euro: {current_price}"
+                body=f"Price {type} {format_euros(limit_cents)}: {format_euros(current_price)}"
             )
             """
 
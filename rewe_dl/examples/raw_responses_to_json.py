@@ -17,6 +17,7 @@ DATA_FOLDER = os.path.join(os.path.dirname(PROJECT_ROOT), "data")
 sys.path.append(PROJECT_ROOT)
 
 from rewe import STORE
+from cache import set_cache
 from parser import Parser
 from postprocessor.metadata import MetadataPP
 
@@ -24,6 +25,9 @@ log = logging.getLogger(__name__)
 
 
 def main():
+    # reuse responses from 'data/http_cache.sqlite3' until their TTL runs out
+    set_cache()
+
     my_store = STORE(store_id="8534540")
     query = "ja"
 
@@ -17,6 +17,7 @@ Exception
       |    +-- AuthorizationError
       |    +-- NotFoundError
       |    +-- HttpError
+      |         +-- CircuitOpenError
       +-- FormatError
       |    +-- FilenameFormatError
       |    +-- DirectoryFormatError
@@ -61,7 +62,16 @@ class HttpError(ExtractionError):
     def __init__(self, message, response=None):
         ExtractionError.__init__(self, message)
         self.response = response
-        self.status = response.status_code if response else 0
+        self.status = response.status_code if response is not None else 0
+
+
+class CircuitOpenError(HttpError):
+    """Requests to a host are blocked after too many failures in a row"""
+
+    default = "Circuit open"
+
+    def __init__(self, message=None):
+        HttpError.__init__(self, message)
 
 
 class NotFoundError(ExtractionError):
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Compiled field extractors for API objects
+
+A field spec maps output fields to (path, default). A path is a dotted string
+of dict keys and list indices, or a tuple of such strings tried in order.
+'compile_fields' turns a spec once into a plain function with chained
+subscripts, returning the values as a tuple in the order of the spec:
+
+    extract = compile_fields({"id": ("id", ""), "price": ("pricing.price", 0)})
+    product_id, price = extract(product)
+
+A missing key, a too short list or a None on the way gives the default.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable
+
+log = logging.getLogger(__name__)
+
+FieldSpec = dict[str, tuple[str | tuple[str, ...], Any]]
+
+# '_embedded.products' of 'products' search results and 'alternatives'
+SEARCH_RESULT_FIELDS: FieldSpec = {
+    "product": ("productName", ""),
+    "product_id": ("id", ""),
+    "nan": ("nan", ""),
+    "brand": ("brand.name", ""),
+    # only one article in fact
+    "old_price": ("_embedded.articles.0._embedded.listing.pricing.discount.regularPrice", 0),
+    "price": ("_embedded.articles.0._embedded.listing.pricing.currentRetailPrice", 0),
+    "picture": ("media.images.0._links.self.href", ""),
+}
+
+# items of 'product-tiles' - see 'STORE.product_infos'
+PRODUCT_TILES_FIELDS: FieldSpec = {
+    "product": ("productName", ""),
+    "product_id": (("productId", "id"), ""),
+    "nan": ("nan", ""),
+    "brand": (("brandKey", "manufacturer.name"), ""),
+    "old_price": ("pricing.regularPrice", 0),
+    "price": ("pricing.price", 0),
+    "picture": ("mediaInformation.0.mediaUrl", ""),
+}
+
+MISSING = (KeyError, IndexError, TypeError)
+
+
+def _subscripts(path: str) -> str:
+    """'a.0.b' -> '["a"][0]["b"]'"""
+    parts = []
+    for part in path.split("."):
+        parts.append(f"[{part}]" if part.isdigit() else f"[{part!r}]")
+
+    return "".join(parts)
+
+
+def _field_source(index: int, paths: tuple[str, ...]) -> list[str]:
+    """source lines setting 'v<index>' from the first path found"""
+    lines = []
+    indent = "    "
+
+    for path in paths:
+        lines += [
+            f"{indent}try:",
+            f"{indent}    v{index} = obj{_subscripts(path)}",
+            f"{indent}except MISSING:",
+        ]
+        indent += "    "
+
+    lines.append(f"{indent}v{index} = defaults[{index}]")
+
+    return lines
+
+
+def compile_fields(fields: FieldSpec, name: str = "extract") -> Callable[[Any], tuple]:
+    """one function returning the values of all 'fields' of an object as a tuple"""
+    defaults = []
+    lines = [f"def {name}(obj):"]
+
+    for index, (path, default) in enumerate(fields.values()):
+        paths = (path,) if isinstance(path, str) else tuple(path)
+        lines += _field_source(index, paths)
+        defaults.append(default)
+
+    lines.append(f"    return ({''.join(f'v{index}, ' for index in range(len(defaults)))})")
+
+    namespace = {"MISSING": MISSING, "defaults": tuple(defaults)}
+    exec(compile("\n".join(lines), f"<{name}>", "exec"), namespace)
+
+    extract = namespace[name]
+    extract.fields = tuple(fields)
+    extract.source = "\n".join(lines)
+
+    return extract
+
+
+extract_search_result = compile_fields(SEARCH_RESULT_FIELDS, "extract_search_result")
+extract_product_tiles = compile_fields(PRODUCT_TILES_FIELDS, "extract_product_tiles")
@@ -2,13 +2,29 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+from decimal import Decimal
 
-def price_cent_to_numeric(price: int) -> float:
-    """
-    if isinstance(price, str):
-        price = int(price)
-    """
+# Prices are integer cents everywhere - 'Product', 'ProductBatch', sql and json.
+# Euros are only made for presentation.
 
-    price = f"{price // 100}.{price % 100}"
 
-    return float(price)
+def price_cent_to_numeric(price: int | str) -> float:
+    """euros as float of 'price' in cents - 105 -> 1.05"""
+
+    return int(price) / 100
+
+
+def euros_to_cents(euros: float | str | Decimal) -> int:
+    """integer cents of an euro amount - e.g. of old json/sql rows or thresholds"""
+
+    # through str - 0.29 * 100 is 28.999999999999996
+    return int(round(Decimal(str(euros)) * 100))
+
+
+def format_euros(cents: int, currency: str = "€") -> str:
+    """'1.05 €' of 105"""
+
+    sign = "-" if cents < 0 else ""
+    euros, cents = divmod(abs(int(cents)), 100)
+
+    return f"{sign}{euros}.{cents:02d} {currency}".rstrip()
@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""One long-lived price history of all crawls
+
+Every crawl used to get its own 'data/<name>-YYYY-MM-DD.sqlite3', so the
+history of one product meant opening dozens of databases. 'PriceHistory' keeps
+all stores and days in one database as a star schema:
+
+- 'stores' (store_key, store_id, store) and 'products' (product_key,
+  product_id, product, brand, picture, link) - every string once
+- 'price_observations' (store_key, observed, product_key, price, old_price) -
+  integers only, 'observed' is the unix time of the day. The key
+  (store_key, observed, product_key) serves a store's day, the index
+  (product_key, observed) the history of a product.
+
+The views 'prices' and 'deals' return the flat rows - 'saved' is computed.
+
+    with PriceHistory() as history:
+        history.write(products, store_id="8534540")           # {"inserted": 250, "updated": 0}
+        history.history("2621809", start="2026-01-01")        # one indexed scan
+        history.snapshot("8534540", "2026-10-17")
+
+A product has one observation per store and day - a second crawl of the day
+updates it. Names, brands and pictures are the ones of the latest write.
+
+With mode="changes" a price is only written when it differs from the last one
+of the product - 'price_intervals' (store_key, product_key, valid_from,
+valid_to, price, old_price), 'valid_to' is the start of the next price and
+NULL for the current one. A write with complete=True holds every product of
+the store, the intervals of products missing from it end on its day.
+
+The two modes have their own tables:
+- 'history', 'snapshot', 'dates' and the views read the daily observations -
+  they do not see change-only writes
+- 'price_at', 'snapshot_at', 'intervals' and 'changes' read the intervals -
+  'compact' turns daily observations into intervals. It does not know which
+  crawls were complete, an interval runs on over the days a product is missing.
+"""
+
+from __future__ import annotations
+
+import os
+import logging
+import calendar
+from datetime import date as Date
+from itertools import islice
+from typing import Iterable
+
+from constants import PRODUCT_FIELDS
+from postprocessor.sql import LOOKUP_SIZE, connect, product_row
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FOLDER = os.path.join(os.path.dirname(PROJECT_DIR), "data")
+HISTORY_FILE = os.path.join(DATA_FOLDER, "price_history.sqlite3")
+
+log = logging.getLogger(__name__)
+
+PRICES_COLUMNS = ("store_id", "date") + PRODUCT_FIELDS
+
+# the flat rows of 'PRICES_COLUMNS' - for the views and the queries
+SELECT_PRICES = """
+SELECT s.store_id, date(o.observed, 'unixepoch') AS date, s.store, p.product, p.link, p.product_id,
+o.price, o.old_price, o.old_price - o.price AS saved, p.brand, p.picture
+FROM price_observations o JOIN stores s USING (store_key) JOIN products p USING (product_key)
+"""
+
+CREATE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS stores (
+store_key INTEGER PRIMARY KEY,
+store_id TEXT NOT NULL UNIQUE,
+store TEXT
+);
+CREATE TABLE IF NOT EXISTS products (
+product_key INTEGER PRIMARY KEY,
+product_id TEXT NOT NULL UNIQUE,
+product TEXT,
+brand TEXT,
+picture TEXT,
+link TEXT
+);
+CREATE TABLE IF NOT EXISTS price_observations (
+store_key INTEGER NOT NULL REFERENCES stores (store_key),
+observed INTEGER NOT NULL,
+product_key INTEGER NOT NULL REFERENCES products (product_key),
+price INTEGER,
+old_price INTEGER,
+PRIMARY KEY (store_key, observed, product_key)
+)
+WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS price_observations_product ON price_observations (product_key, observed);
+
+CREATE TABLE IF NOT EXISTS price_intervals (
+store_key INTEGER NOT NULL REFERENCES stores (store_key),
+product_key INTEGER NOT NULL REFERENCES products (product_key),
+valid_from INTEGER NOT NULL,
+valid_to INTEGER,
+price INTEGER,
+old_price INTEGER,
+PRIMARY KEY (store_key, product_key, valid_from)
+)
+WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS price_intervals_from ON price_intervals (store_key, valid_from);
+
+CREATE VIEW IF NOT EXISTS prices AS {SELECT_PRICES};
+CREATE VIEW IF NOT EXISTS deals AS SELECT {", ".join(PRODUCT_FIELDS)}, date FROM prices;
+"""
+
+UPSERT_STORE = """
+INSERT INTO stores (store_id, store) VALUES (?, ?)
+ON CONFLICT (store_id) DO UPDATE SET store = excluded.store WHERE store IS NOT excluded.store
+"""
+
+# unchanged products are not written again
+UPSERT_PRODUCT = """
+INSERT INTO products (product_id, product, brand, picture, link) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (product_id) DO UPDATE SET
+product = excluded.product, brand = excluded.brand, picture = excluded.picture, link = excluded.link
+WHERE product IS NOT excluded.product OR brand IS NOT excluded.brand
+OR picture IS NOT excluded.picture OR link IS NOT excluded.link
+"""
+
+UPSERT_OBSERVATION = """
+INSERT INTO price_observations (store_key, observed, product_key, price, old_price) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (store_key, observed, product_key) DO UPDATE SET
+price = excluded.price, old_price = excluded.old_price
+"""
+
+COUNT_OBSERVATIONS = (
+    "SELECT COUNT(*) FROM price_observations WHERE store_key = ? AND observed = ? AND product_key IN ({0})"
+)
+
+# intervals with product and store - 'previous_price' of the interval before
+SELECT_INTERVALS = """
+SELECT s.store_id, p.product_id, p.product, date(i.valid_from, 'unixepoch') AS valid_from,
+date(i.valid_to, 'unixepoch') AS valid_to, i.price, i.old_price, b.price AS previous_price
+FROM price_intervals i JOIN stores s USING (store_key) JOIN products p USING (product_key)
+LEFT JOIN price_intervals b
+ON b.store_key = i.store_key AND b.product_key = i.product_key AND b.valid_to = i.valid_from
+"""
+
+# the interval valid at a time
+VALID_AT = "i.valid_from <= ? AND (i.valid_to IS NULL OR i.valid_to > ?)"
+
+INTERVALS_COLUMNS = (
+    "store_id", "product_id", "product", "valid_from", "valid_to", "price", "old_price", "previous_price"
+)
+
+# one interval per run of equal prices - of the observations and of the intervals there already are
+# the end of an interval ended by a complete write is a point too - 'missing' - and stays an end
+COMPACT = """
+CREATE TEMP TABLE points AS
+SELECT store_key, product_key, observed AS valid_from, price, old_price, 0 AS missing FROM price_observations
+UNION ALL
+SELECT store_key, product_key, valid_from, price, old_price, 0 FROM price_intervals i WHERE NOT EXISTS (
+SELECT 1 FROM price_observations o
+WHERE o.store_key = i.store_key AND o.observed = i.valid_from AND o.product_key = i.product_key
+)
+UNION ALL
+SELECT store_key, product_key, valid_to, NULL, NULL, 1 FROM price_intervals i
+WHERE valid_to IS NOT NULL AND NOT EXISTS (
+SELECT 1 FROM price_intervals n
+WHERE n.store_key = i.store_key AND n.valid_from = i.valid_to AND n.product_key = i.product_key
+) AND NOT EXISTS (
+SELECT 1 FROM price_observations o
+WHERE o.store_key = i.store_key AND o.observed = i.valid_to AND o.product_key = i.product_key
+);
+DELETE FROM price_intervals;
+INSERT INTO price_intervals (store_key, product_key, valid_from, valid_to, price, old_price)
+SELECT store_key, product_key, valid_from, valid_to, price, old_price FROM (
+SELECT *, LEAD(valid_from) OVER (PARTITION BY store_key, product_key ORDER BY valid_from) AS valid_to
+FROM (
+SELECT *, ROW_NUMBER() OVER w AS number, LAG(price) OVER w AS last_price,
+LAG(old_price) OVER w AS last_old_price, LAG(missing) OVER w AS last_missing
+FROM points WINDOW w AS (PARTITION BY store_key, product_key ORDER BY valid_from)
+)
+WHERE number = 1 OR price IS NOT last_price OR old_price IS NOT last_old_price OR missing IS NOT last_missing
+)
+WHERE NOT missing;
+DROP TABLE points;
+"""
+
+MODES = ("daily", "changes")
+
+# end the current intervals of the products which are not in a complete write
+CLOSE_MISSING = """
+UPDATE price_intervals SET valid_to = ?
+WHERE store_key = ? AND valid_to IS NULL AND valid_from < ?
+AND product_key NOT IN (SELECT product_key FROM seen)
+"""
+
+# positions of the 'products' columns in a 'Product' row
+PRODUCT_COLUMNS = tuple(map(PRODUCT_FIELDS.index, ("product_id", "product", "brand", "picture", "link")))
+STORE, PRODUCT_ID, PRICE, OLD_PRICE = map(PRODUCT_FIELDS.index, ("store", "product_id", "price", "old_price"))
+
+
+def day(value: str | Date = None) -> str:
+    """'YYYY-MM-DD' of a date, a datetime or a timestamp string - default today"""
+    if value is None:
+        value = Date.today()
+
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+
+    return str(value)[:10]
+
+
+def epoch(value: str | Date = None) -> int:
+    """'observed' of a day - the unix time of its start in UTC"""
+    return calendar.timegm(Date.fromisoformat(day(value)).timetuple())
+
+
+class PriceHistory:
+    def __init__(self, path: str = None, batch_size: int = 10_000, mode: str = "daily"):
+        """'path' - the database, default 'data/price_history.sqlite3'
+        'batch_size' - rows per transaction of 'write'
+        'mode' - "daily" writes an observation per product and day,
+        "changes" only a new interval when the price changed
+        """
+        if batch_size < 1:
+            raise ValueError(f"'batch_size' has to be at least 1, not {batch_size}")
+        if mode not in MODES:
+            raise ValueError(f"'mode' has to be one of {list(MODES)}, not {mode!r}")
+
+        self.path = str(path or HISTORY_FILE)
+        self.batch_size = batch_size
+        self.mode = mode
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self.connector = connect(self.path)
+        self.connector.executescript(CREATE_SCHEMA)
+
+    def __repr__(self):
+        return f"PriceHistory({self.path}, mode={self.mode})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.connector.close()
+
+    def _store_key(self, store_id: str, store: str) -> int:
+        self.connector.execute(UPSERT_STORE, (store_id, store))
+        query = "SELECT store_key FROM stores WHERE store_id = ?"
+
+        return self.connector.execute(query, (store_id,)).fetchone()[0]
+
+    def _product_keys(self, product_ids: set) -> dict:
+        """product_id -> product_key"""
+        ids, keys = list(product_ids), {}
+
+        for start in range(0, len(ids), LOOKUP_SIZE):
+            chunk = ids[start : start + LOOKUP_SIZE]
+            query = "SELECT product_id, product_key FROM products WHERE product_id IN ({0})"
+            keys.update(self.connector.execute(query.format(", ".join("?" for _ in chunk)), chunk))
+
+        return keys
+
+    def _existing(self, store_key: int, observed: int, product_keys: set) -> int:
+        """how many of 'product_keys' already have an observation of 'store_key' on 'observed'"""
+        keys, found = list(product_keys), 0
+
+        for start in range(0, len(keys), LOOKUP_SIZE):
+            chunk = keys[start : start + LOOKUP_SIZE]
+            query = COUNT_OBSERVATIONS.format(", ".join("?" for _ in chunk))
+            found += self.connector.execute(query, (store_key, observed, *chunk)).fetchone()[0]
+
+        return found
+
+    def write(
+        self, products: Iterable, store_id: str, date: str | Date = None, complete: bool = False
+    ) -> dict:
+        """add 'products' ('Product' or dicts) of 'store_id' on 'date', default today
+
+        "daily" - upsert an observation per product, rows inserted and updated
+        "changes" - intervals inserted and updated, products with the same price,
+        products older than their current interval (skipped) and ended intervals (closed)
+
+        'complete' - "changes" only, 'products' are all products of the store on 'date':
+        the current intervals of the products missing from them end on 'date'
+        """
+        store_id, observed = str(store_id), epoch(date)
+        products = iter(products)
+        store_key, seen = None, set()
+
+        if self.mode == "daily":
+            stats = {"inserted": 0, "updated": 0}
+        else:
+            stats = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0, "closed": 0}
+
+        while batch := [product_row(product) for product in islice(products, self.batch_size)]:
+            with self.connector:
+                self.connector.execute("BEGIN")
+                store_key = self._store_key(store_id, batch[0][STORE])
+
+                # the dimensions first - new products get their key
+                dimension = [[row[idx] for idx in PRODUCT_COLUMNS] for row in batch]
+                self.connector.executemany(UPSERT_PRODUCT, dimension)
+                product_keys = self._product_keys({row[PRODUCT_ID] for row in batch})
+
+                observations = [
+                    (store_key, observed, product_keys[row[PRODUCT_ID]], row[PRICE], row[OLD_PRICE])
+                    for row in batch
+                ]
+
+                if self.mode == "daily":
+                    # repeated products of a batch update their own first observation
+                    keys = set(product_keys.values())
+                    inserted = len(keys) - self._existing(store_key, observed, keys)
+                    self.connector.executemany(UPSERT_OBSERVATION, observations)
+
+                    stats["inserted"] += inserted
+                    stats["updated"] += len(batch) - inserted
+                else:
+                    for key, value in self._write_changes(store_key, observed, observations).items():
+                        stats[key] += value
+                    seen.update(product_keys.values())
+
+        if complete and self.mode == "changes":
+            stats["closed"] = self._close_missing(store_id, store_key, observed, seen)
+
+        log.debug(f"{self.path}: {store_id} on {day(date)} - {stats}")
+
+        return stats
+
+    def _current_intervals(self, store_key: int, product_keys: list) -> dict:
+        """product_key -> (valid_from, price, old_price) of the open intervals"""
+        current = {}
+
+        for start in range(0, len(product_keys), LOOKUP_SIZE):
+            chunk = product_keys[start : start + LOOKUP_SIZE]
+            query = (
+                "SELECT product_key, valid_from, price, old_price FROM price_intervals "
+                "WHERE store_key = ? AND valid_to IS NULL AND product_key IN ({0})"
+            )
+            cursor = self.connector.execute(query.format(", ".join("?" for _ in chunk)), (store_key, *chunk))
+            current.update((key, values) for key, *values in cursor)
+
+        return current
+
+    def _write_changes(self, store_key: int, observed: int, observations: list[tuple]) -> dict:
+        """open a new interval for every changed price - in the transaction of 'write'"""
+        # the last one of repeated products
+        prices = {product_key: (price, old_price) for _, _, product_key, price, old_price in observations}
+        current = self._current_intervals(store_key, list(prices))
+
+        stats = {"inserted": 0, "updated": 0, "unchanged": len(observations) - len(prices), "skipped": 0}
+        close, insert, update = [], [], []
+
+        for product_key, (price, old_price) in prices.items():
+            valid_from, *last = current.get(product_key, (None, None, None))
+
+            if valid_from is None:
+                insert.append((store_key, product_key, observed, price, old_price))
+            elif observed < valid_from:
+                # only 'compact' can put older prices between the intervals
+                stats["skipped"] += 1
+            elif last == [price, old_price]:
+                stats["unchanged"] += 1
+            elif observed == valid_from:
+                update.append((price, old_price, store_key, product_key, valid_from))
+            else:
+                close.append((observed, store_key, product_key, valid_from))
+                insert.append((store_key, product_key, observed, price, old_price))
+
+        self.connector.executemany(
+            "UPDATE price_intervals SET valid_to = ? "
+            "WHERE store_key = ? AND product_key = ? AND valid_from = ?",
+            close,
+        )
+        self.connector.executemany(
+            "INSERT INTO price_intervals (store_key, product_key, valid_from, price, old_price) "
+            "VALUES (?, ?, ?, ?, ?)",
+            insert,
+        )
+        self.connector.executemany(
+            "UPDATE price_intervals SET price = ?, old_price = ? "
+            "WHERE store_key = ? AND product_key = ? AND valid_from = ?",
+            update,
+        )
+
+        stats["inserted"] += len(insert)
+        stats["updated"] += len(update)
+
+        return stats
+
+    def _close_missing(self, store_id: str, store_key: int | None, observed: int, product_keys: set) -> int:
+        """end the current intervals of 'store_id' on 'observed' whose product is not in 'product_keys'"""
+        if store_key is None:
+            found = self.connector.execute("SELECT store_key FROM stores WHERE store_id = ?", (store_id,))
+            store_key = (found.fetchone() or (None,))[0]
+            if store_key is None:
+                return 0
+
+        with self.connector:
+            self.connector.execute("BEGIN")
+            self.connector.execute("CREATE TEMP TABLE IF NOT EXISTS seen (product_key INTEGER PRIMARY KEY)")
+            self.connector.execute("DELETE FROM seen")
+            self.connector.executemany("INSERT INTO seen VALUES (?)", ((key,) for key in product_keys))
+            closed = self.connector.execute(CLOSE_MISSING, (observed, store_key, observed)).rowcount
+
+        return closed
+
+    def compact(self, delete: bool = False) -> dict:
+        """turn the daily observations into intervals - merged with the intervals there are
+
+        'delete' - remove the observations afterwards and give their space back
+        """
+        count = lambda table: self.connector.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        stats = {"observations": count("price_observations")}
+
+        self.connector.executescript(f"BEGIN;\n{COMPACT}\nCOMMIT;")
+        stats["intervals"] = count("price_intervals")
+
+        if delete:
+            with self.connector:
+                self.connector.execute("DELETE FROM price_observations")
+            self.connector.execute("VACUUM")
+
+        log.info(f"{self.path}: {stats['observations']} observations to {stats['intervals']} intervals")
+
+        return stats
+
+    def _select_intervals(self, where: str, params: tuple, order: str) -> list[dict]:
+        cursor = self.connector.execute(f"{SELECT_INTERVALS} WHERE {where} ORDER BY {order}", params)
+        return [dict(zip(INTERVALS_COLUMNS, row)) for row in cursor]
+
+    def price_at(self, product_id: str, store_id: str, when: str | Date = None) -> dict | None:
+        """the interval of 'product_id' at 'when', default today - the last known price
+        reads the intervals only, see 'compact' for a daily history
+        """
+        when = epoch(when)
+        found = self._select_intervals(
+            f"p.product_id = ? AND s.store_id = ? AND {VALID_AT}",
+            (str(product_id), str(store_id), when, when),
+            "i.valid_from DESC LIMIT 1",
+        )
+        return found[0] if found else None
+
+    def snapshot_at(self, store_id: str, when: str | Date = None) -> list[dict]:
+        """the intervals of all products of 'store_id' at 'when', default today - intervals only"""
+        when = epoch(when)
+        return self._select_intervals(
+            f"s.store_id = ? AND {VALID_AT}",
+            (str(store_id), when, when),
+            "p.product_id",
+        )
+
+    def intervals(
+        self, product_id: str, store_id: str = None, start: str | Date = None, end: str | Date = None
+    ) -> list[dict]:
+        """the intervals of 'product_id' overlapping 'start' to 'end' (inclusive), oldest first"""
+        where, params = ["p.product_id = ?"], [str(product_id)]
+
+        if store_id is not None:
+            where.append("s.store_id = ?")
+            params.append(str(store_id))
+        if start is not None:
+            where.append("(i.valid_to IS NULL OR i.valid_to > ?)")
+            params.append(epoch(start))
+        if end is not None:
+            where.append("i.valid_from <= ?")
+            params.append(epoch(end))
+
+        return self._select_intervals(" AND ".join(where), tuple(params), "i.valid_from, s.store_id")
+
+    def changes(self, store_id: str, start: str | Date, end: str | Date = None) -> list[dict]:
+        """prices which changed from 'start' to 'end' (inclusive), default today - 'previous_price'
+        is None for new products
+        """
+        return self._select_intervals(
+            "s.store_id = ? AND i.valid_from BETWEEN ? AND ?",
+            (str(store_id), epoch(start), epoch(end)),
+            "i.valid_from, p.product_id",
+        )
+
+    def _select(self, where: str, params: tuple, order: str) -> list[dict]:
+        cursor = self.connector.execute(f"{SELECT_PRICES} WHERE {where} ORDER BY {order}", params)
+        return [dict(zip(PRICES_COLUMNS, row)) for row in cursor]
+
+    def history(
+        self, product_id: str, store_id: str = None, start: str | Date = None, end: str | Date = None
+    ) -> list[dict]:
+        """rows of 'product_id' from 'start' to 'end' (inclusive), oldest first - all stores by default
+        reads the daily observations only, see 'intervals' for change-only writes
+        """
+        where, params = ["p.product_id = ?"], [str(product_id)]
+
+        if store_id is not None:
+            where.append("s.store_id = ?")
+            params.append(str(store_id))
+        if start is not None:
+            where.append("o.observed >= ?")
+            params.append(epoch(start))
+        if end is not None:
+            where.append("o.observed <= ?")
+            params.append(epoch(end))
+
+        return self._select(" AND ".join(where), tuple(params), "o.observed, s.store_id")
+
+    def snapshot(self, store_id: str, date: str | Date = None) -> list[dict]:
+        """all products of 'store_id' on 'date', default today
+        reads the daily observations only, see 'snapshot_at' for change-only writes
+        """
+        return self._select("s.store_id = ? AND o.observed = ?", (str(store_id), epoch(date)), "p.product_id")
+
+    def dates(self, store_id: str = None) -> list[str]:
+        """days with rows - of 'store_id' or all stores"""
+        query = "SELECT DISTINCT date(observed, 'unixepoch') FROM price_observations"
+        if store_id is None:
+            cursor = self.connector.execute(f"{query} ORDER BY 1")
+        else:
+            cursor = self.connector.execute(
+                f"{query} JOIN stores USING (store_key) WHERE store_id = ? ORDER BY 1", (str(store_id),)
+            )
+
+        return [row[0] for row in cursor]
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Parsing of raw pages in worker processes
+
+Decoding and parsing a page is pure Python and holds the GIL, so with
+concurrent fetching one core becomes the limit. 'ParallelParser' sends the raw
+bodies - e.g. of 'STORE.paginate(..., raw=True)' - to a process pool. Workers
+decode and parse them and send back compact rows ('Product.to_row') which are
+much cheaper to pickle than the decoded pages.
+
+    with ParallelParser(max_workers=4) as pool:
+        for product in pool.products(my_store.paginate(url, params, raw=True)):
+            ...
+"""
+
+from __future__ import annotations
+
+import os
+import logging
+from typing import Iterable, Iterator
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import codec
+from parser import Parser
+from constants import Product
+from extract import extract_product_tiles, extract_search_result
+
+log = logging.getLogger(__name__)
+
+# shape of a page - where its products are and how they are extracted
+PAGE_KINDS = {
+    "search": (("_embedded", "products"), extract_search_result),
+    "product-tiles": ((), extract_product_tiles),
+}
+
+
+def parse_page(raw: bytes, kind: str = "search") -> list[tuple]:
+    """decode a page and return the rows of its products - runs in the workers"""
+    path, extract = PAGE_KINDS[kind]
+
+    products = codec.loads(raw)
+    for key in path:
+        products = products.get(key, {})
+
+    product_md = Parser._product_md
+
+    return [product_md(*extract(product)).to_row() for product in products or ()]
+
+
+class ParallelParser:
+    def __init__(
+        self, max_workers: int = None, ordered: bool = True, kind: str = "search", window: int = None
+    ):
+        """'max_workers' - processes, default the number of cores
+        'ordered' - batches in the order of the pages, else as soon as they are parsed
+        'window' - pages in flight, default twice the workers - bounds the memory of long crawls
+        """
+        if kind not in PAGE_KINDS:
+            raise ValueError(f"'kind' has to be one of {list(PAGE_KINDS)}, not {kind!r}")
+
+        self.kind = kind
+        self.ordered = ordered
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.window = window or 2 * self.max_workers
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def __repr__(self):
+        return f"ParallelParser(workers={self.max_workers}, ordered={self.ordered})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def batches(self, pages: Iterable[bytes]) -> Iterator[list[tuple]]:
+        """the rows of every page in 'pages' - one list per page"""
+        pages = iter(pages)
+        in_flight = deque()
+
+        def submit_next() -> bool:
+            raw = next(pages, None)
+            if raw is None:
+                return False
+
+            in_flight.append(self.executor.submit(parse_page, raw, self.kind))
+            return True
+
+        try:
+            while len(in_flight) < self.window and submit_next():
+                pass
+
+            while in_flight:
+                if self.ordered:
+                    done = [in_flight.popleft()]
+                else:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    done = [future for future in in_flight if future in finished]
+                    for future in done:
+                        in_flight.remove(future)
+
+                for future in done:
+                    submit_next()
+                    yield future.result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def products(self, pages: Iterable[bytes]) -> Iterator[Product]:
+        """'Product' of every row of 'batches'"""
+        for rows in self.batches(pages):
+            for row in rows:
+                yield Product(*row)
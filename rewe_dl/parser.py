@@ -6,10 +6,13 @@ from __future__ import annotations
 
 import logging
 from typing import Iterator
-from dataclasses import asdict
 
+from dedup import DedupIndex
+from batch import ProductBatch
+from ranking import top_k, external_sort
+from extract import extract_product_tiles, extract_search_result
 from constants import Product
-from formatter import price_cent_to_numeric
+from formatter import euros_to_cents
 
 log = logging.getLogger(__name__)
 
@@ -26,13 +29,15 @@ class Parser:
     def __repr__(self):
         return f'Parser(f"{self.BASE_URL!s}, {self.STORE_ID!s}")'
 
-    def calculate_savings(md: dict) -> float:
-        """return a float of 'you would save' amount"""
+    def calculate_savings(md: dict) -> int | float:
+        """return the 'you would save' amount - cents for cents, else a float of euros"""
+        old_price, price = md.get("old_price"), md.get("price")
 
-        saved = float(md.get("old_price")) - float(md.get("price"))
+        if isinstance(old_price, int) and isinstance(price, int):
+            return old_price - price
 
-        # return float(saved)
-        return float(f"{saved:.2f}")
+        # euros - subtract cents, not floats
+        return (euros_to_cents(old_price) - euros_to_cents(price)) / 100
 
     def parse_website_links(self, found_links: Iterator[str] = None) -> Iterator[Product]:
         """run 'Cli().from_links' with given 'found_links'"""
@@ -49,92 +54,36 @@ class Parser:
     def _from_emebedded(data: dict, key: str, default=[]):
         return data.get("_embedded", {}).get(key, default)
 
-    def _get_picture(self, media: dict) -> str:
-        picture_url = media.get("images", [])[0].get("_links").get("self", {}).get("href", "")
-
-        return picture_url
+    @staticmethod
+    def _product_md(
+        product: str, product_id: str, nan: str, brand: str, old_price: int, price: int, picture: str
+    ) -> Product:
+        """'Product' of the extracted values - prices stay in cents"""
+        # no 'regularPrice' - not discounted
+        old_price = old_price or price
+
+        return Product(
+            "rewe.de",
+            product,
+            f"https://rewe.de/produkte/{nan}",
+            product_id,
+            price,
+            old_price,
+            old_price - price,
+            brand,
+            picture,
+        )
 
     def product_md_from_product(self, product: dict) -> Product:
-        """return a dict parsed from e.x 'alternatives' > 'products'"""
-
-        media = product.get("media", {})
-        article = product.get("_embedded", {}).get("articles")[0]  # only one article in fact
-
-        listing = article.get("_embedded", {}).get("listing", {})
-        pricing = listing.get("pricing", {})
-
-        product_description = product.get("productName", "")
-        product_id = product.get("id", "")
-        nan = product.get("nan", "")
-        brand = product.get("brand", {}).get("name", "")
-
-        old_price = pricing.get("discount", {}).get("regularPrice", 0)
-        price = pricing.get("currentRetailPrice", 0)
-        picture = self._get_picture(media)
-
-        price = price_cent_to_numeric(price)
-
-        old_price = price_cent_to_numeric(old_price)
-        if old_price == 0.0:
-            old_price = price
-
-        _product_dict = {}
-
-        _product_dict["store"] = "rewe.de"
+        """return a 'Product' parsed from e.x 'alternatives' > 'products'"""
 
-        _product_dict["product"] = product_description
-
-        _product_dict["link"] = f"https://rewe.de/produkte/{nan}"
-
-        _product_dict["product_id"] = product_id
-
-        _product_dict["price"] = price
-        _product_dict["old_price"] = old_price
-
-        _product_dict["saved"] = Parser.calculate_savings(md=_product_dict)
-
-        _product_dict["brand"] = brand
-        _product_dict["picture"] = picture
-
-        return asdict(Product(**_product_dict))
+        return Parser._product_md(*extract_search_result(product))
 
     def parse_product_infos(self, product_infos: list[dict]) -> Iterator[Product]:
-        for product in product_infos:
-            # fmt: off
-            product_description = product.get("productName", "")
-            product_id          = product.get("productId", product.get("id", ""))
-            nan                 = product.get("nan", "")
-            brand               = product.get("brandKey", product.get("manufacturer", {}).get("name", ""))
-            old_price           = product.get("pricing", {}).get("regularPrice", 0)
-            price               = product.get("pricing", {}).get("price", 0)
-            picture             = product.get("mediaInformation", [])[0].get("mediaUrl", "")
-            # fmt: on
-
-            price = price_cent_to_numeric(price)
-
-            old_price = price_cent_to_numeric(old_price)
-            if old_price == 0.0:
-                old_price = price
-
-            _product_dict = {}
+        product_md = Parser._product_md
 
-            _product_dict["store"] = "rewe.de"
-
-            _product_dict["product"] = product_description
-
-            _product_dict["link"] = f"https://rewe.de/produkte/{nan}"
-
-            _product_dict["product_id"] = product_id
-
-            _product_dict["price"] = price
-            _product_dict["old_price"] = old_price
-
-            _product_dict["saved"] = Parser.calculate_savings(md=_product_dict)
-
-            _product_dict["brand"] = brand
-            _product_dict["picture"] = picture
-
-            yield asdict(Product(**_product_dict))
+        for product in product_infos:
+            yield product_md(*extract_product_tiles(product))
 
     def parse_product_from_offers(self, products: Iterator[dict]) -> Iterator:
         for product in products:
@@ -146,27 +95,80 @@ class Parser:
         """returns 'products' key from search result"""
         return Parser._from_emebedded(response, "products")
 
-    def parse_search_results_products(self, search_result: Iterator[dict]):
-        """returns 'Product' asdict for every product in 'search_result'"""
+    def parse_search_results_products(
+        self, search_result: Iterator[dict], order: str = "page", top: int = None, dedup: DedupIndex = None
+    ) -> Iterator[Product]:
+        """returns a 'Product' for every product in 'search_result'
+
+        'order' - by 'saved' amount, high-to-low:
+            "page"   - within each page
+            "stream" - not sorted, every product as soon as its page is parsed
+            "global" - across all pages, bigger crawls are sorted on disk
+        'top' - only the 'top' products with the highest 'saved' of all pages, 'order' is ignored
+        'dedup' - products already in this index are neither parsed nor returned
+        """
+        if order not in ("page", "stream", "global"):
+            raise ValueError(f"'order' has to be 'page', 'stream' or 'global', not {order!r}")
+
+        parsed = self._parse_pages(search_result, sort_pages=order == "page" and top is None, dedup=dedup)
+
+        if top is not None:
+            yield from top_k(parsed, top, key=self._sort_by_saved)
+        elif order == "global":
+            yield from external_sort(parsed, key=self._sort_by_saved)
+        else:
+            yield from parsed
+
+    def _parse_pages(
+        self, search_result: Iterator[dict], sort_pages: bool = True, dedup: DedupIndex = None
+    ) -> Iterator[Product]:
         for search_results_page in search_result:
-            products = Parser().get_search_results_products(search_results_page)
+            products = self.get_search_results_products(search_results_page)
+            if dedup is not None:
+                products = dedup.filter(products)
 
-            parsed = Parser().parse_product_from_offers(products)
+            parsed = self.parse_product_from_offers(products)
 
-            # sort by 'saved' amount - high-to-low
-            parsed = sorted(parsed, key=self._sort_by_saved, reverse=True)
+            if sort_pages:
+                # sort by 'saved' amount - high-to-low
+                parsed = sorted(parsed, key=self._sort_by_saved, reverse=True)
 
             yield from parsed
 
+    def parse_raw_pages(
+        self, pages: Iterator[bytes], max_workers: int = None, ordered: bool = True
+    ) -> Iterator[Product]:
+        """'Product' of raw search result pages - e.g. 'paginate(..., raw=True)' -
+        decoded and parsed in 'max_workers' processes, see 'parallel.ParallelParser'
+        """
+        from parallel import ParallelParser
+
+        with ParallelParser(max_workers, ordered=ordered) as pool:
+            yield from pool.products(pages)
+
+    def parse_batch(self, search_result: dict | Iterator[dict]) -> ProductBatch:
+        """one columnar 'ProductBatch' of a search result page or of all its pages"""
+        pages = [search_result] if isinstance(search_result, dict) else search_result
+
+        batch = ProductBatch()
+        for search_results_page in pages:
+            batch.extend(self.get_search_results_products(search_results_page))
+
+        return batch
+
+    def parse_product_infos_batch(self, product_infos: list[dict]) -> ProductBatch:
+        """'parse_product_infos' as a 'ProductBatch'"""
+        return ProductBatch.from_products(product_infos, extract=extract_product_tiles)
+
     def parse_alternatives(self, search_result: Iterator[dict]):
         """convinience function for better naming"""
 
         products = Parser().parse_search_results_products(search_result)
         return products
 
-    def parse_search_category(self, search_result: Iterator[dict]):
+    def parse_search_category(self, search_result: Iterator[dict], **kwargs):
         """convinience function for better naming"""
-        return self.parse_search_results_products(search_result)
+        return self.parse_search_results_products(search_result, **kwargs)
 
     def _sort_by_key(self, item, key: str):
         return item.get(key, "")
@@ -4,11 +4,12 @@ from __future__ import annotations
 
 import os
 import sys
-import json
 import types
 import logging
+import functools
 from pathlib import Path
 
+import codec
 from postprocessor.common import PostProcessor
 
 log = logging.getLogger(__name__)
@@ -36,7 +37,7 @@ class MetadataPP(PostProcessor):
             self.content_format = self.content_format or ""
         elif self.mode in ["json", "jsonl"]:
             self.writer = self._write_json
-            self._json_encode = self._make_encoder().encode
+            self._json_encode = self._make_encoder()
             self.open_mode = "a" if self.mode == "jsonl" else "w"
         else:
             raise ValueError(f"Unsupported mode: {self.mode}")
@@ -55,18 +56,22 @@ class MetadataPP(PostProcessor):
         if isinstance(obj, types.NoneType):
             return None
 
+        # 'Product'
+        if hasattr(obj, "to_dict"):
+            return obj.to_dict()
+
         if isinstance(obj, types.GeneratorType):
             return list(obj)
 
         return str(obj)
 
     def _make_encoder(self):
-        return json.JSONEncoder(
+        return functools.partial(
+            codec.dumps,
             ensure_ascii=self.options.get("ascii", False),
             sort_keys=self.options.get("sort", False),
             separators=self.options.get("separators"),
             indent=self.options.get("indent"),
-            check_circular=False,
             default=self.json_default,
         )
 
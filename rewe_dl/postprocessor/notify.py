@@ -13,10 +13,10 @@ from json import dumps
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.dirname(PROJECT_DIR))
 
+from client import make_client
+from ratelimit import get_limiter
 from postprocessor.common import PostProcessor
 
-import httpx
-
 log = logging.getLogger(__name__)
 
 
@@ -82,26 +82,30 @@ class NotifyPP(PostProcessor):
 
             headers.update({"Authorization": f"Bearer {access_token}"})
 
-            r = httpx.put(
-                homeserver + endpoint,
-                content=dumps(
-                    {
-                        "format": "org.matrix.custom.html",
-                        "body": message_plain,
-                        "formatted_body": message_html,
-                        "msgtype": "m.text",
-                    },
-                    # https://spec.matrix.org/v1.11/appendices/
-                    # Encode code-points outside of ASCII as UTF-8 rather than \u escapes
-                    ensure_ascii=False,
-                    # Remove unnecessary white space.
-                    separators=(",", ":"),
-                    # Sort the keys of dictionaries.
-                    sort_keys=True,
-                    # Encode the resulting Unicode as UTF-8 bytes.
-                ).encode("UTF-8"),
-                headers=headers,
-            )
+            get_limiter().acquire(homeserver)
+
+            # no cookies of the REWE session - a client of its own on the shared pool
+            with make_client() as client:
+                r = client.put(
+                    homeserver + endpoint,
+                    content=dumps(
+                        {
+                            "format": "org.matrix.custom.html",
+                            "body": message_plain,
+                            "formatted_body": message_html,
+                            "msgtype": "m.text",
+                        },
+                        # https://spec.matrix.org/v1.11/appendices/
+                        # Encode code-points outside of ASCII as UTF-8 rather than \u escapes
+                        ensure_ascii=False,
+                        # Remove unnecessary white space.
+                        separators=(",", ":"),
+                        # Sort the keys of dictionaries.
+                        sort_keys=True,
+                        # Encode the resulting Unicode as UTF-8 bytes.
+                    ).encode("UTF-8"),
+                    headers=headers,
+                )
 
             if r.status_code == 200:
                 log.info("Notification sent!")
@@ -121,4 +125,7 @@ class NotifyPP(PostProcessor):
         endpoint = f"/bot{token}/sendMessage"
         params = {"chat_id": chat_id, "text": text}
 
-        httpx.get(base_api_url + endpoint, params=params)
+        get_limiter().acquire(base_api_url)
+
+        with make_client() as client:
+            client.get(base_api_url + endpoint, params=params)
@@ -9,7 +9,10 @@ import logging
 import sqlite3
 from pathlib import Path
 from datetime import datetime
+from itertools import islice
+from typing import Iterable
 
+from constants import PRODUCT_FIELDS
 from postprocessor.common import PostProcessor
 
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -20,6 +23,160 @@ OUT_DIR = PROJECT_ROOT + "/data/"
 
 log = logging.getLogger(__name__)
 
+# the fields of 'Product' and the time of the crawl
+DEALS_COLUMNS = PRODUCT_FIELDS + ("date",)
+
+# WAL lets readers work while a crawl is written, NORMAL syncs only at checkpoints in WAL mode
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    # negative - KiB instead of pages
+    ("cache_size", -64_000),
+    ("temp_store", "MEMORY"),
+)
+
+CREATE_DEALS = """
+CREATE TABLE IF NOT EXISTS deals  (
+store TEXT,
+product TEXT,
+link TEXT,
+product_id TEXT,
+price INTEGER,
+old_price INTEGER,
+saved INTEGER,
+brand TEXT,
+picture TEXT,
+date TEXT,
+PRIMARY KEY ("product_id", "date")
+)
+WITHOUT ROWID;
+"""
+
+PRICE_COLUMNS = ("price", "old_price", "saved")
+
+# 'deals' of files written before the prices were cents - REAL columns of euros
+MIGRATE_DEALS = """
+BEGIN;
+ALTER TABLE deals RENAME TO deals_euros;
+{create}
+INSERT INTO deals ({columns}) SELECT {values} FROM deals_euros;
+DROP TABLE deals_euros;
+COMMIT;
+""".format(
+    create=CREATE_DEALS,
+    columns=", ".join(DEALS_COLUMNS),
+    values=", ".join(
+        f"CAST(ROUND({column} * 100) AS INTEGER)" if column in PRICE_COLUMNS else column
+        for column in DEALS_COLUMNS
+    ),
+)
+
+UPSERT_DEALS = "INSERT INTO deals ({0}) VALUES ({1}) ON CONFLICT (product_id, date) DO UPDATE SET {2}".format(
+    ", ".join(DEALS_COLUMNS),
+    ", ".join("?" for _ in DEALS_COLUMNS),
+    ", ".join(f"{column} = excluded.{column}" for column in PRODUCT_FIELDS if column != "product_id"),
+)
+
+# ids per lookup of existing rows - well below SQLITE_MAX_VARIABLE_NUMBER
+LOOKUP_SIZE = 500
+
+
+def product_row(product) -> tuple:
+    """the values of 'product' in 'PRODUCT_FIELDS' order - 'Product' or a dict"""
+    if hasattr(product, "to_row"):
+        return product.to_row()
+
+    # by name - dicts may have other keys or another order
+    return tuple(product.get(field) for field in PRODUCT_FIELDS)
+
+
+def connect(databank_file: str, pragmas: Iterable[tuple] = PRAGMAS) -> sqlite3.Connection:
+    connector = sqlite3.connect(databank_file, timeout=10, check_same_thread=False)
+
+    for name, value in pragmas:
+        connector.execute(f"PRAGMA {name} = {value}")
+
+    return connector
+
+
+class SqlWriter:
+    """Bulk writer of the 'deals' table - one connection for all writes.
+
+    Every batch of 'batch_size' rows is one transaction of a prepared
+    'executemany' upsert, a product of the same date replaces the old row.
+
+        with SqlWriter("deals.sqlite3") as writer:
+            writer.write(products)  # {"inserted": 250, "updated": 0}
+    """
+
+    def __init__(self, databank_file: str, batch_size: int = 10_000):
+        if batch_size < 1:
+            raise ValueError(f"'batch_size' has to be at least 1, not {batch_size}")
+
+        self.databank_file = databank_file
+        self.batch_size = batch_size
+
+        self.connector = connect(databank_file)
+        self._migrate()
+        with self.connector:
+            self.connector.execute(CREATE_DEALS)
+
+    def __repr__(self):
+        return f"SqlWriter({self.databank_file})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.connector.close()
+
+    def _migrate(self) -> None:
+        """convert the euros of an old 'deals' table to cents - rows of both units must not mix"""
+        types = {row[1]: row[2].upper() for row in self.connector.execute("PRAGMA table_info(deals)")}
+        if not any(types.get(column) == "REAL" for column in PRICE_COLUMNS):
+            return
+
+        log.info(f"{self.databank_file}: converting the euro prices of 'deals' to cents")
+        self.connector.executescript(MIGRATE_DEALS)
+
+    def _existing(self, product_ids: set, date: str) -> int:
+        """how many of 'product_ids' already have a row of 'date'"""
+        ids, found = list(product_ids), 0
+
+        for start in range(0, len(ids), LOOKUP_SIZE):
+            chunk = ids[start : start + LOOKUP_SIZE]
+            query = "SELECT COUNT(*) FROM deals WHERE date = ? AND product_id IN ({0})".format(
+                ", ".join("?" for _ in chunk)
+            )
+            found += self.connector.execute(query, (date, *chunk)).fetchone()[0]
+
+        return found
+
+    def write(self, products: Iterable, date: str = None) -> dict:
+        """upsert 'products' ('Product' or dicts) with 'date', default now - rows inserted and updated"""
+        date = date or datetime.today().strftime("%Y-%m-%d %H:%M:%S")
+        products = iter(products)
+        stats = {"inserted": 0, "updated": 0}
+
+        while batch := [(*product_row(product), date) for product in islice(products, self.batch_size)]:
+            # 'product_id' is the fourth column
+            product_ids = {row[3] for row in batch}
+
+            with self.connector:
+                # the lookup belongs to the transaction of the batch
+                self.connector.execute("BEGIN")
+                # repeated ids of a batch update their own first row
+                inserted = len(product_ids) - self._existing(product_ids, date)
+                self.connector.executemany(UPSERT_DEALS, batch)
+
+            stats["inserted"] += inserted
+            stats["updated"] += len(batch) - inserted
+
+        return stats
+
 
 class SqlPP(PostProcessor):
     def __init__(self, md_list, options):
@@ -27,61 +184,16 @@ class SqlPP(PostProcessor):
         PostProcessor.__init__(self, md_list)
 
     @staticmethod
-    def sql_insert(databank_file: str, md_list: list):
-        # log.debug(f"sqlite3 Metadata: {sqlite3.version}, {sqlite3.sqlite_version}")
-
-        connector = sqlite3.connect(databank_file, timeout=10, check_same_thread=False)
-        cursor = connector.cursor()
-
-        sql_query = """
-        CREATE TABLE IF NOT EXISTS deals  (
-        store TEXT,
-        product TEXT,
-        link TEXT,
-        product_id TEXT,
-        price REAL,
-        old_price REAL,
-        saved REAL,
-        brand TEXT,
-        picture TEXT,
-        date TEXT,
-        PRIMARY KEY ("product_id", "date")
-        )
-        WITHOUT ROWID;
-        """
+    def sql_insert(databank_file: str, md_list: list) -> dict:
+        """upsert 'md_list' into the 'deals' table of 'databank_file' - rows inserted and updated"""
+        with SqlWriter(databank_file) as writer:
+            stats = writer.write(md_list)
+
+        log.info(f"{databank_file}: {stats['inserted']} rows inserted, {stats['updated']} updated")
+
+        return stats
 
-        cursor.execute(sql_query)
-
-        time = datetime.today().strftime("%Y-%m-%d %H:%M:%S")
-
-        replaced_fields = False
-        for product in md_list:
-            #
-            product["time"] = time
-            #
-            values = list(product.values())
-
-            try:
-                cursor.execute(
-                    "INSERT INTO deals VALUES ({0})".format(", ".join("?" for _ in product.keys())),
-                    (values),
-                )
-
-            except Exception:
-                # log.info(e)
-                replaced_fields = True
-                cursor.execute(
-                    "INSERT or REPLACE INTO deals VALUES ({0})".format(
-                        ", ".join("?" for _ in product.keys())
-                    ),
-                    (values),
-                )
-
-        connector.commit()
-        connector.close()
-        log.info(f"Replaced fields: {replaced_fields}")
-
-    def save_to_sql(md: list = [], file_name: str = None):
+    def save_to_sql(md: list = [], file_name: str = None) -> dict:
         if not file_name:
             todays_date = datetime.today().strftime("%Y-%m-%d")
 
@@ -90,4 +202,22 @@ class SqlPP(PostProcessor):
         os.makedirs(OUT_DIR, exist_ok=True)
         out_file = Path(OUT_DIR) / file_name
 
-        SqlPP.sql_insert(out_file, md)
+        return SqlPP.sql_insert(out_file, md)
+
+    def save_to_history(
+        md: list = [], store_id: str = None, path: str = None, mode: str = "daily", complete: bool = False
+    ) -> dict:
+        """add 'md' of 'store_id' to the price history of all crawls, default 'data/price_history.sqlite3'
+
+        'mode' - "changes" writes only changed prices
+        'complete' - 'md' are all products of the store, see 'PriceHistory.write'
+        """
+        # 'history' imports this module
+        from history import PriceHistory
+
+        with PriceHistory(path, mode=mode) as history:
+            stats = history.write(md, store_id, complete=complete)
+
+        log.info(f"{history.path}: {stats['inserted']} rows inserted, {stats['updated']} updated")
+
+        return stats
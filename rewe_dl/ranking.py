@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Ordering of parsed products across all pages of a crawl
+
+- 'TopK' / 'top_k': the k best products in a bounded heap - O(n log k) time, O(k) memory
+- 'external_sort': a complete order of any number of products - sorted runs of
+  'run_size' products are spilled to temporary files and merged lazily
+
+Ties keep the order in which the products arrived, like 'sorted'.
+"""
+
+from __future__ import annotations
+
+import os
+import heapq
+import logging
+import tempfile
+from operator import itemgetter
+from itertools import count, islice
+from typing import Any, Callable, Iterable, Iterator
+
+import codec
+
+log = logging.getLogger(__name__)
+
+
+def _key_func(key: str | Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """a field name works for 'Product' and dicts alike"""
+    return key if callable(key) else itemgetter(key)
+
+
+class TopK:
+    """the 'k' products with the highest 'key' of everything pushed so far"""
+
+    def __init__(self, k: int, key: str | Callable[[Any], Any] = "saved"):
+        if k < 1:
+            raise ValueError(f"'k' has to be at least 1, not {k}")
+
+        self.k = k
+        self.key = _key_func(key)
+        self.seen = 0
+
+        # min-heap of (key, -arrival, product) - the root is the first to go
+        self._heap = []
+        self._arrival = count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, product) -> None:
+        self.seen += 1
+        entry = (self.key(product), -next(self._arrival), product)
+
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def extend(self, products: Iterable) -> TopK:
+        for product in products:
+            self.push(product)
+
+        return self
+
+    def result(self) -> list:
+        """best first"""
+        return [product for *_, product in sorted(self._heap, key=itemgetter(0, 1), reverse=True)]
+
+
+def top_k(products: Iterable, k: int, key: str | Callable[[Any], Any] = "saved") -> list:
+    """the 'k' products with the highest 'key' - best first"""
+    return TopK(k, key).extend(products).result()
+
+
+def _spill(run: list, folder: str) -> str:
+    """write a sorted run as json lines - 'Product' as its row"""
+    fd, path = tempfile.mkstemp(suffix=".jsonl", prefix="run-", dir=folder)
+
+    with os.fdopen(fd, "w", encoding="utf-8") as fp:
+        for item in run:
+            row = item.to_row() if hasattr(item, "to_row") else item
+            fp.write(codec.dumps(row, separators=(",", ":"), ensure_ascii=False) + "\n")
+
+    return path
+
+
+def _read_run(path: str, make: Callable[..., Any] = None) -> Iterator:
+    """the items of a run - 'make' builds them again from rows"""
+    with open(path, encoding="utf-8") as fp:
+        for line in fp:
+            value = codec.loads(line)
+            yield make(*value) if make is not None else value
+
+
+def external_sort(
+    products: Iterable,
+    key: str | Callable[[Any], Any] = "saved",
+    reverse: bool = True,
+    run_size: int = 100_000,
+    folder: str = None,
+) -> Iterator:
+    """yield all 'products' ordered by 'key' - at most 'run_size' of them are held in memory
+
+    'folder' - where the runs are written, default the temp directory
+    """
+    if run_size < 1:
+        raise ValueError(f"'run_size' has to be at least 1, not {run_size}")
+
+    key = _key_func(key)
+    products = iter(products)
+
+    run = sorted(islice(products, run_size), key=key, reverse=reverse)
+    if len(run) < run_size:
+        # fits into one run - nothing to spill
+        yield from run
+        return
+
+    # 'Product' or dicts
+    make = type(run[0]) if hasattr(run[0], "to_row") else None
+
+    with tempfile.TemporaryDirectory(prefix="rewe_dl-sort-", dir=folder) as tmp:
+        paths = []
+        while run:
+            paths.append(_spill(run, tmp))
+            run = sorted(islice(products, run_size), key=key, reverse=reverse)
+
+        log.debug(f"Merging {len(paths)} sorted runs of up to {run_size} products")
+
+        # runs are in arrival order, so 'merge' keeps ties stable
+        runs = [_read_run(path, make) for path in paths]
+        yield from heapq.merge(*runs, key=key, reverse=reverse)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Token bucket rate limiting per host
+
+One limiter is shared by every HTTP path of the package (STORE, AsyncSTORE,
+Basket, NotifyPP), so politeness is enforced per host and not per object.
+
+    # 2 requests per second, up to 5 at once, shared between processes
+    set_limiter(RateLimiter(rate=2, burst=5, path="/tmp/rewe_dl-ratelimit.json"))
+"""
+
+from __future__ import annotations
+
+import json
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # not on posix - limit per process only
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """'rate' tokens per second, at most 'burst' tokens can be saved up"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = float(max(burst, 1))
+
+    def __repr__(self):
+        return f"TokenBucket(rate={self.rate}, burst={self.burst:g})"
+
+    def reserve(self, tokens: float, updated: float, now: float) -> tuple[float, float, float]:
+        """take one token from a bucket in state ('tokens', 'updated')
+        returns the new state and the delay until the token may be used
+        """
+        tokens = min(self.burst, tokens + (now - updated) * self.rate) - 1
+        delay = -tokens / self.rate if tokens < 0 else 0.0
+
+        return tokens, now, delay
+
+
+class RateLimiter:
+    """A token bucket per host, safe to share between threads and asyncio tasks.
+    With 'path' set the bucket state lives in a locked file and is shared
+    between processes too.
+
+    'rate' = None or 0 disables limiting, 'per_host' overrides (rate, burst) per host:
+        RateLimiter(rate=1, per_host={"api.telegram.org": (20, 20)})
+    """
+
+    def __init__(
+        self,
+        rate: float | None = 1.0,
+        burst: int = 1,
+        per_host: dict[str, tuple[float, int]] = None,
+        path: str = None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.per_host = per_host or {}
+        self.path = str(path) if path else None
+
+        self._lock = threading.Lock()
+        self._state = {}
+        self._buckets = {}
+
+    def __repr__(self):
+        return f"RateLimiter(rate={self.rate}, burst={self.burst}, path={self.path})"
+
+    def bucket(self, host: str) -> TokenBucket | None:
+        if host not in self._buckets:
+            rate, burst = self.per_host.get(host, (self.rate, self.burst))
+            self._buckets[host] = TokenBucket(rate, burst) if rate else None
+
+        return self._buckets[host]
+
+    @contextmanager
+    def _shared_state(self):
+        """yield the state dict of all hosts, read from and written back to 'self.path'"""
+        if not self.path or fcntl is None:
+            yield self._state
+            return
+
+        with open(self.path, "a+", encoding="utf-8") as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.seek(0)
+                try:
+                    state = json.loads(fp.read() or "{}")
+                except ValueError:
+                    state = {}
+
+                yield state
+
+                fp.seek(0)
+                fp.truncate()
+                fp.write(json.dumps(state))
+                fp.flush()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def reserve(self, url: str) -> float:
+        """take a token for the host of 'url' - returns seconds to wait before sending"""
+        host = urlparse(url).hostname or url
+        bucket = self.bucket(host)
+        if bucket is None:
+            return 0.0
+
+        with self._lock, self._shared_state() as state:
+            now = time.time()
+            tokens, updated = state.get(host, (bucket.burst, now))
+            tokens, updated, delay = bucket.reserve(tokens, updated, now)
+            state[host] = [tokens, updated]
+
+        return delay
+
+    def acquire(self, url: str) -> float:
+        """block until a request to 'url' is allowed"""
+        delay = self.reserve(url)
+        if delay:
+            time.sleep(delay)
+
+        return delay
+
+    async def acquire_async(self, url: str) -> float:
+        """same as 'acquire' but without blocking the event loop"""
+        delay = self.reserve(url)
+        if delay:
+            await asyncio.sleep(delay)
+
+        return delay
+
+
+_limiter = None
+
+
+def set_limiter(limiter: RateLimiter = None, **kwargs) -> RateLimiter:
+    """set the limiter shared by all HTTP paths
+    'kwargs' are passed to a new 'RateLimiter' if 'limiter' is not given
+    """
+    global _limiter
+
+    _limiter = limiter if limiter is not None else RateLimiter(**kwargs)
+
+    return _limiter
+
+
+def get_limiter(**kwargs) -> RateLimiter:
+    """return the shared limiter, on first use create one with 'kwargs'"""
+    if _limiter is None:
+        return set_limiter(**kwargs)
+
+    return _limiter
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Retries with backoff and a circuit breaker per host
+
+'call_with_retry' sends a request until it succeeds or the 'RetryPolicy' gives up:
+    - connection errors and 429/5xx are retried with exponential backoff and jitter
+    - 'Retry-After' of 429/503 responses is respected
+    - after too many failures in a row the 'CircuitBreaker' of the host opens
+      and requests fail fast with 'CircuitOpenError' till 'reset_timeout' passed
+Every request that finally fails raises 'exception.HttpError'.
+
+Only idempotent requests are retried - a POST that timed out may have been applied already.
+"""
+
+from __future__ import annotations
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Callable, Awaitable
+from urllib.parse import urlparse
+from email.utils import parsedate_to_datetime
+
+from exception import HttpError, CircuitOpenError
+
+import httpx
+
+log = logging.getLogger(__name__)
+
+# methods sent again after a timeout or a 429/5xx
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        attempts: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        jitter: bool = True,
+        statuses: tuple[int, ...] = (429, 500, 502, 503, 504),
+    ):
+        """'attempts' - requests in total, 'backoff' * 2 ** attempt seconds between them"""
+        self.attempts = max(int(attempts), 1)
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+        self.jitter = jitter
+        self.statuses = tuple(statuses)
+
+    def __repr__(self):
+        return f"RetryPolicy(attempts={self.attempts}, backoff={self.backoff})"
+
+    def is_retryable(self, response: httpx.Response | None) -> bool:
+        """'None' stands for a connection error"""
+        return response is None or response.status_code in self.statuses
+
+    def delay(self, attempt: int, response: httpx.Response = None) -> float:
+        """seconds to wait before retry number 'attempt' (starting at 0)"""
+        retry_after = self.retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+
+        # "full jitter" - spreads retries of concurrent clients
+        return random.uniform(0, delay) if self.jitter else delay
+
+    @staticmethod
+    def retry_after(response: httpx.Response | None) -> float | None:
+        if response is None or response.status_code not in (429, 503):
+            return None
+
+        value = response.headers.get("retry-after")
+        if not value:
+            return None
+
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+class CircuitBreaker:
+    """per host: open after 'threshold' failed requests in a row,
+    let one trial request through after 'reset_timeout' seconds (half open)
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = int(threshold)
+        self.reset_timeout = float(reset_timeout)
+
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._opened = {}
+
+    def __repr__(self):
+        return f"CircuitBreaker(threshold={self.threshold}, reset_timeout={self.reset_timeout})"
+
+    def before(self, host: str) -> None:
+        """raise 'CircuitOpenError' if requests to 'host' are blocked"""
+        with self._lock:
+            opened = self._opened.get(host)
+            if opened is None:
+                return
+
+            if time.monotonic() - opened < self.reset_timeout:
+                raise CircuitOpenError(f"Too many failures for {host} - circuit open")
+
+            # half open - this request is the trial, block the others meanwhile
+            self._opened[host] = time.monotonic()
+
+    def success(self, host: str) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened.pop(host, None)
+
+    def failure(self, host: str) -> None:
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if self._failures[host] >= self.threshold:
+                if host not in self._opened:
+                    log.error(f"Circuit for {host} opened after {self._failures[host]} failures")
+                self._opened[host] = time.monotonic()
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            return host in self._opened
+
+
+def _raise_for(url: str, response: httpx.Response | None, error: Exception | None):
+    if response is None:
+        raise HttpError(f"{error.__class__.__name__}: {error} for {url}") from error
+
+    raise HttpError(f"HTTP {response.status_code} {response.reason_phrase} for {url}", response)
+
+
+def _is_failure(response: httpx.Response | None) -> bool:
+    return response is None or response.status_code >= 400
+
+
+def is_idempotent(method: str) -> bool:
+    return method.upper() in IDEMPOTENT_METHODS
+
+
+def call_with_retry(
+    send: Callable[[], httpx.Response],
+    url: str,
+    policy: RetryPolicy = None,
+    breaker: CircuitBreaker = None,
+    idempotent: bool = True,
+) -> httpx.Response:
+    """return the response of 'send()', raise 'HttpError' if it finally failed
+    'idempotent' - False sends it only once, see 'is_idempotent'
+    """
+    policy = policy or get_policy()
+    breaker = breaker or get_breaker()
+    host = urlparse(url).hostname or url
+    attempts = policy.attempts if idempotent else 1
+
+    # the breaker counts requests, not attempts
+    breaker.before(host)
+
+    for attempt in range(attempts):
+        response = error = None
+        try:
+            response = send()
+        except httpx.TransportError as e:
+            error = e
+
+        if not policy.is_retryable(response):
+            # a 4xx is an answer of a working host
+            breaker.success(host)
+            if _is_failure(response):
+                # a streamed response holds its connection till closed
+                response.close()
+                _raise_for(url, response, error)
+            return response
+
+        if attempt + 1 < attempts:
+            delay = policy.delay(attempt, response)
+            reason = response.status_code if response is not None else error
+            log.warning(f"Retrying {url} in {delay:.2f}s ({reason})")
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    breaker.failure(host)
+    _raise_for(url, response, error)
+
+
+async def acall_with_retry(
+    send: Callable[[], Awaitable[httpx.Response]],
+    url: str,
+    policy: RetryPolicy = None,
+    breaker: CircuitBreaker = None,
+    idempotent: bool = True,
+) -> httpx.Response:
+    """same as 'call_with_retry' for a coroutine function 'send'"""
+    policy = policy or get_policy()
+    breaker = breaker or get_breaker()
+    host = urlparse(url).hostname or url
+    attempts = policy.attempts if idempotent else 1
+
+    # the breaker counts requests, not attempts
+    breaker.before(host)
+
+    for attempt in range(attempts):
+        response = error = None
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            error = e
+
+        if not policy.is_retryable(response):
+            # a 4xx is an answer of a working host
+            breaker.success(host)
+            if _is_failure(response):
+                # a streamed response holds its connection till closed
+                await response.aclose()
+                _raise_for(url, response, error)
+            return response
+
+        if attempt + 1 < attempts:
+            delay = policy.delay(attempt, response)
+            reason = response.status_code if response is not None else error
+            log.warning(f"Retrying {url} in {delay:.2f}s ({reason})")
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(delay)
+
+    breaker.failure(host)
+    _raise_for(url, response, error)
+
+
+_policy = None
+_breaker = None
+
+
+def set_policy(policy: RetryPolicy = None, **kwargs) -> RetryPolicy:
+    global _policy
+
+    _policy = policy if policy is not None else RetryPolicy(**kwargs)
+
+    return _policy
+
+
+def get_policy() -> RetryPolicy:
+    return _policy if _policy is not None else set_policy()
+
+
+def set_breaker(breaker: CircuitBreaker = None, **kwargs) -> CircuitBreaker:
+    global _breaker
+
+    _breaker = breaker if breaker is not None else CircuitBreaker(**kwargs)
+
+    return _breaker
+
+
+def get_breaker() -> CircuitBreaker:
+    return _breaker if _breaker is not None else set_breaker()
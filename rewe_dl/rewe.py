@@ -5,13 +5,16 @@
 from __future__ import annotations
 
 import os
+import re
 import sys
-import atexit
+import queue
+import asyncio
 import logging
-from time import sleep
-from typing import Iterator
+import threading
+from typing import Callable, Iterator
 from pathlib import Path
-from functools import lru_cache
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse, urlencode
 
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -19,9 +22,39 @@ PROJECT_ROOT = os.path.dirname(PROJECT_DIR)
 DATA_FOLDER = os.path.join(PROJECT_ROOT, "data")
 THIS_FILE = Path(__file__).stem
 
+import codec
 import exception
 from parser import Parser
+from dedup import DedupIndex
+from categories import CategoryTree
 from constants import Product
+from cache import ResponseCache, memoize, get_cache, set_cache, disable_cache
+from client import (
+    configure,
+    make_client,
+    get_session,
+    set_session,
+    close_session,
+    SharedTransport,
+    get_async_session,
+    set_async_session,
+    make_async_client,
+    close_async_session,
+)
+from retry import (
+    RetryPolicy,
+    CircuitBreaker,
+    get_policy,
+    set_policy,
+    get_breaker,
+    set_breaker,
+    is_idempotent,
+    call_with_retry,
+    acall_with_retry,
+)
+from ratelimit import RateLimiter, get_limiter, set_limiter
+from streaming import iter_products
+from singleflight import SingleFlight, get_singleflight, set_singleflight, disable_singleflight
 from exception import InputFileError
 
 import httpx
@@ -39,50 +72,77 @@ logging.basicConfig(
 log = logging.getLogger("__name__")
 
 
-@staticmethod
-def set_session(
-    current_session: httpx.Client = None,
-    default_headers: dict = {},
-    default_cookies: dict = {},
+def send_request(
+    method: str,
+    url: str,
+    params: dict | str = None,
+    store_id: str = None,
+    session: httpx.Client = None,
+    stream: bool = False,
     **kwargs,
 ):
+    """send a request with 'session' - default the global one -
+    through the shared rate limiter, the retry policy and - for GET requests - the response cache
+    raises 'exception.HttpError' when the request finally failed, POST requests are not retried
+
+    'stream' - return before the body is read, bypasses the cache, close the response after use
     """
-    # all default - session without headers nor cookies
-    set_session()
+    session = session or get_session(create=False)
+    if not session or method.lower() not in dir(session):
+        log.error("session not pre set")
+        raise AttributeError
 
-    OR
+    session_method = getattr(session, method.lower())
 
-    # default session - with custom made 'default_headers' and 'default_cookies'
-    set_session(None,
-                default_headers={"default_key": "default_value"},
-                default_cookies={})
+    def send(headers: dict = {}) -> httpx.Response:
+        request_kwargs = dict(kwargs)
+        if headers:
+            request_kwargs["headers"] = {**kwargs.get("headers", {}), **headers}
 
-    OR
+        def attempt() -> httpx.Response:
+            get_limiter().acquire(url)
+            if stream:
+                request = session.build_request(method.upper(), url, params=params, **request_kwargs)
+                return session.send(request, stream=True)
 
-    # custom session
-    my_custom_session = httpx.Client(headers={"key": "value"},
-                                     cookies={"key": "value"})
-    set_session(current_session=my_custom_session)
+            return session_method(url, params=params, **request_kwargs)
 
-    """
+        # a POST may have been applied before it failed
+        return call_with_retry(attempt, url, idempotent=is_idempotent(method))
+
+    response_cache = get_cache()
+    if response_cache and method.lower() == "get" and not stream:
+        return response_cache.fetch(url, params, send, store_id=store_id)
 
-    if not current_session:
-        default = httpx.Client(headers=default_headers, cookies=default_cookies, follow_redirects=True)
-        current_session = default
+    return send()
 
-    else:
-        current_session.headers.update(**kwargs.get("headers", {}))
 
-    globals()["session"] = current_session
+def flight_key(
+    method: str, url: str, params: dict | str = None, store_id: str = None, **kwargs
+) -> str | None:
+    """key of identical requests - None if the request must not be shared (not GET or extra kwargs)"""
+    if method.lower() != "get" or kwargs:
+        return None
 
-    return globals()["session"]
+    return ResponseCache.key(method, url, params, store_id)
 
 
-@atexit.register
-def close_session():
-    session = globals().get("session")
-    if session:
-        session.close()
+def coalesce(key: str | None, func):
+    """'func()' shared with every thread waiting for the same 'key'"""
+    group = get_singleflight()
+    if not group or key is None:
+        return func()
+
+    return group.do(key, func)
+
+
+async def coalesce_async(key: str | None, func):
+    """'coalesce' for a coroutine function 'func'"""
+    group = get_singleflight()
+    if not group or key is None:
+        return await func()
+
+    return await group.do_async(key, func)
 
 
 class Config:
@@ -117,10 +177,12 @@ class Config:
 
         return load_config(file_path)
 
-    def from_web(self, zipcode: str = "56073") -> dict:
+    def from_web(self, zipcode: str = "56073", client: httpx.Client = None) -> dict:
         """load config extracted from web/api
         note that you should leave zipcode as is
         because it is not relevant but must be set
+
+        the cookies are set on 'client' too - default a new one
         """
         # TODO # can the returned cloudflare cookies used to bypass everything??
 
@@ -138,7 +200,17 @@ class Config:
         }
 
         url = base_url + "/" + base_api_endpoint + endpoint
-        r = httpx.post(url, json=payload)
+
+        # own cookie jar on the shared pool - the returned cookies must not leak into the global session
+        own_client = client is None
+        client = client or make_client()
+
+        get_limiter().acquire(url)
+        try:
+            r = client.post(url, json=payload)
+        finally:
+            if own_client:
+                client.close()
 
         config = r.cookies
 
@@ -156,8 +228,7 @@ class Config:
         endpoint = "content-homepage-backend/userdata"
         cookies = self.from_web()
 
-        global session
-        session.cookies.update(cookies)
+        get_session().cookies.update(cookies)
 
         config = STORE().call(
             base_url=base_url,
@@ -206,28 +277,61 @@ class Config:
         return ret_dict
 
     def _ensure_session(self):
-        if not globals().get("session"):
+        if not get_session(create=False):
             try:
                 from utils import create_agents
 
-                log.debug("globals() session is none. Loading...")
+                log.debug("global session is none. Loading...")
                 self.cookies = self.load()
 
-                set_session(None, deafult_headers=create_agents(), default_cookies=self.cookies)
+                set_session(None, default_headers=create_agents(), default_cookies=self.cookies)
             except Exception as e:
                 raise e
 
+    def _make_async_session(self) -> httpx.AsyncClient:
+        """a new async client with the cookies of 'load'"""
+        from utils import create_agents
+
+        log.debug("global async session is none. Loading...")
+        self.cookies = self.load()
+
+        return make_async_client(headers=create_agents(), cookies=self.cookies)
+
+    def _ensure_limiter(self) -> RateLimiter:
+        """the limiter is shared by all instances - 'sleep_request' only sets up the first one"""
+        rate = 1 / self.SLEEP_REQUEST if self.SLEEP_REQUEST > 0 else None
+
+        return get_limiter(rate=rate, burst=1)
+
+
+class ProductInfos(list):
+    """list of products returned by 'STORE.product_infos'
+    'missing' holds the requested ids the API did not return
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.missing: list[str] = []
+
 
 class STORE(Config):
+    # own session of this store - None uses the global one
+    session: httpx.Client | None = None
+
     def __repr__(self):
         return self.__class__.__name__
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, session: httpx.Client = None, **kwargs):
         """Pass '*args' and '**kwargs' to Config class
         so that self.STORE_ID, self.SLEEP_REQUEST etc will be set/re-set
+
+        'session' - a client with cookies of this store, see 'FanOut'
         """
         super().__init__(*args, **kwargs)
-        self._ensure_session()
+        self.session = session
+        if session is None:
+            self._ensure_session()
+        self._ensure_limiter()
 
     def call(
         self,
@@ -245,39 +349,125 @@ class STORE(Config):
             base_api_endpoint = ""
         base_url = urljoin(base_url, "/")
 
-        sleep(self.SLEEP_REQUEST)
+        url = urljoin(base_url, base_api_endpoint + endpoint + "?")
+
+        query = urlencode(params, safe=", !")
+
+        def fetch() -> dict:
+            response = send_request(
+                method, url, params=query, store_id=self.STORE_ID, session=self.session, **kwargs
+            )
+            return codec.loads(response.content)
+
+        # identical requests in flight share one response
+        return coalesce(flight_key(method, url, query, self.STORE_ID, **kwargs), fetch)
+
+    @staticmethod
+    def paginate(
+        url: str,
+        params: dict,
+        page_key: str = "page",
+        max_page: int = 2,
+        method: str = "get",
+        prefetch: int = 0,
+        session: httpx.Client = None,
+        raw: bool = False,
+        **kwargs,
+    ) -> Iterator[dict | bytes]:
+        """Simply increase the 'page_key' by one till 'max_page' is reached
+
+        with 'prefetch' > 0 up to 'prefetch' next pages are fetched in background
+        threads while the consumer is still busy with the current page
+
+        'session' - default the global one
+        'raw' - yield the undecoded bodies, e.g. for 'parallel.ParallelParser'
+        """
+
+        if not url.startswith("http"):
+            raise ValueError
 
-        session = globals().get("session")
-        if not session or not method.lower() in dir(session):
-            log.error("session not pre set")
+        if not isinstance(params, dict):
             raise AttributeError
 
-        if method.lower() in dir(session):
-            session_method = getattr(session, method.lower())
+        if method.lower() not in dir(session or get_session(create=False)):
+            raise AttributeError
 
-            if not session_method:
-                log.error("no session_method")
+        if prefetch > 0:
+            yield from STORE._paginate_prefetch(
+                method, url, params, page_key, max_page, prefetch, session=session, raw=raw, **kwargs
+            )
+            return
+
+        while params.get(page_key) <= max_page:
+            data = STORE._fetch_page(method, url, params, session=session, raw=raw, **kwargs)
+            if data is None:
                 return
 
-        url = urljoin(base_url, base_api_endpoint + endpoint + "?")
+            yield data
 
-        response = session_method(url, params=urlencode(params, safe=", !"), **kwargs)
+            total_pages = STORE._total_pages(data)
 
-        try:
-            return response.json()
-        except Exception as e:
-            raise e
+            if total_pages == 0 or params[page_key] >= (total_pages or max_page):
+                break
+
+            else:
+                params[page_key] += 1
 
     @staticmethod
-    def paginate(
+    def _fetch_page(
+        method: str, url: str, params: dict, session: httpx.Client = None, raw: bool = False, **kwargs
+    ) -> dict | bytes | None:
+        """fetch one page - returns None for a success status without a page (e.g. 204),
+        raises 'exception.HttpError' for 4xx/5xx or when the request failed after all retries
+
+        'raw' - the body without decoding it
+        """
+        store_id = params.get("market")
+
+        def fetch() -> dict | bytes | None:
+            r = send_request(method, url, params=params, store_id=store_id, session=session, **kwargs)
+            if r.status_code in (200, 206):
+                return r.content if raw else codec.loads(r.content)
+
+            log.error(r.status_code)
+            return None
+
+        key = flight_key(method, url, params, store_id, **kwargs)
+        # raw and decoded callers must not share a result
+        if key is not None and raw:
+            key += "#raw"
+
+        return coalesce(key, fetch)
+
+    # 'pagination' of a raw page - product objects have no such key
+    TOTAL_PAGES = re.compile(rb'"totalPages"\s*:\s*(\d+)')
+
+    @staticmethod
+    def _total_pages(data: dict | bytes) -> int | None:
+        """'pagination.totalPages' of a decoded or raw page"""
+        if isinstance(data, dict):
+            return data.get("pagination", {}).get("totalPages")
+
+        match = STORE.TOTAL_PAGES.search(data)
+        return int(match.group(1)) if match else None
+
+    @staticmethod
+    def paginate_products(
         url: str,
         params: dict,
         page_key: str = "page",
         max_page: int = 2,
         method: str = "get",
+        on_page: Callable[[dict], None] = None,
+        session: httpx.Client = None,
         **kwargs,
     ) -> Iterator[dict]:
-        """Simply increase the 'page_key' by one till 'max_page' is reached"""
+        """Same as 'paginate' but yields single products of '_embedded.products'
+        while the body of a page is still downloading - memory stays at about one product.
+
+        'on_page(page)' is called after every page with the rest of it,
+        'pagination', 'facets' etc. - '_embedded.products' is empty
+        """
 
         if not url.startswith("http"):
             raise ValueError
@@ -285,48 +475,135 @@ class STORE(Config):
         if not isinstance(params, dict):
             raise AttributeError
 
-        session = globals().get("session")
-        if method.lower() in dir(session):
-            session_method = getattr(session, method.lower())
-        else:
-            raise AttributeError
-
-        sleep(0.3)
         while params.get(page_key) <= max_page:
-            r = session_method(url, params=params, **kwargs)
-            if r.status_code in (200, 206):
-                data = r.json()
-                yield data
+            page = {}
+            response = send_request(
+                method,
+                url,
+                params=params,
+                store_id=params.get("market"),
+                session=session,
+                stream=True,
+                **kwargs,
+            )
+            try:
+                if response.status_code not in (200, 206):
+                    log.error(response.status_code)
+                    return
 
-                total_pages = data.get("pagination", {}).get("totalPages")
+                yield from iter_products(response.iter_bytes(), page=page)
+            finally:
+                response.close()
 
-                if total_pages == 0 or total_pages == max_page:
-                    break
+            if on_page:
+                on_page(page)
 
-                else:
-                    params[page_key] += 1
+            total_pages = page.get("pagination", {}).get("totalPages")
+
+            if total_pages == 0 or params[page_key] >= (total_pages or max_page):
+                break
 
             else:
-                log.error(r.status_code)
-                log.info(r.status_code)
-                # raise exception.HttpError
-                return
+                params[page_key] += 1
+
+    @staticmethod
+    def _paginate_prefetch(
+        method: str,
+        url: str,
+        params: dict,
+        page_key: str,
+        max_page: int,
+        prefetch: int,
+        session: httpx.Client = None,
+        raw: bool = False,
+        **kwargs,
+    ) -> Iterator[dict | bytes]:
+        """'paginate' with a window of 'prefetch' pages in flight, yielded in order.
+        The first page is needed to know 'totalPages', every later page is fetched in a thread.
+        When the consumer stops early, pending pages are cancelled.
+        """
+        first_page = params.get(page_key)
+
+        data = STORE._fetch_page(method, url, params, session=session, raw=raw, **kwargs)
+        if data is None:
+            return
+
+        total_pages = STORE._total_pages(data)
+        if total_pages is None:
+            total_pages = max_page
+        last_page = first_page if total_pages == 0 else min(max_page, total_pages)
+        pages = iter(range(first_page + 1, last_page + 1))
+
+        executor = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="paginate")
+        in_flight = deque()
+
+        def submit_next():
+            page = next(pages, None)
+            if page is not None:
+                page_params = {**params, page_key: page}
+                in_flight.append(
+                    executor.submit(
+                        STORE._fetch_page, method, url, page_params, session=session, raw=raw, **kwargs
+                    )
+                )
+
+        try:
+            for _ in range(prefetch):
+                submit_next()
+
+            yield data
+
+            while in_flight:
+                data = in_flight.popleft().result()
+                if data is None:
+                    return
+
+                submit_next()
+
+                yield data
+        finally:
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # bytes of comma separated ids per 'product-tiles' request - longer urls get truncated
+    PRODUCT_INFOS_BUDGET = 2000
 
     def product_infos(
         self,
         product_ids: list[str] = None,
         listing_ids: list[str] = None,
         article_ids: list[str] = None,
-    ) -> list[dict]:
-        """returns product information as json for all of
-        given '*_ids' in one request'
+        max_workers: int = 4,
+    ) -> ProductInfos:
+        """returns product information as json for all of given '*_ids'
         At least one of listingIds, productIds or articleIds must be set!
 
+        ids are split into batches of 'PRODUCT_INFOS_BUDGET' bytes which are fetched
+        concurrently, results are in the order of the given ids.
+        ids the API did not return are in the 'missing' attribute of the result.
+
         source of info: 'https://www.rewe.de/shop/api/product-tiles?'
         https://www.rewe.de/shop/api/product-tiles?listingIds=8-P54WB8A8-4e6503bb-5212-3dd3-8a1b-7d0b57d7627f&context=tile&serviceTypes=PICKUP
         https://www.rewe.de/shop/api/product-tiles?productIds=2621809
         """
 
+        param_key, ids, id_keys = self._product_infos_ids(product_ids, listing_ids, article_ids)
+        batches = self._batch_ids(ids, self.PRODUCT_INFOS_BUDGET)
+
+        def fetch(batch: list[str]) -> list[dict]:
+            return self.call(*self._product_infos_request(param_key, batch))
+
+        if len(batches) == 1:
+            responses = [fetch(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="product_infos") as pool:
+                responses = list(pool.map(fetch, batches))
+
+        return self._merge_product_infos(ids, id_keys, responses)
+
+    def _product_infos_request(self, param_key: str, ids: list[str]) -> tuple:
+        """arguments for 'call' to get 'product-tiles' of 'ids'"""
         base_url = "https://www.rewe.de/"
         base_api_endpoint = "shop/api/"
         endpoint = "product-tiles"
@@ -334,25 +611,85 @@ class STORE(Config):
         params = {
             "serviceTypes": "PICKUP",
             "market": self.STORE_ID,  # as seen on -> quickFacets -> constraints
+            param_key: ",".join(ids),
         }
 
+        return base_url, base_api_endpoint, endpoint, params
+
+    @staticmethod
+    def _product_infos_ids(
+        product_ids: list[str] = None,
+        listing_ids: list[str] = None,
+        article_ids: list[str] = None,
+    ) -> tuple[str, list[str], tuple[str, ...]]:
+        """returns the query param, the unique ids in given order
+        and the keys holding the id in a returned product
+        """
         if product_ids:
-            params.update({"productIds": ",".join(product_ids)})
+            param_key, ids, id_keys = "productIds", product_ids, ("productId", "id")
         elif listing_ids:
-            params.update({"listingIds": ",".join(listing_ids)})
+            param_key, ids, id_keys = "listingIds", listing_ids, ("listingId",)
         elif article_ids:
-            params.update({"articleIds": ",".join(article_ids)})
+            param_key, ids, id_keys = "articleIds", article_ids, ("articleId",)
         else:
             raise ValueError("At least one of listingIds, productIds or articleIds must be set!")
 
-        r = self.call(base_url, base_api_endpoint, endpoint, params)
+        return param_key, list(dict.fromkeys(str(_id) for _id in ids)), id_keys
 
-        return r
+    @staticmethod
+    def _batch_ids(ids: list[str], budget: int) -> list[list[str]]:
+        """split 'ids' into batches whose comma separated length fits 'budget' bytes"""
+        batches = [[]]
+        size = 0
+
+        for _id in ids:
+            id_size = len(_id.encode()) + 1
+            if batches[-1] and size + id_size > budget:
+                batches.append([])
+                size = 0
+
+            batches[-1].append(_id)
+            size += id_size
+
+        return batches
+
+    @staticmethod
+    def _merge_product_infos(ids: list[str], id_keys: tuple, responses: list[list[dict]]) -> ProductInfos:
+        """merge batch 'responses' in the order of 'ids'
+        a batch that is no list - an error dict or None - returned none of its ids
+        """
+        by_id = {}
+        unknown = []
+
+        for response in responses:
+            if not isinstance(response, list):
+                continue
+
+            for product in response:
+                if not isinstance(product, dict):
+                    continue
+
+                product_id = next((product.get(key) for key in id_keys if product.get(key)), None)
+                if product_id is None:
+                    unknown.append(product)
+                else:
+                    by_id.setdefault(str(product_id), product)
+
+        merged = ProductInfos(by_id[_id] for _id in ids if _id in by_id)
+        merged.extend(unknown)
+        merged.missing = [_id for _id in ids if _id not in by_id]
 
-    @lru_cache
-    def search(self, search_term: str, max_page: int = 1) -> Iterator[dict]:
+        if merged.missing:
+            log.warning(f"product_infos: {len(merged.missing)} ids not returned: {merged.missing[:10]}")
+
+        return merged
+
+    @memoize(maxsize=64, ttl=10 * 60)
+    def search(
+        self, search_term: str, max_page: int = 1, prefetch: int = 0, raw: bool = False
+    ) -> Iterator[dict | bytes]:
         """search for a term using the API
-        returns an Iterator of dicts"""
+        returns an Iterator of dicts - of raw bodies with 'raw', see 'paginate'"""
         assert search_term is not None, "search_term must not be None"
 
         base_url = "https://www.rewe.de"
@@ -362,7 +699,22 @@ class STORE(Config):
 
         url = f"{base_url}/shop/api/{endpoint}?"
 
-        return self.paginate(url, params, page_key="page", max_page=max_page)
+        return self.paginate(
+            url, params, page_key="page", max_page=max_page, prefetch=prefetch, session=self.session, raw=raw
+        )
+
+    def search_products(
+        self, search_term: str, max_page: int = 1, on_page: Callable[[dict], None] = None
+    ) -> Iterator[dict]:
+        """'search' streamed product by product - see 'paginate_products'"""
+        assert search_term is not None, "search_term must not be None"
+
+        url = "https://www.rewe.de/shop/api/products?"
+        params = {"search": search_term, "market": self.STORE_ID, "page": 1}
+
+        return self.paginate_products(
+            url, params, page_key="page", max_page=max_page, on_page=on_page, session=self.session
+        )
 
     def search_category(self, category_slug: str, **kwargs) -> Iterator[dict]:
         assert category_slug is not None, "category_slug must not be None"
@@ -375,55 +727,38 @@ class STORE(Config):
             attributes=[""], param_key="brand", param_value=brand_name, **kwargs
         )
 
-    def categories(self, search_result: search) -> list[dict]:
-        """return categories and subcategories as a flat list of dicts for given 'search_result'"""
+    def category_tree(self, search_result: search = None, ttl: float | None = 24 * 60 * 60) -> CategoryTree:
+        """'CategoryTree' of the categories in 'search_result'
 
-        categories = subcategories = []
-
-        def get_subcategories(category: dict) -> None:
-            if "subFacetConstraints" in category:
-                for subcategory in category.get("subFacetConstraints"):
-                    if "subFacetConstraints" not in subcategory:
-                        subcategories.append(subcategory)
-
-                    if "subFacetConstraints" in category:
-                        get_subcategories(subcategory)
-
-        for page in search_result:
-            constraints = None
-            facets = page.get("facets", [])
-            for fac in facets:
-                if fac.get("name").lower() == "category":
-                    constraints = fac.get("facetConstraints", [])
-                    break
+        without 'search_result' the saved tree of this store is used while younger than 'ttl' seconds,
+        else it is built from a fresh search page and saved under 'data/'
+        """
+        if search_result is not None:
+            return CategoryTree.from_search_result(search_result, self.STORE_ID)
 
-            for category in constraints:
-                if "subFacetConstraints" not in category:
-                    categories.append(category)
+        tree = CategoryTree.load(self.STORE_ID, ttl)
+        if tree is None:
+            tree = CategoryTree.from_search_result(self.products_by_attribute(max_page=1), self.STORE_ID)
+            if len(tree):
+                tree.save()
 
-                if "subFacetConstraints" in category:
-                    get_subcategories(category)
+        return tree
 
-        # return unique dicts only, as a list
-        # from https://stackoverflow.com/posts/38521207/revisions
-        return [dict(s) for s in set(frozenset(md.items()) for md in categories + subcategories)]
+    def categories(self, search_result: search = None) -> list[dict]:
+        """return categories and subcategories without further subcategories
+        as a flat list of unique dicts for given 'search_result' - see 'category_tree'
+        """
+        return [category.data for category in self.category_tree(search_result).leaves()]
 
-    def category_names(self, search_result: search) -> list:
+    def category_names(self, search_result: search = None) -> list:
         """return a list of unique category names found in 'search_result'"""
-        names = set()
-        [names.add(category.get("name")) for category in self.categories(search_result)]
-
-        return list(names)
+        return list(dict.fromkeys(category.name for category in self.category_tree(search_result).leaves()))
 
-    def category_slugs(self, search_result: search) -> list:
+    def category_slugs(self, search_result: search = None) -> list:
         """return a list of unique category slugs like:
         ['kochen-backen', 'kaese-eier-molkerei'] found in 'search_result'
         """
-        slugs = set()
-        for category in self.categories(search_result):
-            slugs.add(category.get("slug"))
-
-        return list(slugs)
+        return self.category_tree(search_result).leaf_slugs()
 
     def product_ids(self, search_result: search) -> Iterator[str]:
         """yield product ids from 'search_result'"""
@@ -463,10 +798,13 @@ class STORE(Config):
         param_key: str = "",
         param_value: str = "",
         max_page: int = 1,
-    ) -> Iterator[dict]:
+        prefetch: int = 0,
+        raw: bool = False,
+    ) -> Iterator[dict | bytes]:
         """returns an iter of products for 'attribute=something"
         and/or 'param_key="filter"' and param_value="nothing"
         until 'max_page' is reached.
+        'prefetch', 'raw' - see 'paginate'
 
         # front end -> https://www.rewe.de/shop/productList?attribute=lactosefree&attribute=glutenfree
         # https://www.rewe.de/shop/api/products?attribute=new&objectsPerPage=40&page=1&search=*&sorting=RELEVANCE_DESC&serviceTypes=PICKUP&market=1940419&debug=false&autocorrect=true
@@ -495,35 +833,37 @@ class STORE(Config):
 
         url = f"{base_url}/shop/api/{endpoint}"
 
-        return self.paginate(url, params, page_key="page", max_page=max_page)
+        return self.paginate(
+            url, params, page_key="page", max_page=max_page, prefetch=prefetch, session=self.session, raw=raw
+        )
 
-    def get_discounted_products(self, max_page: int = 2):
+    def get_discounted_products(self, max_page: int = 2, **kwargs):
         """These 'get_*' funcs are for ease of use"""
 
-        return self.products_by_attribute(attributes=["discounted"], max_page=max_page)
+        return self.products_by_attribute(attributes=["discounted"], max_page=max_page, **kwargs)
 
-    def get_vegan_products(self, max_page: int = 2):
-        return self.products_by_attribute(attributes=["vegan"], max_page=max_page)
+    def get_vegan_products(self, max_page: int = 2, **kwargs):
+        return self.products_by_attribute(attributes=["vegan"], max_page=max_page, **kwargs)
 
-    def get_new_products(self, max_page: int = 2):
-        return self.products_by_attribute(attributes=["new"], max_page=max_page)
+    def get_new_products(self, max_page: int = 2, **kwargs):
+        return self.products_by_attribute(attributes=["new"], max_page=max_page, **kwargs)
 
-    def get_vegetarian_products(self, max_page: int = 2):
-        return self.products_by_attribute(attributes=["vegetarian"], max_page=max_page)
+    def get_vegetarian_products(self, max_page: int = 2, **kwargs):
+        return self.products_by_attribute(attributes=["vegetarian"], max_page=max_page, **kwargs)
 
-    def get_lactosefree_products(self, max_page: int = 2):
-        return self.products_by_attribute(attributes=["lactosefree"], max_page=max_page)
+    def get_lactosefree_products(self, max_page: int = 2, **kwargs):
+        return self.products_by_attribute(attributes=["lactosefree"], max_page=max_page, **kwargs)
 
-    def get_glutenfree_products(self, max_page: int = 2):
-        return self.products_by_attribute(attributes=["glutenfree"], max_page=max_page)
+    def get_glutenfree_products(self, max_page: int = 2, **kwargs):
+        return self.products_by_attribute(attributes=["glutenfree"], max_page=max_page, **kwargs)
 
-    def get_organic_products(self, max_page: int = 2):
-        return self.products_by_attribute(attributes=["organic"], max_page=max_page)
+    def get_organic_products(self, max_page: int = 2, **kwargs):
+        return self.products_by_attribute(attributes=["organic"], max_page=max_page, **kwargs)
 
-    def get_regional_products(self, max_page: int = 2):
-        return self.products_by_attribute(attributes=["regional"], max_page=max_page)
+    def get_regional_products(self, max_page: int = 2, **kwargs):
+        return self.products_by_attribute(attributes=["regional"], max_page=max_page, **kwargs)
 
-    @lru_cache
+    @memoize(maxsize=16, ttl=60 * 60)
     def current_userdata(self) -> dict:
         """Return a dict with current store informations.
         # https://www.rewe.de/content-homepage-backend/userdata
@@ -558,7 +898,7 @@ class STORE(Config):
 
         return response.json()
 
-    @lru_cache
+    @memoize(maxsize=128, ttl=60 * 60)
     def suggestions(self, search_term: str) -> dict:
         """returns a dict containing product infos like listingsIds - to be used in 'product_infos'"""
         """https://www.rewe.de/shop/api/suggestions?q=TUC"""
@@ -622,6 +962,290 @@ class STORE(Config):
         # return list(self._yield_from_key(search_results, key="alternatives"))
 
 
+class AsyncSTORE(STORE):
+    """Same surface as 'STORE' but built on 'httpx.AsyncClient'
+
+    Pages of one query and independent queries are fetched concurrently,
+    at most 'max_concurrency' requests are in flight at the same time.
+
+    async with AsyncSTORE(store_id="8534540", max_concurrency=8) as store:
+        async for page in store.get_discounted_products(max_page=5):
+            ...
+
+        results = await store.search_many(["milch", "tuc"], max_page=2)
+    """
+
+    def __repr__(self):
+        return self.__class__.__name__
+
+    def __init__(self, *args, max_concurrency: int = 8, session: httpx.AsyncClient = None, **kwargs):
+        """Pass '*args' and '**kwargs' to Config class
+        so that self.STORE_ID, self.SLEEP_REQUEST etc will be set/re-set
+
+        'session' - default the global async session, else a new one of this instance
+        """
+        Config.__init__(self, *args, **kwargs)
+        self.MAX_CONCURRENCY = int(max_concurrency)
+        self._semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+
+        self.session = session or get_async_session()
+        # 'aclose' closes only a session made here - other stores may still use the rest
+        self._owns_session = self.session is None
+        if self._owns_session:
+            self.session = self._make_async_session()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """close the session of this instance - a passed or global one stays open"""
+        if self._owns_session:
+            await self.session.aclose()
+
+    def _session_method(self, method: str):
+        if method.lower() not in dir(self.session):
+            log.error("async session not pre set")
+            raise AttributeError
+
+        return getattr(self.session, method.lower())
+
+    async def call(
+        self,
+        base_url: str = None,
+        base_api_endpoint: str = "shop/api/",
+        endpoint: str = None,
+        params: dict = {},
+        method: str = "get",
+        **kwargs,
+    ) -> dict:
+        """any **kwargs will be passed to the http request"""
+        if not base_url:
+            base_url = self.BASE_URL
+        if not base_api_endpoint:
+            base_api_endpoint = ""
+        base_url = urljoin(base_url, "/")
+
+        session_method = self._session_method(method)
+
+        url = urljoin(base_url, base_api_endpoint + endpoint + "?")
+
+        query = urlencode(params, safe=", !")
+
+        async def fetch() -> dict:
+            response = await self._send(session_method, url, query, **kwargs)
+            return codec.loads(response.content)
+
+        return await coalesce_async(flight_key(method, url, query, self.STORE_ID, **kwargs), fetch)
+
+    async def _send(self, session_method, url: str, params: dict | str, **kwargs) -> httpx.Response:
+        """rate limited, bound by 'max_concurrency' and retried"""
+
+        async def attempt() -> httpx.Response:
+            await self._ensure_limiter().acquire_async(url)
+
+            async with self._semaphore:
+                return await session_method(url, params=params, **kwargs)
+
+        return await acall_with_retry(attempt, url, idempotent=is_idempotent(session_method.__name__))
+
+    async def _fetch_page(
+        self, session_method, url: str, params: dict, raw: bool = False, **kwargs
+    ) -> dict | bytes | None:
+        async def fetch() -> dict | bytes | None:
+            r = await self._send(session_method, url, params, **kwargs)
+
+            if r.status_code in (200, 206):
+                return r.content if raw else codec.loads(r.content)
+
+            log.error(r.status_code)
+            return None
+
+        key = flight_key(session_method.__name__, url, params, params.get("market"), **kwargs)
+        if key is not None and raw:
+            key += "#raw"
+
+        return await coalesce_async(key, fetch)
+
+    async def paginate(
+        self,
+        url: str,
+        params: dict,
+        page_key: str = "page",
+        max_page: int = 2,
+        method: str = "get",
+        prefetch: int = 0,
+        session: httpx.Client = None,
+        raw: bool = False,
+        **kwargs,
+    ):
+        """Fetch the first page, then all remaining pages up to 'max_page' concurrently.
+        Pages are yielded in order. 'prefetch' and 'session' are accepted for 'STORE'
+        compatibility, the concurrency is bound by 'max_concurrency'.
+        'raw' - see 'STORE.paginate'
+        """
+
+        if not url.startswith("http"):
+            raise ValueError
+
+        if not isinstance(params, dict):
+            raise AttributeError
+
+        session_method = self._session_method(method)
+
+        first_page = params.get(page_key)
+        data = await self._fetch_page(session_method, url, params, raw=raw, **kwargs)
+        if data is None:
+            return
+
+        yield data
+
+        total_pages = self._total_pages(data)
+        last_page = min(max_page, max_page if total_pages is None else total_pages)
+
+        tasks = [
+            asyncio.ensure_future(
+                self._fetch_page(session_method, url, {**params, page_key: page}, raw=raw, **kwargs)
+            )
+            for page in range(first_page + 1, last_page + 1)
+        ]
+
+        try:
+            for task in tasks:
+                data = await task
+                if data is None:
+                    return
+
+                yield data
+        finally:
+            # consumer stopped early or a page failed
+            for task in tasks:
+                task.cancel()
+
+    def search(self, search_term: str, max_page: int = 1, prefetch: int = 0):
+        """search for a term using the API
+        returns an async iterator of dicts"""
+        assert search_term is not None, "search_term must not be None"
+
+        base_url = "https://www.rewe.de"
+        endpoint = "products"
+
+        params = {"search": search_term, "market": self.STORE_ID, "page": 1}
+
+        url = f"{base_url}/shop/api/{endpoint}?"
+
+        return self.paginate(url, params, page_key="page", max_page=max_page)
+
+    async def search_many(self, search_terms: list[str], max_page: int = 1) -> dict[str, list[dict]]:
+        """run 'search' for every term concurrently
+        returns a dict of 'search_term': [pages]"""
+
+        results = await self.collect(*(self.search(term, max_page=max_page) for term in search_terms))
+
+        return dict(zip(search_terms, results))
+
+    @staticmethod
+    async def collect(*paginated) -> list[list[dict]]:
+        """consume several async iterators concurrently, one list of pages per iterator"""
+
+        async def to_list(pages):
+            return [page async for page in pages]
+
+        return list(await asyncio.gather(*(to_list(pages) for pages in paginated)))
+
+    async def product_infos(
+        self,
+        product_ids: list[str] = None,
+        listing_ids: list[str] = None,
+        article_ids: list[str] = None,
+        max_workers: int = None,
+    ) -> ProductInfos:
+        """see 'STORE.product_infos' - batches are bound by 'max_concurrency'"""
+
+        param_key, ids, id_keys = self._product_infos_ids(product_ids, listing_ids, article_ids)
+        batches = self._batch_ids(ids, self.PRODUCT_INFOS_BUDGET)
+
+        responses = await asyncio.gather(
+            *(self.call(*self._product_infos_request(param_key, batch)) for batch in batches)
+        )
+
+        return self._merge_product_infos(ids, id_keys, responses)
+
+    async def current_userdata(self) -> dict:
+        """Return a dict with current store informations.
+        # https://www.rewe.de/content-homepage-backend/userdata
+        """
+
+        base_url = "https://www.rewe.de/"
+        endpoint = "content-homepage-backend/userdata"
+
+        return await self.call(base_url, endpoint=endpoint, params={})
+
+    async def recommendations(self, product_ids: list[str]) -> dict:
+        """see 'STORE.recommendations'"""
+        base_url = "https://www.rewe.de/"
+        endpoint = "reco/recommendations"
+
+        params = {
+            "context": "product-details-recommendations",
+            "productIds": ",".join(product_ids),
+        }
+
+        return await self.call(base_url=base_url, base_api_endpoint="shop/", endpoint=endpoint, params=params)
+
+    async def category_tree(
+        self, search_result: list = None, ttl: float | None = 24 * 60 * 60
+    ) -> CategoryTree:
+        """see 'STORE.category_tree' - 'search_result' is a list of pages"""
+        if search_result is not None:
+            return CategoryTree.from_search_result(search_result, self.STORE_ID)
+
+        tree = CategoryTree.load(self.STORE_ID, ttl)
+        if tree is None:
+            pages = [page async for page in self.products_by_attribute(max_page=1)]
+            tree = CategoryTree.from_search_result(pages, self.STORE_ID)
+            if len(tree):
+                tree.save()
+
+        return tree
+
+    async def categories(self, search_result: list = None) -> list[dict]:
+        return [category.data for category in (await self.category_tree(search_result)).leaves()]
+
+    async def category_names(self, search_result: list = None) -> list:
+        leaves = (await self.category_tree(search_result)).leaves()
+
+        return list(dict.fromkeys(category.name for category in leaves))
+
+    async def category_slugs(self, search_result: list = None) -> list:
+        return (await self.category_tree(search_result)).leaf_slugs()
+
+    def search_products(self, *args, **kwargs):
+        # the streaming parser reads a sync response
+        raise NotImplementedError("AsyncSTORE has no 'search_products' - use 'search'")
+
+    @staticmethod
+    def paginate_products(*args, **kwargs):
+        raise NotImplementedError("AsyncSTORE has no 'paginate_products' - use 'paginate'")
+
+    async def suggestions(self, search_term: str) -> dict:
+        """returns a dict containing product infos like listingsIds - to be used in 'product_infos'"""
+
+        base_url = "https://www.rewe.de"
+        endpoint = "/suggestions"
+
+        params = {"q": search_term}
+
+        return await self.call(
+            base_url=base_url,
+            base_api_endpoint="shop/api/",
+            endpoint=endpoint,
+            params=params,
+        )
+
+
 class Basket:
     def __repr__(self):
         return self.__class__.__name__
@@ -634,11 +1258,9 @@ class Basket:
         """https://www.rewe.de/shop/api/baskets/listings/13-4001686301524-4e6503bb-5212-3dd3-8a1b-7d0b57d7627f"""
 
         base_url = "https://www.rewe.de/shop"
-        cookies = Config.load()
 
+        # the session already carries the cookies of 'Config.load'
         for listing_id in listings_ids:
-            sleep(self.STORE.SLEEP_REQUEST)
-
             endpoint = f"baskets/listings/{listing_id}"
 
             payload = {
@@ -649,7 +1271,7 @@ class Basket:
 
             url = f"{base_url}/api/{endpoint}"
 
-            response = httpx.post(url, data=payload, cookies=cookies)
+            response = send_request("post", url, data=payload)
 
             yield response
 
@@ -663,7 +1285,7 @@ class Branch:
     def __init__(self, *args, **kwargs):
         self.STORE = STORE(*args, **kwargs)
 
-    @lru_cache()
+    @memoize(maxsize=64, ttl=24 * 60 * 60)
     def in_zipcode(self, zipcode: str) -> dict:
         """Returns a dict of all branches around 'zipcode' that have pickup"""
         """https://www.rewe.de/shop/api/marketselection/zipcodes/56073/services/pickup"""
@@ -671,7 +1293,7 @@ class Branch:
         base_url = "https://www.rewe.de"
         endpoint = f"/shop/marketselection/zipcodes/{zipcode}/services/pickup"
 
-        r = self.call(base_url, endpoint=endpoint)
+        r = self.STORE.call(base_url, base_api_endpoint="", endpoint=endpoint)
 
         return r
 
@@ -679,12 +1301,12 @@ class Branch:
     def _has_pickup(branch: dict) -> bool:
         return branch.get("pickupVariant").lower() == "abholservice"
 
-    @lru_cache()
+    @memoize(maxsize=64, ttl=24 * 60 * 60)
     def first_in_zipcode(self, zipcode: str) -> dict | None:
         """Get first branch that has pickup in 'zipcode'"""
         """https://www.rewe.de/shop/api/marketselection/zipcodes/56073/services/pickup"""
 
-        data = self.in_zipcode(zipcode).json()
+        data = self.in_zipcode(zipcode)
 
         for branch in data:
             if self._has_pickup(branch):
@@ -700,6 +1322,150 @@ class Branch:
         return str(branch_id), str(branch_zipcode)
 
 
+class FanOut:
+    """Run the same query for many stores concurrently
+
+    Every store gets its own client with its own 'wksMarketsCookie' on the shared
+    connection pool. Results stream back as (store_id, item) as soon as they are ready,
+    pages of paginated queries one by one. All stores share the rate limiter per host.
+
+    with FanOut(store_ids=["8534540"], zipcodes=["56073"]) as fan_out:
+        for store_id, page in fan_out.run("get_discounted_products", max_page=3):
+            ...
+
+        for store_id, products in fan_out.run("product_infos", product_ids=basket):
+            ...
+    """
+
+    def __repr__(self):
+        return self.__class__.__name__
+
+    def __init__(
+        self,
+        store_ids: list[str] = (),
+        zipcodes: list[str] = (),
+        max_workers: int = 8,
+        sleep_request: float = 1.0,
+        **client_kwargs,
+    ):
+        """'zipcodes' - every market with pickup in these zipcodes is added to 'store_ids'
+        'client_kwargs' are passed to 'make_client' for every store
+        """
+        self.max_workers = int(max_workers)
+        self.sleep_request = sleep_request
+        self.client_kwargs = client_kwargs
+        if "transport" in client_kwargs:
+            # shared by the stores and owned by the caller - 'close' must leave it open
+            client_kwargs["transport"] = SharedTransport(client_kwargs["transport"])
+        self.errors = {}
+
+        self._lock = threading.Lock()
+        self._stores = {}
+
+        self.store_ids = list(dict.fromkeys(str(store_id) for store_id in store_ids))
+        for zipcode in zipcodes:
+            for store_id in self.in_zipcode(zipcode):
+                if store_id not in self.store_ids:
+                    self.store_ids.append(store_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def in_zipcode(zipcode: str) -> list[str]:
+        """store ids of all markets with pickup in 'zipcode'"""
+        branches = Branch().in_zipcode(str(zipcode)) or []
+
+        return [Branch._get_branch_id_and_zipcode(b)[0] for b in branches if Branch._has_pickup(b)]
+
+    def store(self, store_id: str) -> STORE:
+        """the 'STORE' of 'store_id' with its own cookies - made on first use"""
+        with self._lock:
+            store = self._stores.get(store_id)
+            if store is not None:
+                return store
+
+        from utils import create_agents
+
+        client = make_client(headers=create_agents(), **self.client_kwargs)
+        Config(store_id=store_id).from_web(client=client)
+
+        with self._lock:
+            store = self._stores.setdefault(
+                store_id, STORE(store_id=store_id, sleep_request=self.sleep_request, session=client)
+            )
+
+        if store.session is not client:
+            client.close()
+
+        return store
+
+    def run(self, query: str, *args, **kwargs) -> Iterator[tuple[str, object]]:
+        """call 'STORE.<query>(*args, **kwargs)' for every store
+
+        yields (store_id, item) in the order they are ready - an item per page
+        for paginated queries, else the result of the call.
+        A failing store is logged and its exception kept in 'errors'.
+        """
+        if not callable(getattr(STORE, query, None)):
+            raise AttributeError(f"STORE has no query '{query}'")
+
+        results = queue.Queue(maxsize=self.max_workers * 2)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> None:
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def worker(store_id: str) -> None:
+            try:
+                result = getattr(self.store(store_id), query)(*args, **kwargs)
+                items = result if isinstance(result, Iterator) else [result]
+
+                for item in items:
+                    if stop.is_set():
+                        break
+                    put((store_id, item))
+            except Exception as e:
+                log.error(f"{query} failed for store {store_id}: {e}")
+                self.errors[store_id] = e
+            finally:
+                put(done)
+
+        self.errors = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fan_out")
+        try:
+            for store_id in self.store_ids:
+                executor.submit(worker, store_id)
+
+            pending = len(self.store_ids)
+            while pending:
+                item = results.get()
+                if item is done:
+                    pending -= 1
+                    continue
+
+                yield item
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        """close the clients of the stores - only their cookies, the connection pool stays open"""
+        with self._lock:
+            for store in self._stores.values():
+                store.session.close()
+            self._stores.clear()
+
+
 class Cli(Config):
     """Used to read product links from text or json files and process them"""
 
@@ -710,7 +1476,7 @@ class Cli(Config):
         self.STORE = STORE(*args, **kwargs)
 
     @staticmethod
-    @lru_cache()
+    @memoize(maxsize=4096, ttl=None)
     def id_from_url(url: str) -> str:
         """Return id from 'url' as str'"""
         path = urlparse(url).path
@@ -727,7 +1493,7 @@ class Cli(Config):
             return str(category_slug)
 
     def from_links(self, urls: Iterator[str]) -> Iterator[Product]:
-        """Return an iter of 'Product' asdict for every product in 'urls'"""
+        """Return a list of 'Product' for every product in 'urls'"""
 
         product_ids = [self.id_from_url(url) for url in urls]
 
@@ -735,19 +1501,28 @@ class Cli(Config):
 
         return list(Parser().parse_product_infos(raw_products))
 
-    def from_links_of_categories(self, urls: Iterator[str], max_page: int = 1) -> Iterator[Product]:
-        """Return an iter of 'Product' for every product in category 'urls'"""
+    def from_links_of_categories(
+        self, urls: Iterator[str], max_page: int = 1, dedup: DedupIndex | None = None
+    ) -> Iterator[Product]:
+        """Return an iter of 'Product' for every product in category 'urls'
+
+        categories overlap - every product is returned once, 'dedup' default a new exact index
+        """
 
         category_slugs = [self.id_from_url(url) for url in urls]
+        if dedup is None:
+            dedup = DedupIndex(store_id=self.STORE.STORE_ID)
 
         for category_slug in category_slugs:
             search_result = self.STORE.search_category(category_slug, max_page=max_page)
 
-            product_mds = Parser().parse_search_category(search_result)
+            product_mds = Parser().parse_search_category(search_result, dedup=dedup)
 
             yield from product_mds
 
-    @lru_cache()
+        log.info(f"from_links_of_categories: {dedup.stats()}")
+
+    @memoize(maxsize=16, ttl=60 * 60)
     def from_text_file(self, text_file: str) -> None:
         product_urls = set()
         categories = set()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Coalescing of identical in-flight requests
+
+When threads or asyncio tasks ask for the same url and params at the same time,
+only the first one (the leader) sends the request, the others wait for it and
+get the very same decoded result - or the same exception.
+
+    group = get_singleflight()
+    data = group.do(key, lambda: send_request("get", url, params).json())
+
+Results are shared between the callers, treat them as read-only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Hashable, Awaitable
+
+log = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = self.shared = 0
+
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._tasks = {}
+
+    def __repr__(self):
+        return f"SingleFlight(calls={self.calls}, shared={self.shared})"
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """return 'func()' - called once for all threads asking for 'key' at the same time"""
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+        return call.result
+
+    async def do_async(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """same as 'do' for coroutine functions and the tasks of one event loop
+
+        the request runs in a task of its own, so a cancelled caller does not
+        cancel it for the others
+        """
+        key = (id(asyncio.get_running_loop()), key)
+
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self.calls += 1
+        else:
+            self.shared += 1
+
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        in_flight = len(self._in_flight) + len(self._tasks)
+
+        return {"calls": self.calls, "shared": self.shared, "in_flight": in_flight}
+
+
+_group = None
+
+
+def set_singleflight(group: SingleFlight = None) -> SingleFlight:
+    """set the group used by 'STORE' and 'AsyncSTORE' - a new one if 'group' is not given"""
+    global _group
+
+    _group = group if group is not None else SingleFlight()
+
+    return _group
+
+
+def disable_singleflight() -> None:
+    """every caller sends its own request again"""
+    global _group
+
+    _group = False
+
+
+def get_singleflight() -> SingleFlight | None:
+    """return the shared group - None if coalescing is disabled"""
+    if _group is None:
+        return set_singleflight()
+
+    return _group or None
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Incremental decoding of search pages
+
+A page of 'products' holds up to 250 products in '_embedded.products' next to
+'pagination' and 'facets'. 'ProductStream' is fed the body chunk by chunk and
+returns every product as soon as its closing brace arrived, so only one product
+is decoded at a time. Everything else of the page is kept - with an empty
+products list - and returned by 'close'.
+
+    stream = ProductStream()
+    for chunk in response.iter_bytes():
+        for product in stream.feed(chunk):
+            ...
+    page = stream.close()  # {"pagination": ..., "facets": ..., "_embedded": {"products": []}}
+"""
+
+from __future__ import annotations
+
+import re
+import codecs
+import logging
+from typing import Iterator, Iterable
+
+from codec import loads
+
+log = logging.getLogger(__name__)
+
+# structural characters and the start of strings - everything in between are numbers or literals
+STRUCTURE = re.compile(r'[{}\[\]:"]')
+# rest of a string after its opening quote
+STRING_END = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+
+
+class ProductStream:
+    def __init__(self, path: tuple[str, ...] = ("_embedded", "products")):
+        """'path' - keys of the array whose items are streamed"""
+        self.path = tuple(path)
+
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        # start of the text still needed - skeleton or current item
+        self._mark = 0
+        self._skeleton = []
+
+        # (bracket, key of the container in its parent)
+        self._stack = []
+        self._key = None
+        self._string = None
+        # depth of the streamed array while inside it
+        self._array_depth = None
+
+        self.count = 0
+
+    def feed(self, chunk: bytes) -> list[dict]:
+        """decode 'chunk', return the items completed by it"""
+        self._buffer += self._decoder.decode(chunk)
+
+        items = self._scan()
+        self._compact()
+
+        return items
+
+    def close(self) -> dict:
+        """the document without the streamed items"""
+        self._buffer += self._decoder.decode(b"", final=True)
+        self._scan()
+        self._compact()
+
+        if self._stack or self._array_depth is not None:
+            raise ValueError("Incomplete JSON document")
+
+        return loads("".join(self._skeleton) + self._buffer)
+
+    def _scan(self) -> list[dict]:
+        items = []
+        buffer = self._buffer
+        pos = self._pos
+
+        while True:
+            match = STRUCTURE.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+
+            char, start = match.group(), match.start()
+
+            if char == '"':
+                end = STRING_END.match(buffer, start + 1)
+                if end is None:
+                    # incomplete string - wait for the next chunk
+                    pos = start
+                    break
+
+                if self._array_depth is None:
+                    self._string = buffer[start : end.end()]
+                pos = end.end()
+                continue
+
+            pos = start + 1
+            in_array = self._array_depth is not None
+
+            if char == ":":
+                if not in_array:
+                    self._key = loads(self._string)
+
+            elif char in "{[":
+                parent_is_object = bool(self._stack) and self._stack[-1][0] == "{"
+                self._stack.append((char, self._key if parent_is_object else None))
+                self._key = None
+
+                if not in_array and char == "[" and self._is_path():
+                    # keep the skeleton up to and including '[', drop the items
+                    self._skeleton.append(buffer[self._mark : pos])
+                    self._array_depth = len(self._stack)
+                    self._mark = pos
+
+                elif in_array and len(self._stack) == self._array_depth + 1:
+                    self._mark = start
+
+            else:
+                depth = len(self._stack)
+                self._stack.pop()
+
+                if in_array and depth == self._array_depth + 1:
+                    items.append(loads(buffer[self._mark : pos]))
+                    self._mark = pos
+
+                elif in_array and depth == self._array_depth:
+                    # end of the array - the skeleton goes on with ']'
+                    self._array_depth = None
+                    self._mark = start
+
+        self._pos = pos
+        self.count += len(items)
+
+        return items
+
+    def _is_path(self) -> bool:
+        return tuple(key for _, key in self._stack[1:]) == self.path
+
+    def _in_item(self) -> bool:
+        return self._array_depth is not None and len(self._stack) > self._array_depth
+
+    def _compact(self) -> None:
+        """drop the scanned text which is not needed anymore"""
+        if self._array_depth is None:
+            self._skeleton.append(self._buffer[self._mark : self._pos])
+            cut = self._pos
+        elif self._in_item():
+            cut = self._mark
+        else:
+            cut = self._pos
+
+        self._buffer = self._buffer[cut:]
+        self._pos -= cut
+        self._mark = max(self._mark - cut, 0)
+
+
+def iter_products(
+    chunks: Iterable[bytes], path: tuple[str, ...] = ("_embedded", "products"), page: dict = None
+) -> Iterator[dict]:
+    """yield the items at 'path' of the JSON document in 'chunks'
+    the rest of the document is put into 'page' once the last chunk was read
+    """
+    stream = ProductStream(path)
+
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+
+    if page is not None:
+        page.update(stream.close())
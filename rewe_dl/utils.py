@@ -7,7 +7,6 @@ from __future__ import annotations
 import os
 import re
 import sys
-import json
 import locale
 import logging
 from random import choice
@@ -15,6 +14,7 @@ from random import choice
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(PROJECT_DIR)
 
+import codec
 import exception
 
 log = logging.getLogger(__name__)
@@ -44,6 +44,14 @@ def create_agents() -> dict:
     return headers
 
 
+def to_jsonable(obj) -> dict:
+    """'default' for json - 'Product' as a dict"""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
 def save_to_json(json_data: dict, file_name: str, indent=4, mode="w") -> None:
     """Save json to file.
     if given path doesn't exist - create it
@@ -55,12 +63,12 @@ def save_to_json(json_data: dict, file_name: str, indent=4, mode="w") -> None:
 
     with open(file_name, mode) as file:
         try:
-            if isinstance(json_data, dict):
-                json_string = json.dumps(json_data, indent=indent)
+            if isinstance(json_data, dict) or hasattr(json_data, "to_dict"):
+                json_string = codec.dumps(json_data, indent=indent, default=to_jsonable)
                 file.write(json_string)
             elif isinstance(json_data, list):
                 for item in json_data:
-                    json.dump(item, file, indent=indent)
+                    codec.dump(item, file, indent=indent, default=to_jsonable)
                     file.write("\n")
             else:
                 raise ValueError("json_data must be a dict or a list of dicts!")
@@ -72,14 +80,14 @@ def save_to_jsonl(json_data: dict, file_name: str) -> None:
     new_dir = os.path.dirname(file_name)
     os.makedirs(new_dir, exist_ok=True)
 
-    if isinstance(json_data, dict):
-        json_string = json.dumps(json_data)
+    if isinstance(json_data, dict) or hasattr(json_data, "to_dict"):
+        json_string = codec.dumps(json_data, default=to_jsonable)
 
         append_to_file(json_string, file_name)
 
     elif isinstance(json_data, list):
         for item in json_data:
-            json_string = json.dumps(item) + "\n"
+            json_string = codec.dumps(item, default=to_jsonable) + "\n"
 
             append_to_file(json_string, file_name)
 
@@ -132,11 +140,11 @@ def load_config(config_path: str = None) -> dict:
     try:
         with open(config_path, "r", encoding="utf-8") as config_file:
             config_raw = config_file.read()
-            return json.loads(config_raw)
+            return codec.loads(config_raw)
     except (Exception, OSError) as error:
         raise exception.InputFileError(f"{error!s}")
 
 
 @staticmethod
 def json_compact(obj) -> dict:
-    return json.dumps(obj, separators=(",", ":"), sort_keys=True)
+    return codec.dumps(obj, separators=(",", ":"), sort_keys=True)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Size and query time of the price history - wide rows against the star schema
+
+The snapshots of 'data/' are imported with 'rewe_dl/backfill.py' and repeated
+with shifted days up to '--days' crawls.
+
+    python scripts/bench_history.py [--days 365]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FOLDER = os.path.join(PROJECT_ROOT, "data")
+sys.path.insert(0, PROJECT_ROOT)
+
+from rewe_dl.history import PRICES_COLUMNS, PriceHistory
+from rewe_dl.backfill import backfill
+
+# the table of the first price history
+CREATE_WIDE = """
+CREATE TABLE prices (
+store_id TEXT NOT NULL, date TEXT NOT NULL, store TEXT, product TEXT, link TEXT,
+product_id TEXT NOT NULL, price INTEGER, old_price INTEGER, saved INTEGER, brand TEXT, picture TEXT,
+PRIMARY KEY (store_id, date, product_id)
+)
+WITHOUT ROWID;
+CREATE INDEX prices_product_date ON prices (product_id, date);
+"""
+
+# name -> (wide, star) - aggregates of the star schema read the facts only
+QUERIES = {
+    "average per day": (
+        "SELECT date, AVG(price) FROM prices GROUP BY date",
+        "SELECT observed, AVG(price) FROM price_observations GROUP BY observed",
+    ),
+    "lowest per product": (
+        "SELECT product_id, MIN(price) FROM prices GROUP BY product_id",
+        "SELECT product_key, MIN(price) FROM price_observations GROUP BY product_key",
+    ),
+    "flat rows": ("SELECT * FROM prices", "SELECT * FROM prices"),
+}
+
+
+def timed(connector: sqlite3.Connection, query: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connector.execute(query).fetchall()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        seed = os.path.join(folder, "seed.sqlite3")
+        backfill(DATA_FOLDER, seed)
+
+        with PriceHistory(seed) as history:
+            days = [history.snapshot("8534540", day) for day in history.dates()]
+            # full crawls only
+            days = [rows for rows in days if len(rows) >= 100]
+
+        star, wide = os.path.join(folder, "star.sqlite3"), os.path.join(folder, "wide.sqlite3")
+        first = date(2024, 1, 1)
+
+        connector = sqlite3.connect(wide)
+        connector.executescript(CREATE_WIDE)
+
+        with PriceHistory(star) as history:
+            for idx in range(args.days):
+                rows = days[idx % len(days)]
+                day = (first + timedelta(days=idx)).isoformat()
+
+                history.write(rows, "8534540", day)
+                connector.executemany(
+                    f"INSERT INTO prices VALUES ({', '.join('?' for _ in PRICES_COLUMNS)})",
+                    [(row["store_id"], day, *(row[column] for column in PRICES_COLUMNS[2:])) for row in rows],
+                )
+            connector.commit()
+            connector.execute("VACUUM")
+            history.connector.execute("VACUUM")
+
+            observations = history.connector.execute("SELECT COUNT(*) FROM price_observations").fetchone()[0]
+            print(f"{observations} observations of {args.days} days\n")
+            print(f"{'schema':<8}{'size':>10}{''.join(f'{name:>21}' for name in QUERIES)}")
+
+            schemas = (("wide", connector, wide), ("star", history.connector, star))
+            for idx, (name, db, path) in enumerate(schemas):
+                times = "".join(f"{timed(db, queries[idx]) * 1000:>19.1f}ms" for queries in QUERIES.values())
+                print(f"{name:<8}{os.path.getsize(path) / 1024 / 1024:>8.1f}MiB{times}")
+
+        connector.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Compare the JSON backends of 'rewe_dl/codec.py' on the files in 'data/'
+
+    python scripts/bench_json.py [--repeat 5] [files ...]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FOLDER = os.path.join(PROJECT_ROOT, "data")
+sys.path.insert(0, PROJECT_ROOT)
+
+from rewe_dl import codec
+
+# (name, function of one document) - the encode cases are the ones used by the package
+CASES = [
+    ("loads", lambda raw, doc: codec.loads(raw)),
+    ("dumps compact+sort", lambda raw, doc: codec.dumps(doc, separators=(",", ":"), sort_keys=True)),
+    ("dumps compact utf-8", lambda raw, doc: codec.dumps(doc, separators=(",", ":"), ensure_ascii=False)),
+    ("dumps indent=2", lambda raw, doc: codec.dumps(doc, indent=2)),
+    ("dumps indent=4", lambda raw, doc: codec.dumps(doc, indent=4)),
+    ("dumps default", lambda raw, doc: codec.dumps(doc)),
+]
+
+
+def load_documents(files: list[str]) -> list[tuple[bytes, object]]:
+    documents = []
+    for file in files:
+        with open(file, "rb") as fp:
+            raw = fp.read()
+        documents.append((raw, codec.loads(raw)))
+
+    return documents
+
+
+def bench(documents: list, function, repeat: int) -> float:
+    """best of 'repeat' runs over all documents in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for raw, doc in documents:
+            function(raw, doc)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", default=sorted(glob.glob(os.path.join(DATA_FOLDER, "*.json"))))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not args.files:
+        sys.exit("no json files found")
+
+    documents = load_documents(args.files)
+    size = sum(len(raw) for raw, _ in documents)
+    print(f"{len(documents)} files, {size / 1024 / 1024:.1f} MiB, best of {args.repeat}\n")
+
+    backends = codec.available_backends()
+    print(f"{'case':<22}" + "".join(f"{name:>20}" for name in backends))
+
+    for name, function in CASES:
+        timings = []
+        for backend in backends:
+            codec.set_backend(backend)
+            timings.append(bench(documents, function, args.repeat))
+
+        # the stdlib is always last
+        baseline = timings[-1]
+        print(f"{name:<22}" + "".join(f"{t * 1000:>10.1f}ms ({baseline / t:4.1f}x)" for t in timings))
+
+    codec.set_backend()
+
+
+if __name__ == "__main__":
+    main()
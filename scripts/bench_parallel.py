@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Throughput of parsing raw search pages - in process against 'ParallelParser'
+
+Pages of 250 products are rebuilt from 'data/' like 'scripts/bench_parser.py'.
+
+    python scripts/bench_parallel.py [--pages 200] [--workers 1 2 4 8]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from rewe_dl.parallel import ParallelParser, parse_page
+
+from bench_parser import load_products, search_result_product
+
+PER_PAGE = 250
+
+
+def raw_pages(count: int) -> list[bytes]:
+    products = [search_result_product(md) for md in load_products(count * PER_PAGE)]
+
+    pages = []
+    for page in range(count):
+        chunk = products[page * PER_PAGE : (page + 1) * PER_PAGE]
+        data = {"pagination": {"page": page + 1, "totalPages": count}, "_embedded": {"products": chunk}}
+        pages.append(json.dumps(data).encode())
+
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    pages = raw_pages(args.pages)
+    size = sum(map(len, pages))
+    print(f"{len(pages)} pages, {size / 1024 / 1024:.1f} MiB, {os.cpu_count()} cores\n")
+    print(f"{'mode':<22}{'time':>10}{'pages/s':>10}{'speedup':>10}")
+
+    start = time.perf_counter()
+    expected = [parse_page(raw) for raw in pages]
+    baseline = time.perf_counter() - start
+    print(f"{'in process':<22}{baseline:>9.2f}s{len(pages) / baseline:>10.0f}{1:>9.1f}x")
+
+    for workers in sorted(set(args.workers)):
+        with ParallelParser(max_workers=workers) as pool:
+            # start the workers before timing
+            list(pool.batches(pages[:workers]))
+
+            start = time.perf_counter()
+            result = list(pool.batches(pages))
+            elapsed = time.perf_counter() - start
+
+        assert result == expected, f"{workers} workers: different output"
+        print(f"{f'{workers} workers':<22}{elapsed:>9.2f}s{len(pages) / elapsed:>10.0f}{baseline / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Compare the compiled extractors of 'Parser' with the former '.get' chains
+
+'data/' holds parsed products only, so raw search results and product-tiles
+are rebuilt from them first - same shape as the API responses.
+
+    python scripts/bench_parser.py [--repeat 5] [--products 100000]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import glob
+import time
+import argparse
+from dataclasses import asdict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FOLDER = os.path.join(PROJECT_ROOT, "data")
+sys.path.insert(0, PROJECT_ROOT)
+
+from rewe_dl import codec
+from rewe_dl.parser import Parser
+from rewe_dl.constants import Product
+from rewe_dl.formatter import euros_to_cents
+
+
+def to_cents(price: float) -> int:
+    return int(round(price * 100))
+
+
+def in_cents(md: dict) -> dict:
+    """the prices of a legacy result in cents - like the current 'Product'"""
+    return {**md, **{key: euros_to_cents(md[key]) for key in ("price", "old_price", "saved")}}
+
+
+def search_result_product(md: dict) -> dict:
+    return {
+        "id": md["product_id"],
+        "productName": md["product"],
+        "nan": md["link"].rpartition("/")[2],
+        "brand": {"name": md["brand"]},
+        "media": {"images": [{"_links": {"self": {"href": md["picture"]}}}]},
+        "_embedded": {
+            "articles": [
+                {
+                    "_embedded": {
+                        "listing": {
+                            "pricing": {
+                                "currentRetailPrice": to_cents(md["price"]),
+                                "discount": {"regularPrice": to_cents(md["old_price"])},
+                            }
+                        }
+                    }
+                }
+            ]
+        },
+    }
+
+
+def product_tile(md: dict) -> dict:
+    return {
+        "productId": md["product_id"],
+        "productName": md["product"],
+        "nan": md["link"].rpartition("/")[2],
+        "brandKey": md["brand"],
+        "pricing": {"price": to_cents(md["price"]), "regularPrice": to_cents(md["old_price"])},
+        "mediaInformation": [{"mediaUrl": md["picture"]}],
+    }
+
+
+def legacy_price_cent_to_numeric(price: int) -> float:
+    """'formatter.price_cent_to_numeric' before the integer cents"""
+    return float(f"{price // 100}.{price % 100}")
+
+
+def legacy_calculate_savings(md: dict) -> float:
+    """'Parser.calculate_savings' before the integer cents"""
+    saved = float(md.get("old_price")) - float(md.get("price"))
+    return float(f"{saved:.2f}")
+
+
+def legacy_product_md_from_product(product: dict) -> dict:
+    """'Parser.product_md_from_product' before the compiled extractors"""
+    media = product.get("media", {})
+    article = product.get("_embedded", {}).get("articles")[0]
+
+    listing = article.get("_embedded", {}).get("listing", {})
+    pricing = listing.get("pricing", {})
+
+    price = legacy_price_cent_to_numeric(pricing.get("currentRetailPrice", 0))
+    old_price = legacy_price_cent_to_numeric(pricing.get("discount", {}).get("regularPrice", 0))
+    if old_price == 0.0:
+        old_price = price
+
+    md = {}
+    md["store"] = "rewe.de"
+    md["product"] = product.get("productName", "")
+    md["link"] = f"https://rewe.de/produkte/{product.get('nan', '')}"
+    md["product_id"] = product.get("id", "")
+    md["price"] = price
+    md["old_price"] = old_price
+    md["saved"] = legacy_calculate_savings(md)
+    md["brand"] = product.get("brand", {}).get("name", "")
+    md["picture"] = media.get("images", [])[0].get("_links").get("self", {}).get("href", "")
+
+    return asdict(Product(**md))
+
+
+def legacy_parse_product_infos(product_infos: list[dict]):
+    """'Parser.parse_product_infos' before the compiled extractors"""
+    for product in product_infos:
+        price = legacy_price_cent_to_numeric(product.get("pricing", {}).get("price", 0))
+        old_price = legacy_price_cent_to_numeric(product.get("pricing", {}).get("regularPrice", 0))
+        if old_price == 0.0:
+            old_price = price
+
+        md = {}
+        md["store"] = "rewe.de"
+        md["product"] = product.get("productName", "")
+        md["link"] = f"https://rewe.de/produkte/{product.get('nan', '')}"
+        md["product_id"] = product.get("productId", product.get("id", ""))
+        md["price"] = price
+        md["old_price"] = old_price
+        md["saved"] = legacy_calculate_savings(md)
+        md["brand"] = product.get("brandKey", product.get("manufacturer", {}).get("name", ""))
+        md["picture"] = product.get("mediaInformation", [])[0].get("mediaUrl", "")
+
+        yield asdict(Product(**md))
+
+
+def load_products(count: int) -> list[dict]:
+    products = []
+    for file in sorted(glob.glob(os.path.join(DATA_FOLDER, "*.json"))):
+        with open(file, "rb") as fp:
+            products += codec.loads(fp.read())
+
+    if not products:
+        sys.exit("no json files found")
+
+    # repeat the fixtures up to 'count'
+    return [products[idx % len(products)] for idx in range(count)]
+
+
+def bench(function, repeat: int) -> tuple[float, list]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--products", type=int, default=100_000)
+    args = parser.parse_args()
+
+    products = load_products(args.products)
+    search_results = [search_result_product(md) for md in products]
+    tiles = [product_tile(md) for md in products]
+    new_parser = Parser()
+
+    cases = [
+        (
+            "search results",
+            lambda: [legacy_product_md_from_product(product) for product in search_results],
+            lambda: [new_parser.product_md_from_product(product) for product in search_results],
+        ),
+        (
+            "product-tiles",
+            lambda: list(legacy_parse_product_infos(tiles)),
+            lambda: list(new_parser.parse_product_infos(tiles)),
+        ),
+    ]
+
+    print(f"{len(products)} products, best of {args.repeat}\n")
+    print(f"{'shape':<16}{'.get + asdict':>16}{'compiled':>16}")
+
+    for name, legacy, compiled in cases:
+        legacy_time, legacy_result = bench(legacy, args.repeat)
+        compiled_time, compiled_result = bench(compiled, args.repeat)
+
+        # 'Product' instead of dicts since the slotted products, prices in cents
+        legacy_result = [in_cents(md) for md in legacy_result]
+        compiled_result = [product.to_dict() for product in compiled_result]
+        assert legacy_result == compiled_result, f"{name}: different output"
+
+        print(
+            f"{name:<16}{legacy_time * 1000:>14.1f}ms{compiled_time * 1000:>14.1f}ms"
+            f"  {legacy_time / compiled_time:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
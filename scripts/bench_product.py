@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Memory of parsed products - dicts as before against the slotted 'Product'
+
+    python scripts/bench_product.py [--products 100000]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import glob
+import argparse
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FOLDER = os.path.join(PROJECT_ROOT, "data")
+sys.path.insert(0, PROJECT_ROOT)
+
+from rewe_dl import codec
+from rewe_dl.constants import PRODUCT_FIELDS, Product
+
+
+def load_rows(count: int) -> list[tuple]:
+    rows = []
+    for file in sorted(glob.glob(os.path.join(DATA_FOLDER, "*.json"))):
+        with open(file, "rb") as fp:
+            rows += [tuple(md[field] for field in PRODUCT_FIELDS) for md in codec.loads(fp.read())]
+
+    if not rows:
+        sys.exit("no json files found")
+
+    # repeat the fixtures up to 'count' - the values are shared, only the containers count
+    return [rows[idx % len(rows)] for idx in range(count)]
+
+
+def measure(build) -> tuple[int, list]:
+    """bytes allocated by 'build()' and still alive"""
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = load_rows(args.products)
+
+    cases = [
+        ("dict", lambda: [dict(zip(PRODUCT_FIELDS, row)) for row in rows]),
+        ("Product", lambda: [Product(*row) for row in rows]),
+    ]
+
+    print(f"{len(rows)} products\n")
+    print(f"{'container':<12}{'total':>12}{'per product':>14}")
+
+    for name, build in cases:
+        size, result = measure(build)
+        print(f"{name:<12}{size / 1024 / 1024:>10.1f}MiB{size / len(result):>12.0f} B")
+        del result
+
+
+if __name__ == "__main__":
+    main()
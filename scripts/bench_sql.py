@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Writing a crawl to sqlite - one INSERT per product as before against 'SqlWriter'
+
+Products are rebuilt from 'data/' like 'scripts/bench_product.py'.
+
+    python scripts/bench_sql.py [--products 20000]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from rewe_dl.constants import Product
+from rewe_dl.postprocessor.sql import CREATE_DEALS, SqlWriter
+
+from bench_product import load_rows
+
+
+def legacy_insert(databank_file: str, md_list: list, date: str) -> None:
+    """'SqlPP.sql_insert' before the bulk writer"""
+    connector = sqlite3.connect(databank_file, timeout=10, check_same_thread=False)
+    cursor = connector.cursor()
+    cursor.execute(CREATE_DEALS)
+
+    for product in md_list:
+        values = (*product.to_row(), date)
+
+        try:
+            cursor.execute("INSERT INTO deals VALUES ({0})".format(", ".join("?" for _ in values)), values)
+        except Exception:
+            cursor.execute(
+                "INSERT or REPLACE INTO deals VALUES ({0})".format(", ".join("?" for _ in values)), values
+            )
+
+    connector.commit()
+    connector.close()
+
+
+def bulk_insert(databank_file: str, md_list: list, date: str) -> dict:
+    with SqlWriter(databank_file) as writer:
+        return writer.write(md_list, date)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20_000)
+    args = parser.parse_args()
+
+    # unique ids - every row is a new one
+    rows = load_rows(args.products)
+    products = [Product(*row[:3], str(idx), *row[4:]) for idx, row in enumerate(rows)]
+    date = datetime.today().strftime("%Y-%m-%d %H:%M:%S")
+
+    print(f"{len(products)} products\n")
+    print(f"{'writer':<18}{'run':<8}{'time':>10}{'rows/s':>12}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for name, write in (("INSERT per row", legacy_insert), ("SqlWriter", bulk_insert)):
+            databank_file = os.path.join(folder, f"{name.split()[0].lower()}.sqlite3")
+
+            # the second run writes the same crawl again - every row is an update
+            for run in ("new", "again"):
+                start = time.perf_counter()
+                write(databank_file, products, date)
+                elapsed = time.perf_counter() - start
+
+                print(f"{name:<18}{run:<8}{elapsed:>9.3f}s{len(products) / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+"""Turn the daily observations of the price history into change-only intervals
+
+Intervals already in the history are merged in, running it again changes nothing.
+
+    python scripts/compact_history.py [data/price_history.sqlite3] [--delete]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from rewe_dl.history import HISTORY_FILE, PriceHistory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=HISTORY_FILE)
+    parser.add_argument("--delete", action="store_true", help="remove the daily observations afterwards")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        sys.exit(f"{args.path} not found")
+
+    size = os.path.getsize(args.path)
+    start = time.perf_counter()
+
+    with PriceHistory(args.path) as history:
+        stats = history.compact(delete=args.delete)
+
+    elapsed = time.perf_counter() - start
+    print(f"{stats['observations']} observations -> {stats['intervals']} intervals in {elapsed:.2f}s")
+    print(f"{size / 1024 / 1024:.1f}MiB -> {os.path.getsize(args.path) / 1024 / 1024:.1f}MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -54,7 +54,7 @@ def build_setuptools():
         install_requires=[
             "httpx",
         ],
-        extras_require={},
+        extras_require={"fast": ["orjson"], "http2": ["httpx[http2]"]},
         packages=PACKAGES,
         # data_files=FILES,
         test_suite="test",
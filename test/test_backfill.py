@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import json
+import sqlite3
+import unittest
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl import utils
+from rewe_dl.history import PriceHistory
+from rewe_dl.backfill import backfill, discover, normalize, to_cents, read_file
+from rewe_dl.postprocessor.sql import SqlPP
+
+from test_constants import make_product
+
+# a product as the old parser saved it - euro floats
+OLD_PRODUCT = {
+    "store": "rewe.de",
+    "product": "Gouda jung 80g",
+    "link": "https://rewe.de/produkte/2621809",
+    "product_id": "2621809",
+    "price": 1.29,
+    "old_price": 1.59,
+    "saved": 0.3,
+    "brand": "REWE Beste Wahl",
+    "picture": "https://img.rewe-static.de/2621809.png",
+}
+
+
+def old_sqlite(path: str, rows: list[tuple]) -> None:
+    """a 'deals' table of the old 'SqlPP' - REAL prices"""
+    connector = sqlite3.connect(path)
+    connector.execute(
+        "CREATE TABLE deals (store TEXT, product TEXT, link TEXT, product_id TEXT, price REAL, "
+        "old_price REAL, saved REAL, brand TEXT, picture TEXT, date TEXT, PRIMARY KEY (product_id, date)) "
+        "WITHOUT ROWID"
+    )
+    connector.executemany("INSERT INTO deals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    connector.commit()
+    connector.close()
+
+
+class BackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.data = self.folder.name
+        self.history = os.path.join(self.data, "price_history.sqlite3")
+
+        # old json array of euros, 'save_to_json' of cents, an old sqlite file and files without products
+        other = {**OLD_PRODUCT, "product_id": "1", "price": 2.0, "old_price": 2.0, "saved": 0.0}
+        with open(os.path.join(self.data, "discounted_to_json-2025-01-07.json"), "w") as fp:
+            json.dump([OLD_PRODUCT, other], fp)
+
+        file_name = os.path.join(self.data, "deals-2025-01-14.json")
+        utils.save_to_json([make_product(price=105, saved=54).to_dict()], file_name)
+        old_sqlite(
+            os.path.join(self.data, "my_basket.sqlite3"),
+            [
+                (*OLD_PRODUCT.values(), "2025-01-07 10:00:00"),
+                (*OLD_PRODUCT.values(), "2025-01-21 10:00:00"),
+            ],
+        )
+        with open(os.path.join(self.data, "categories-8534540.json"), "w") as fp:
+            json.dump({"store_id": "8534540", "categories": []}, fp)
+        SqlPP.sql_insert(os.path.join(self.data, "new.sqlite3"), [make_product(price=99, saved=60)])
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def prices(self) -> list[tuple]:
+        with PriceHistory(self.history) as history:
+            return history.connector.execute(
+                "SELECT date, product_id, price, old_price, saved FROM prices ORDER BY date, product_id"
+            ).fetchall()
+
+    def test_to_cents(self):
+        euros = (1.05, 0.29, 6.0, "1.05", 6, None)
+        self.assertEqual([to_cents(value) for value in euros], [105, 29, 600, 105, 600, None])
+
+        cents = (129, "129", 199.0, None)
+        self.assertEqual([to_cents(value, cents=True) for value in cents], [129, 129, 199, None])
+
+    def test_normalize(self):
+        row = normalize({**OLD_PRODUCT, "saved": None, "old_price": None, "time": "x"})
+        self.assertEqual(row, make_product(link=OLD_PRODUCT["link"], old_price=129, saved=0).to_row())
+
+    def test_read_file(self):
+        by_date = read_file(os.path.join(self.data, "my_basket.sqlite3"))
+        self.assertEqual(list(by_date), ["2025-01-07", "2025-01-21"])
+        self.assertEqual(read_file(os.path.join(self.data, "categories-8534540.json")), {})
+
+    def test_json_unit_per_file(self):
+        # 2.0 is a euro float - the whole file is in euros
+        path = os.path.join(self.data, "euros-2025-01-07.json")
+        with open(path, "w") as fp:
+            json.dump([{**OLD_PRODUCT, "price": 2.0, "old_price": 3, "saved": 1}], fp)
+
+        self.assertEqual(read_file(path)["2025-01-07"][0][4:7], (200, 300, 100))
+
+    def test_backfill(self):
+        stats = backfill(self.data, self.history, store_id="1", max_workers=1)
+
+        today = self.prices()[-1][0]
+        self.assertEqual(
+            self.prices(),
+            [
+                ("2025-01-07", "1", 200, 200, 0),
+                ("2025-01-07", "2621809", 129, 159, 30),
+                ("2025-01-14", "2621809", 105, 159, 54),
+                ("2025-01-21", "2621809", 129, 159, 30),
+                (today, "2621809", 99, 159, 60),
+            ],
+        )
+        # the json and the sqlite file both have 2621809 on 2025-01-07
+        self.assertEqual(stats, {"files": 5, "skipped": 0, "rows": 6, "inserted": 5, "updated": 1})
+        self.assertNotIn(self.history, discover(self.data, exclude=(self.history,)))
+
+    def test_idempotent(self):
+        backfill(self.data, self.history, max_workers=1)
+        before = self.prices()
+
+        stats = backfill(self.data, self.history, max_workers=1)
+        self.assertEqual(stats, {"files": 0, "skipped": 5, "rows": 0, "inserted": 0, "updated": 0})
+        self.assertEqual(self.prices(), before)
+
+        # a changed file is imported again
+        with open(os.path.join(self.data, "discounted_to_json-2025-01-07.json"), "w") as fp:
+            json.dump([{**OLD_PRODUCT, "price": 0.99, "saved": 0.6}], fp)
+
+        stats = backfill(self.data, self.history, max_workers=1)
+        self.assertEqual((stats["files"], stats["skipped"], stats["updated"]), (1, 4, 1))
+        self.assertIn(("2025-01-07", "2621809", 99, 159, 60), self.prices())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import logging
+import unittest
+from array import array
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl import batch as batch_module
+from rewe_dl.parser import Parser
+from rewe_dl.batch import ProductBatch, DictionaryColumn
+
+from test_extract import PRODUCT_TILE, SEARCH_RESULT_PRODUCT
+
+log = logging.getLogger(__name__)
+
+
+def search_result_product(product_id: str, brand: str, price: int, old_price: int) -> dict:
+    pricing = {"currentRetailPrice": price, "discount": {"regularPrice": old_price}}
+
+    return {
+        **SEARCH_RESULT_PRODUCT,
+        "id": product_id,
+        "nan": product_id,
+        "brand": {"name": brand},
+        "_embedded": {"articles": [{"_embedded": {"listing": {"pricing": pricing}}}]},
+    }
+
+
+PAGES = [
+    {
+        "_embedded": {
+            "products": [
+                search_result_product("1", "ja!", 129, 159),
+                search_result_product("2", "REWE Bio", 249, 0),
+            ]
+        }
+    },
+    {"_embedded": {"products": [search_result_product("3", "ja!", 99, 199)]}},
+]
+
+
+class DictionaryColumnTest(unittest.TestCase):
+    def test_encoding(self):
+        column = DictionaryColumn(["a", "b", "a", "a", "c"])
+
+        self.assertEqual(column.codes, array("i", [0, 1, 0, 0, 2]))
+        self.assertEqual(column.values, ["a", "b", "c"])
+        self.assertEqual(list(column), ["a", "b", "a", "a", "c"])
+
+        column.extend(["c", "d"])
+        self.assertEqual(column.values, ["a", "b", "c", "d"])
+        self.assertEqual(list(column.take([6, 0])), ["d", "a"])
+
+
+class ProductBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.products = [product for page in PAGES for product in page["_embedded"]["products"]]
+        self.batch = ProductBatch.from_products(self.products)
+
+    def test_columns(self):
+        batch = self.batch
+
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.price, array("q", [129, 249, 99]))
+        # no 'regularPrice' - the price
+        self.assertEqual(batch.old_price, array("q", [159, 249, 199]))
+        self.assertEqual(batch.saved, array("q", [30, 0, 100]))
+        self.assertEqual(batch.brand.values, ["ja!", "REWE Bio"])
+        self.assertEqual(batch.product_id, ["1", "2", "3"])
+
+    def test_parse_batch(self):
+        self.assertEqual(Parser().parse_batch(PAGES).product_id, ["1", "2", "3"])
+        self.assertEqual(len(Parser().parse_batch(PAGES[0])), 2)
+
+    def test_rows_same_as_parser(self):
+        parsed = [Parser().product_md_from_product(product).to_dict() for product in self.products]
+
+        self.assertEqual([product.to_dict() for product in self.batch], parsed)
+
+    def test_product_tiles(self):
+        batch = Parser().parse_product_infos_batch([PRODUCT_TILE])
+        parsed = Parser().parse_product_infos([PRODUCT_TILE])
+
+        self.assertEqual([product.to_dict() for product in batch], [product.to_dict() for product in parsed])
+
+    def test_sort_select(self):
+        ordered = self.batch.sort_by("saved", reverse=True)
+        self.assertEqual(ordered.product_id, ["3", "1", "2"])
+        self.assertEqual(list(ordered.brand), ["ja!", "ja!", "REWE Bio"])
+
+        self.assertEqual(self.batch.sort_by("price").product_id, ["3", "1", "2"])
+        self.assertEqual(self.batch.discounted().product_id, ["1", "3"])
+        self.assertEqual(self.batch.select([False, True, False]).price, array("q", [249]))
+
+        with self.assertRaises(KeyError):
+            self.batch.sort_by("unknown")
+
+    def test_pure_python(self):
+        numpy, batch_module.numpy = batch_module.numpy, None
+        try:
+            self.assertEqual(self.batch.argsort("saved", reverse=True), [2, 0, 1])
+        finally:
+            batch_module.numpy = numpy
+
+    @unittest.skipIf(batch_module.numpy is None, "numpy is not installed")
+    def test_to_numpy(self):
+        arrays = self.batch.to_numpy()
+
+        self.assertEqual(arrays["saved"].tolist(), [30, 0, 100])
+        # a view of the column
+        self.assertFalse(arrays["price"].flags.owndata)
+        self.assertEqual(arrays["brand_values"][arrays["brand"]].tolist(), ["ja!", "REWE Bio", "ja!"])
+        self.assertEqual(self.batch.select(arrays["saved"] >= 100).product_id, ["3"])
+
+    @unittest.skipIf(batch_module.pyarrow is None, "pyarrow is not installed")
+    def test_to_arrow(self):
+        table = self.batch.to_arrow()
+
+        self.assertEqual(table.column("saved").to_pylist(), [30, 0, 100])
+        self.assertEqual(table.column("brand").to_pylist(), ["ja!", "REWE Bio", "ja!"])
+
+    def test_without_numpy(self):
+        numpy, batch_module.numpy = batch_module.numpy, None
+        try:
+            with self.assertRaises(ImportError):
+                self.batch.to_numpy()
+        finally:
+            batch_module.numpy = numpy
+
+
+if __name__ == "__main__":
+    unittest.main()
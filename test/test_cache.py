@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import json
+import logging
+import tempfile
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl import rewe
+from rewe_dl.rewe import STORE
+from rewe_dl.cache import ResponseCache, memoize
+
+import httpx
+
+log = logging.getLogger(__name__)
+
+
+class CountingServer:
+    """'httpx.MockTransport' handler that counts requests and supports 'ETag'"""
+
+    def __init__(self, etag: str = None):
+        self.etag = etag
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+
+        if self.etag and request.headers.get("if-none-match") == self.etag:
+            return httpx.Response(304)
+
+        headers = {"etag": self.etag} if self.etag else {}
+        body = json.dumps({"url": str(request.url), "count": len(self.requests)})
+        return httpx.Response(200, content=body.encode(), headers=headers)
+
+    def send(self, url: str):
+        def send(headers: dict = {}):
+            return self(httpx.Request("GET", url, headers=headers))
+
+        return send
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "http_cache.sqlite3")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_key_normalized(self):
+        key = ResponseCache.key
+
+        self.assertEqual(
+            key("get", "https://www.rewe.de/shop/api/products?", {"page": 1, "search": "ja"}),
+            key("GET", "https://www.rewe.de/shop/api/products?search=ja", "page=1"),
+        )
+        self.assertNotEqual(
+            key("get", "https://www.rewe.de/shop/api/products", {"page": 1}, store_id="1"),
+            key("get", "https://www.rewe.de/shop/api/products", {"page": 1}, store_id="2"),
+        )
+
+    def test_hit(self):
+        cache = ResponseCache(self.path)
+        server = CountingServer()
+        url = "https://www.rewe.de/shop/api/suggestions"
+
+        first = cache.fetch(url, {"q": "tuc"}, server.send(url))
+        second = cache.fetch(url, {"q": "tuc"}, server.send(url))
+
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_ttl_and_revalidation(self):
+        cache = ResponseCache(self.path, ttls={"/suggestions": 0})
+        server = CountingServer(etag='"v1"')
+        url = "https://www.rewe.de/shop/api/suggestions"
+
+        first = cache.fetch(url, None, server.send(url))
+        second = cache.fetch(url, None, server.send(url))
+
+        # expired right away - revalidated with a conditional request
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(server.requests[1].headers.get("if-none-match"), '"v1"')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(cache.stats()["revalidated"], 1)
+
+    def test_lru_eviction(self):
+        server = CountingServer()
+        url = "https://www.rewe.de/shop/api/products"
+
+        body_size = len(server(httpx.Request("GET", url + "?page=1")).content)
+        cache = ResponseCache(self.path, max_size=body_size * 2 + 1)
+
+        for page in (1, 2):
+            cache.fetch(url, {"page": page}, server.send(f"{url}?page={page}"))
+        # page 1 is now the most recently used one
+        cache.fetch(url, {"page": 1}, server.send(f"{url}?page=1"))
+        cache.fetch(url, {"page": 3}, server.send(f"{url}?page=3"))
+
+        self.assertEqual(cache.stats()["entries"], 2)
+
+        requests = len(server.requests)
+        cache.fetch(url, {"page": 1}, server.send(f"{url}?page=1"))
+        self.assertEqual(len(server.requests), requests)
+
+        cache.fetch(url, {"page": 2}, server.send(f"{url}?page=2"))
+        self.assertEqual(len(server.requests), requests + 1)
+
+    def test_store_call(self):
+        server = CountingServer()
+        store = STORE()
+        session = rewe.get_session(create=False)
+        limiter = rewe.get_limiter()
+        breaker = rewe.get_breaker()
+
+        rewe.set_session(httpx.Client(transport=httpx.MockTransport(server)))
+        rewe.set_limiter(rate=None)
+        rewe.set_breaker()
+        rewe.set_cache(ResponseCache(self.path))
+        try:
+            first = store.call(endpoint="suggestions", params={"q": "milch"})
+            second = store.call(endpoint="suggestions", params={"q": "milch"})
+        finally:
+            rewe.disable_cache()
+            rewe.set_session(session)
+            rewe.set_limiter(limiter)
+            rewe.set_breaker(breaker)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(server.requests), 1)
+
+
+class FakeStore:
+    def __init__(self, store_id):
+        self.STORE_ID = store_id
+        self.calls = 0
+
+    @memoize(maxsize=2, ttl=60)
+    def search(self, search_term: str, max_page: int = 1):
+        self.calls += 1
+        for page in range(1, max_page + 1):
+            yield {"search_term": search_term, "page": page, "store_id": self.STORE_ID}
+
+    @memoize(maxsize=2, ttl=0)
+    def userdata(self):
+        self.calls += 1
+        return {"store_id": self.STORE_ID}
+
+
+class MemoizeTest(unittest.TestCase):
+    def setUp(self):
+        FakeStore.search.cache_clear()
+        FakeStore.userdata.cache_clear()
+
+    def test_generator_cached_after_consumed(self):
+        store = FakeStore("1")
+
+        first = list(store.search("ja", max_page=2))
+        second = list(store.search(search_term="ja", max_page=2))
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(store.calls, 1)
+        self.assertEqual(FakeStore.search.cache_info().hits, 1)
+
+    def test_partially_consumed_not_cached(self):
+        store = FakeStore("1")
+
+        next(store.search("ja", max_page=2))
+        self.assertEqual(len(list(store.search("ja", max_page=2))), 2)
+        self.assertEqual(store.calls, 2)
+
+    def test_keyed_on_store_id(self):
+        list(FakeStore("1").search("ja"))
+        other = FakeStore("2")
+
+        self.assertEqual(list(other.search("ja"))[0]["store_id"], "2")
+
+        # a new instance with the same store id shares the cache
+        same = FakeStore("2")
+        list(same.search("ja"))
+        self.assertEqual(same.calls, 0)
+
+    def test_maxsize(self):
+        store = FakeStore("1")
+        for term in ("a", "b", "c"):
+            list(store.search(term))
+
+        self.assertEqual(FakeStore.search.cache_info().currsize, 2)
+
+    def test_ttl(self):
+        store = FakeStore("1")
+        store.userdata()
+        store.userdata()
+
+        self.assertEqual(store.calls, 2)
+        self.assertEqual(FakeStore.userdata.cache_info().misses, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import logging
+import unittest
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.categories import CategoryTree
+
+log = logging.getLogger(__name__)
+
+CONSTRAINTS = [
+    {
+        "name": "Obst & Gemüse",
+        "slug": "obst-gemuese",
+        "count": 30,
+        "subFacetConstraints": [
+            {"name": "Obst", "slug": "obst", "count": 20},
+            {
+                "name": "Gemüse",
+                "slug": "gemuese",
+                "count": 10,
+                "subFacetConstraints": [{"name": "Salat", "slug": "salat", "count": 4}],
+            },
+        ],
+    },
+    {"name": "Getränke", "slug": "getraenke", "count": 50},
+]
+
+PAGE = {"facets": [{"name": "brand"}, {"name": "category", "facetConstraints": CONSTRAINTS}]}
+
+
+class CategoryTreeTest(unittest.TestCase):
+    def setUp(self):
+        # the same facets on every page
+        self.tree = CategoryTree.from_search_result([PAGE, PAGE], store_id="1")
+
+    def test_index(self):
+        tree = self.tree
+
+        self.assertEqual(len(tree), 5)
+        self.assertEqual(tree.roots, ["obst-gemuese", "getraenke"])
+        self.assertEqual(tree["obst-gemuese"].children, ["obst", "gemuese"])
+        self.assertEqual(tree["salat"].parent, "gemuese")
+        self.assertEqual(tree.find("Gemüse").count, 10)
+        self.assertIsNone(tree.get("fleisch"))
+
+    def test_navigation(self):
+        tree = self.tree
+
+        self.assertEqual(tree.leaf_slugs(), ["obst", "salat", "getraenke"])
+        self.assertEqual(tree.path("salat"), ["obst-gemuese", "gemuese", "salat"])
+        self.assertEqual(tree.descendants("obst-gemuese"), ["obst", "gemuese", "salat"])
+        # the constraints without their sub constraints
+        self.assertEqual(tree["salat"].data, {"name": "Salat", "slug": "salat", "count": 4})
+        self.assertNotIn("subFacetConstraints", tree["gemuese"].data)
+
+    def test_no_category_facet(self):
+        self.assertEqual(len(CategoryTree.from_search_result([{"facets": [{"name": "brand"}]}, {}])), 0)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as folder:
+            self.tree.save(folder)
+
+            loaded = CategoryTree.load("1", folder=folder)
+            self.assertEqual(loaded.to_dict(), self.tree.to_dict())
+            self.assertEqual(loaded["gemuese"].children, ["salat"])
+
+            self.assertIsNone(CategoryTree.load("2", folder=folder))
+
+            self.tree.created -= 3600
+            self.tree.save(folder)
+            self.assertIsNone(CategoryTree.load("1", ttl=60, folder=folder))
+            self.assertIsNotNone(CategoryTree.load("1", ttl=None, folder=folder))
+
+    def test_broken_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            with open(CategoryTree.file_name("1", folder), "w") as fp:
+                fp.write("{broken")
+
+            self.assertIsNone(CategoryTree.load("1", folder=folder))
+
+
+if __name__ == "__main__":
+    unittest.main()
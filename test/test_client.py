@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import logging
+import unittest
+from unittest import mock
+
+import httpx
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl import client
+
+log = logging.getLogger(__name__)
+
+
+class ClientTest(unittest.TestCase):
+    def setUp(self):
+        self.options = dict(client.OPTIONS)
+
+    def tearDown(self):
+        client.configure(**self.options)
+
+    def test_clients_share_pool(self):
+        first = client.make_client(cookies={"wksMarketsCookie": "1"})
+        second = client.make_client(cookies={"wksMarketsCookie": "2"})
+
+        self.assertIs(first._transport, second._transport)
+        self.assertNotEqual(first.cookies.get("wksMarketsCookie"), second.cookies.get("wksMarketsCookie"))
+
+    def test_configure(self):
+        before = client.get_transport()
+        options = client.configure(max_connections=5, timeout=3.0)
+
+        self.assertEqual(options["max_connections"], 5)
+        self.assertIsNot(client.get_transport(), before)
+        self.assertEqual(client.make_client().timeout.read, 3.0)
+
+    def test_configure_closes_old_pool(self):
+        before = client.get_transport()
+        made_before = client.make_client()
+
+        with mock.patch.object(before, "close") as close:
+            client.configure(max_connections=5)
+
+        close.assert_called_once()
+
+        # clients made before send through the new pool
+        response = httpx.Response(200)
+        with mock.patch.object(client.get_transport(), "handle_request", return_value=response) as send:
+            made_before.get("https://example.org")
+
+        send.assert_called_once()
+
+    def test_close_keeps_pool(self):
+        with mock.patch.object(client.get_transport(), "close") as close:
+            client.make_client().close()
+
+        close.assert_not_called()
+
+    def test_no_cookies_of_other_clients(self):
+        sent = []
+
+        def handler(request):
+            sent.append(request.headers.get("cookie"))
+            return httpx.Response(200, headers={"set-cookie": "tracking=1"})
+
+        session = client.make_client(cookies={"wksMarketsCookie": "secret"})
+        with mock.patch.object(client, "get_transport", return_value=httpx.MockTransport(handler)):
+            with client.make_client() as webhook:
+                webhook.get("https://api.telegram.org/bot/sendMessage")
+
+        self.assertEqual(sent, [None])
+        self.assertEqual(dict(session.cookies), {"wksMarketsCookie": "secret"})
+
+    def test_configure_unknown_option(self):
+        with self.assertRaises(ValueError):
+            client.configure(pool_size=5)
+
+    def test_http2_without_h2(self):
+        if client.HAS_HTTP2:
+            self.skipTest("h2 is installed")
+
+        self.assertFalse(client.configure(http2=True)["http2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
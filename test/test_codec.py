@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import json
+import logging
+import datetime
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl import codec
+
+log = logging.getLogger(__name__)
+
+DOCUMENTS = [
+    {"product": "Beck's Pils 20x0,5l", "price": 10.49, "old_price": 19.49, "saved": 9.0, "brand": None},
+    {"product": "Käse 😀\x7f", "tags": ["bio", "vegan"], "nested": {"b": [], "a": {}}, "count": 2**40},
+    [{"date": datetime.date(2024, 1, 1)}, {"id": 1, "ok": True}],
+    {"big": 2**70, "keys": {10: "ten", 2: "two"}},
+    # separators and breaks inside strings stay as they are
+    {"text": "a,\n  b: c", "nested": [[], {}, [1, [2.5, {"x": "y, z"}]]], "empty": ""},
+]
+
+OPTIONS = [
+    {},
+    {"indent": 2},
+    {"indent": 4},
+    {"indent": 4, "sort_keys": True},
+    {"separators": (", ", ": ")},
+    {"ensure_ascii": False},
+    {"indent": 2, "ensure_ascii": False, "sort_keys": True},
+    {"separators": (",", ":"), "sort_keys": True},
+    {"separators": (",", ":"), "ensure_ascii": False},
+]
+
+
+class CodecTest(unittest.TestCase):
+    def tearDown(self):
+        codec.set_backend()
+
+    def test_dumps_same_as_json(self):
+        for backend in codec.available_backends():
+            codec.set_backend(backend)
+
+            for document in DOCUMENTS:
+                for options in OPTIONS:
+                    self.assertEqual(
+                        codec.dumps(document, default=str, **options),
+                        json.dumps(document, default=str, **options),
+                        f"{backend} {options}",
+                    )
+
+    @unittest.skipIf(codec.orjson is None, "orjson is not installed")
+    def test_orjson_layouts(self):
+        # the layouts of 'json_compact', 'save_to_json' and the ranking files are written by orjson
+        for indent, separators in ((None, (",", ":")), (2, None), (4, None), (4, (",", ": "))):
+            self.assertIsNotNone(codec._orjson_layout(indent, separators), f"{indent} {separators}")
+
+        # json is as fast for the default separators
+        self.assertIsNone(codec._orjson_layout(None, None))
+        self.assertIsNone(codec._orjson_layout(3, None))
+        self.assertIsNone(codec._orjson_layout(None, (";", "=")))
+
+    def test_loads_same_as_json(self):
+        raw = json.dumps(DOCUMENTS[:2] + [{"big": 2**70, "nan": float("nan")}])
+
+        for backend in codec.available_backends():
+            codec.set_backend(backend)
+
+            loaded = codec.loads(raw.encode())
+            self.assertEqual(loaded[:2], json.loads(raw)[:2])
+            self.assertEqual(loaded[2]["big"], 2**70)
+
+    def test_errors(self):
+        for backend in codec.available_backends():
+            codec.set_backend(backend)
+
+            with self.assertRaises(ValueError):
+                codec.loads(b"{not json")
+
+            with self.assertRaises(TypeError):
+                codec.dumps({"date": datetime.date(2024, 1, 1)})
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            codec.set_backend("simdjson")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import json
+import logging
+import unittest
+import tempfile
+from dataclasses import asdict
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl import utils
+from rewe_dl.constants import PRODUCT_FIELDS, Product
+
+log = logging.getLogger(__name__)
+
+
+def make_product(**kwargs) -> Product:
+    values = {
+        "store": "rewe.de",
+        "product": "Gouda jung 80g",
+        "link": "https://shop.rewe.de/p/2621809",
+        "product_id": "2621809",
+        "price": 129,
+        "old_price": 159,
+        "saved": 30,
+        "brand": "REWE Beste Wahl",
+        "picture": "https://img.rewe-static.de/2621809.png",
+    }
+    values.update(kwargs)
+
+    return Product(**values)
+
+
+class ProductTest(unittest.TestCase):
+    def test_slots(self):
+        product = make_product()
+
+        self.assertFalse(hasattr(product, "__dict__"))
+        with self.assertRaises(AttributeError):
+            product.other = 1
+
+    def test_conversions(self):
+        product = make_product()
+
+        self.assertEqual(product.to_dict(), asdict(product))
+        self.assertEqual(list(product.to_dict()), list(PRODUCT_FIELDS))
+        self.assertEqual(product.to_row(), tuple(asdict(product).values()))
+        self.assertEqual(Product(*product.to_row()), product)
+
+    def test_mapping_access(self):
+        product = make_product()
+
+        self.assertEqual(product["price"], 129)
+        self.assertEqual(product.get("brand"), "REWE Beste Wahl")
+        self.assertIsNone(product.get("missing"))
+        self.assertIn("saved", product)
+        self.assertEqual(dict(product.items()), product.to_dict())
+        with self.assertRaises(KeyError):
+            product["missing"]
+
+    def test_save_to_json(self):
+        products = [make_product(), make_product(product_id="1")]
+
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "products.jsonl")
+            utils.save_to_jsonl(products, file_name)
+
+            with open(file_name) as fp:
+                loaded = [json.loads(line) for line in fp]
+
+        self.assertEqual(loaded, [product.to_dict() for product in products])
+
+
+if __name__ == "__main__":
+    unittest.main()
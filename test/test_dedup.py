@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import logging
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.dedup import DedupIndex, BloomFilter
+from rewe_dl.parser import Parser
+
+from test_batch import search_result_product
+
+log = logging.getLogger(__name__)
+
+
+class BloomFilterTest(unittest.TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [f"key-{idx}" for idx in range(1000)]
+
+        self.assertEqual([bloom.add(key) for key in keys], [False] * 1000)
+        self.assertTrue(all(key in bloom for key in keys))
+        self.assertEqual(bloom.count, 1000)
+
+    def test_error_rate(self):
+        bloom = BloomFilter(capacity=2000, error_rate=0.01)
+        for idx in range(2000):
+            bloom.add(f"seen-{idx}")
+
+        false_positives = sum(f"new-{idx}" in bloom for idx in range(10_000))
+        # 1% expected, generous bound
+        self.assertLess(false_positives, 300)
+        # about 1.2 bytes per key
+        self.assertLess(len(bloom.bits), 2000 * 2)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            BloomFilter(error_rate=1.5)
+
+
+class DedupIndexTest(unittest.TestCase):
+    def test_modes(self):
+        for mode in ("exact", "bloom"):
+            index = DedupIndex(store_id="1", mode=mode)
+
+            self.assertFalse(index.seen("a"))
+            self.assertTrue(index.seen("a"))
+            self.assertFalse(index.seen("a", store_id="2"))
+            self.assertIn("a", index)
+
+            self.assertEqual(
+                index.stats(), {"mode": mode, "checked": 3, "duplicates": 1, "unique": 2, "ratio": 0.3333}
+            )
+
+        with self.assertRaises(ValueError):
+            DedupIndex(mode="fuzzy")
+
+    def test_filter(self):
+        index = DedupIndex(store_id="1")
+        products = [{"id": "a"}, {"id": "b"}, {"id": "a"}]
+
+        self.assertEqual(list(index.filter(products)), [{"id": "a"}, {"id": "b"}])
+        tiles = [{"productId": "b"}, {"productId": "c"}]
+        self.assertEqual(list(index.filter(tiles, key="productId")), [{"productId": "c"}])
+        self.assertEqual(index.ratio, 0.4)
+
+    def test_parser(self):
+        # the child category repeats the products of its parent
+        products = [search_result_product(str(idx), "ja!", 100, 150) for idx in range(4)]
+        parent, child = {"_embedded": {"products": products}}, {"_embedded": {"products": products[2:]}}
+        index = DedupIndex(store_id="1")
+
+        parsed = [
+            product.product_id
+            for page in (parent, child)
+            for product in Parser().parse_search_results_products([page], dedup=index)
+        ]
+
+        self.assertEqual(parsed, ["0", "1", "2", "3"])
+        self.assertEqual(index.duplicates, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import logging
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.extract import compile_fields, extract_product_tiles, extract_search_result
+
+log = logging.getLogger(__name__)
+
+SEARCH_RESULT_PRODUCT = {
+    "id": "2621809",
+    "productName": "Gouda jung 80g",
+    "nan": "2621809",
+    "brand": {"name": "REWE Beste Wahl"},
+    "media": {"images": [{"_links": {"self": {"href": "https://img.rewe-static.de/2621809.png"}}}]},
+    "_embedded": {
+        "articles": [
+            {"_embedded": {"listing": {"pricing": {"currentRetailPrice": 129, "discount": {"regularPrice": 159}}}}}
+        ]
+    },
+}
+
+PRODUCT_TILE = {
+    "productId": "265601",
+    "productName": "Milch 1l",
+    "nan": "265601",
+    "manufacturer": {"name": "Weihenstephan"},
+    "pricing": {"price": 119},
+    "mediaInformation": [{"mediaUrl": "https://img.rewe-static.de/265601.png"}],
+}
+
+
+class CompileFieldsTest(unittest.TestCase):
+    def test_paths(self):
+        extract = compile_fields({"a": ("a", None), "b": ("b.0.c", None), "d": ("d.1", "default")})
+
+        self.assertEqual(extract({"a": 1, "b": [{"c": 2}], "d": [3, 4]}), (1, 2, 4))
+        self.assertEqual(extract.fields, ("a", "b", "d"))
+
+    def test_missing_gives_default(self):
+        extract = compile_fields({"a": ("a.b", 0), "b": ("b.0", ""), "c": ("c.d", "-")})
+
+        self.assertEqual(extract({"a": {}, "b": [], "c": None}), (0, "", "-"))
+        self.assertEqual(extract({}), (0, "", "-"))
+
+    def test_alternatives(self):
+        extract = compile_fields({"id": (("productId", "id"), "")})
+
+        self.assertEqual(extract({"productId": "1", "id": "2"}), ("1",))
+        self.assertEqual(extract({"id": "2"}), ("2",))
+        self.assertEqual(extract({}), ("",))
+
+    def test_search_result(self):
+        self.assertEqual(
+            extract_search_result(SEARCH_RESULT_PRODUCT),
+            (
+                "Gouda jung 80g",
+                "2621809",
+                "2621809",
+                "REWE Beste Wahl",
+                159,
+                129,
+                "https://img.rewe-static.de/2621809.png",
+            ),
+        )
+
+    def test_product_tiles(self):
+        self.assertEqual(
+            extract_product_tiles(PRODUCT_TILE),
+            (
+                "Milch 1l",
+                "265601",
+                "265601",
+                "Weihenstephan",
+                0,
+                119,
+                "https://img.rewe-static.de/265601.png",
+            ),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
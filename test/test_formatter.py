@@ -31,6 +31,20 @@ class TesFormatter(CustomTestCase):
 
         self.assertEqual(expected, outs)
 
+    def test_price_cent_to_numeric_leading_zero(self):
+        self.assertEqual(formatter.price_cent_to_numeric(105), 1.05)
+        self.assertEqual(formatter.price_cent_to_numeric(1001), 10.01)
+
+    def test_euros_to_cents(self):
+        for euros, cents in [(0.29, 29), (1.05, 105), ("10.0", 1000), (19.99, 1999), (-0.5, -50)]:
+            self.assertEqual(formatter.euros_to_cents(euros), cents)
+            self.assertIsInstance(formatter.euros_to_cents(euros), int)
+
+    def test_format_euros(self):
+        self.assertEqual(formatter.format_euros(105), "1.05 €")
+        self.assertEqual(formatter.format_euros(-5), "-0.05 €")
+        self.assertEqual(formatter.format_euros(100025, currency=""), "1000.25")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import sqlite3
+import unittest
+import tempfile
+from datetime import date, datetime
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.history import SELECT_PRICES, PriceHistory, day
+from rewe_dl.postprocessor.sql import SqlPP
+
+from test_constants import make_product
+
+
+class PriceHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "history.sqlite3")
+        self.history = PriceHistory(self.path, batch_size=2)
+
+    def tearDown(self):
+        self.history.close()
+        self.folder.cleanup()
+
+    def test_day(self):
+        self.assertEqual(day("2026-10-17 08:00:00"), "2026-10-17")
+        self.assertEqual(day(date(2026, 10, 17)), "2026-10-17")
+        self.assertEqual(day(datetime(2026, 10, 17, 8)), "2026-10-17")
+        self.assertEqual(day(), date.today().isoformat())
+
+    def test_write(self):
+        products = [make_product(product_id=str(idx)) for idx in range(3)]
+
+        self.assertEqual(self.history.write(products, "1", "2026-10-17"), {"inserted": 3, "updated": 0})
+        # the same day again updates, another store or day inserts
+        self.assertEqual(
+            self.history.write([make_product(product_id="0", price=99)], "1", "2026-10-17 20:00:00"),
+            {"inserted": 0, "updated": 1},
+        )
+        self.assertEqual(self.history.write(products[:1], "2", "2026-10-17"), {"inserted": 1, "updated": 0})
+        self.assertEqual(self.history.write(products[:1], 1, "2026-10-18"), {"inserted": 1, "updated": 0})
+
+        snapshot = self.history.snapshot("1", "2026-10-17")
+        self.assertEqual(
+            [(row["product_id"], row["price"]) for row in snapshot], [("0", 99), ("1", 129), ("2", 129)]
+        )
+        self.assertEqual(self.history.dates(), ["2026-10-17", "2026-10-18"])
+        self.assertEqual(self.history.dates("2"), ["2026-10-17"])
+
+    def test_history(self):
+        for idx, day_ in enumerate(("2026-08-01", "2026-09-01", "2026-10-01")):
+            self.history.write([make_product(price=100 + idx)], "1", day_)
+            self.history.write([make_product(price=200 + idx)], "2", day_)
+
+        rows = self.history.history("2621809")
+        self.assertEqual(
+            [(row["date"], row["store_id"]) for row in rows[:2]], [("2026-08-01", "1"), ("2026-08-01", "2")]
+        )
+        self.assertEqual(len(rows), 6)
+
+        rows = self.history.history("2621809", store_id="1", start="2026-09-01", end=date(2026, 10, 1))
+        self.assertEqual([row["price"] for row in rows], [101, 102])
+        self.assertEqual(self.history.history("unknown"), [])
+
+    def test_indexes(self):
+        def plan(where: str) -> str:
+            query = f"EXPLAIN QUERY PLAN {SELECT_PRICES} WHERE {where}"
+            return str(self.history.connector.execute(query, ("1", 0)).fetchall())
+
+        self.assertIn("price_observations_product", plan("p.product_id = ? AND o.observed >= ?"))
+        self.assertIn("PRIMARY KEY (store_key=? AND observed=?)", plan("s.store_id = ? AND o.observed = ?"))
+
+    def test_views(self):
+        self.history.write([make_product(old_price=None)], "1", "2026-10-17")
+        self.history.write([make_product(price=99)], "1", "2026-10-18")
+
+        # the flat shapes of the first history and of 'SqlPP'
+        prices = self.history.connector.execute("SELECT * FROM prices ORDER BY date").fetchall()
+        deals = self.history.connector.execute("SELECT * FROM deals ORDER BY date").fetchall()
+
+        self.assertEqual(prices[1], ("1", "2026-10-18", *make_product(price=99, saved=60).to_row()))
+        # no old price - nothing saved
+        self.assertEqual(prices[0][7:9], (None, None))
+        self.assertEqual(deals[1], (*make_product(price=99, saved=60).to_row(), "2026-10-18"))
+
+    def test_star_schema(self):
+        products = [make_product(product_id=str(idx)) for idx in range(3)]
+        for day_ in ("2026-10-17", "2026-10-18"):
+            self.history.write(products, "1", day_)
+
+        # a changed name replaces the one of the dimension
+        self.history.write([make_product(product_id="0", product="Gouda alt")], "2", "2026-10-18")
+
+        count = lambda table: self.history.connector.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        self.assertEqual((count("stores"), count("products"), count("price_observations")), (2, 3, 7))
+
+        names = {row["product"] for row in self.history.history("0")}
+        self.assertEqual(names, {"Gouda alt"})
+
+    def test_save_to_history(self):
+        stats = SqlPP.save_to_history([make_product(), make_product().to_dict()], "1", path=self.path)
+
+        # a dict of the same product on the same day updates its row
+        self.assertEqual(stats, {"inserted": 1, "updated": 1})
+
+        connector = sqlite3.connect(self.path)
+        self.assertEqual(connector.execute("SELECT COUNT(*) FROM prices").fetchone()[0], 1)
+        connector.close()
+
+
+
+class ChangesTest(unittest.TestCase):
+    """mode="changes" - intervals instead of daily rows"""
+
+    # day -> price of product "1", "2" has the same price every day
+    PRICES = {"2026-10-05": 129, "2026-10-06": 129, "2026-10-07": 99, "2026-10-12": 99, "2026-10-14": 129}
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "history.sqlite3")
+        self.history = PriceHistory(self.path, mode="changes")
+
+    def tearDown(self):
+        self.history.close()
+        self.folder.cleanup()
+
+    def write_days(self, history: PriceHistory) -> list[dict]:
+        stats = []
+        for day_, price in self.PRICES.items():
+            products = [make_product(product_id="1", price=price), make_product(product_id="2")]
+            stats.append(history.write(products, "1", day_))
+
+        return stats
+
+    def spans(self, product_id: str = "1") -> list[tuple]:
+        intervals = self.history.intervals(product_id)
+        return [(row["valid_from"], row["valid_to"], row["price"]) for row in intervals]
+
+    def test_mode(self):
+        with self.assertRaises(ValueError):
+            PriceHistory(self.path, mode="weekly")
+
+    def test_write(self):
+        stats = self.write_days(self.history)
+
+        self.assertEqual(stats[0], {"inserted": 2, "updated": 0, "unchanged": 0, "skipped": 0, "closed": 0})
+        self.assertEqual(stats[1], {"inserted": 0, "updated": 0, "unchanged": 2, "skipped": 0, "closed": 0})
+        self.assertEqual(stats[2], {"inserted": 1, "updated": 0, "unchanged": 1, "skipped": 0, "closed": 0})
+        self.assertEqual(
+            self.spans(),
+            [("2026-10-05", "2026-10-07", 129), ("2026-10-07", "2026-10-14", 99), ("2026-10-14", None, 129)],
+        )
+        self.assertEqual(self.spans("2"), [("2026-10-05", None, 129)])
+        # nothing daily
+        count = self.history.connector.execute("SELECT COUNT(*) FROM price_observations").fetchone()[0]
+        self.assertEqual(count, 0)
+
+        # the same day again changes the interval, an older day is skipped
+        stats = self.history.write([make_product(product_id="1", price=119)], "1", "2026-10-14")
+        self.assertEqual(stats["updated"], 1)
+        stats = self.history.write([make_product(product_id="1", price=1)], "1", "2026-10-01")
+        self.assertEqual(stats["skipped"], 1)
+        self.assertEqual(self.spans()[-1], ("2026-10-14", None, 119))
+
+    def test_point_in_time(self):
+        self.write_days(self.history)
+
+        days = ("2026-10-04", "2026-10-06", "2026-10-10")
+        prices = {day_: self.history.price_at("1", "1", day_) for day_ in days}
+        self.assertIsNone(prices["2026-10-04"])
+        self.assertEqual((prices["2026-10-06"]["price"], prices["2026-10-10"]["price"]), (129, 99))
+        self.assertEqual(self.history.price_at("1", "1", "2027-01-01")["price"], 129)
+
+        snapshot = self.history.snapshot_at("1", "2026-10-08")
+        self.assertEqual([(row["product_id"], row["price"]) for row in snapshot], [("1", 99), ("2", 129)])
+
+        # range queries return the overlapping intervals
+        spans = self.history.intervals("1", store_id="1", start="2026-10-06", end="2026-10-08")
+        self.assertEqual([row["price"] for row in spans], [129, 99])
+
+    def test_complete_closes_missing(self):
+        self.write_days(self.history)
+
+        # "2" is gone from the full crawl of the store
+        stats = self.history.write([make_product(product_id="1")], "1", "2026-10-16", complete=True)
+        self.assertEqual((stats["unchanged"], stats["closed"]), (1, 1))
+        self.assertEqual(self.spans("2"), [("2026-10-05", "2026-10-16", 129)])
+        self.assertIsNone(self.history.price_at("2", "1", "2026-10-20"))
+        self.assertEqual([row["product_id"] for row in self.history.snapshot_at("1", "2026-10-20")], ["1"])
+
+        # back again - a new interval
+        self.history.write([make_product(product_id="2")], "1", "2026-10-18", complete=True)
+        self.assertEqual(self.spans("2")[-1], ("2026-10-18", None, 129))
+        # "1" was not in that crawl
+        self.assertEqual(self.spans()[-1], ("2026-10-14", "2026-10-18", 129))
+
+        # an empty complete crawl ends everything, other stores keep theirs
+        self.history.write([make_product(product_id="1")], "2", "2026-10-18")
+        self.assertEqual(self.history.write([], "1", "2026-10-19", complete=True)["closed"], 1)
+        self.assertEqual(self.history.snapshot_at("1", "2026-10-20"), [])
+        self.assertIsNotNone(self.history.price_at("1", "2", "2026-10-20"))
+
+    def test_changes(self):
+        self.write_days(self.history)
+
+        changes = self.history.changes("1", "2026-10-12", "2026-10-18")
+        self.assertEqual(
+            [(row["product_id"], row["valid_from"], row["previous_price"], row["price"]) for row in changes],
+            [("1", "2026-10-14", 99, 129)],
+        )
+        # new products have no previous price
+        changes = self.history.changes("1", "2026-10-01", "2026-10-05")
+        self.assertEqual([row["previous_price"] for row in changes], [None, None])
+
+    def test_compact(self):
+        with PriceHistory(self.path) as daily:
+            self.write_days(daily)
+            # a change-only write is merged in
+            with PriceHistory(self.path, mode="changes") as changes:
+                changes.write([make_product(product_id="3")], "1", "2026-10-06")
+
+            stats = daily.compact()
+            self.assertEqual(stats, {"observations": 10, "intervals": 5})
+
+            expected = [
+                ("2026-10-05", "2026-10-07", 129),
+                ("2026-10-07", "2026-10-14", 99),
+                ("2026-10-14", None, 129),
+            ]
+            self.assertEqual(self.spans(), expected)
+            self.assertEqual(self.spans("3"), [("2026-10-06", None, 129)])
+
+            # again - the same intervals
+            self.assertEqual(daily.compact(delete=True), stats)
+            self.assertEqual(daily.compact(), {"observations": 0, "intervals": 5})
+            self.assertEqual(self.spans(), expected)
+
+    def test_compact_keeps_closed(self):
+        products = [make_product(product_id="1"), make_product(product_id="2")]
+        self.history.write(products, "1", "2026-01-01", complete=True)
+        self.history.write([make_product(product_id="1")], "1", "2026-01-08", complete=True)
+        # "2" is back later with the same price
+        self.history.write([make_product(product_id="2")], "1", "2026-01-22")
+
+        self.history.compact()
+
+        self.assertEqual(self.spans("2"), [("2026-01-01", "2026-01-08", 129), ("2026-01-22", None, 129)])
+        self.assertIsNone(self.history.price_at("2", "1", "2026-01-20"))
+        self.assertEqual(self.spans(), [("2026-01-01", None, 129)])
+
+
+if __name__ == "__main__":
+    unittest.main()
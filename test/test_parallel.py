@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import json
+import logging
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.rewe import STORE
+from rewe_dl.parser import Parser
+from rewe_dl.parallel import ParallelParser, parse_page
+
+from test_batch import search_result_product
+from test_extract import PRODUCT_TILE
+
+log = logging.getLogger(__name__)
+
+
+def raw_pages(count: int, per_page: int = 3) -> list[bytes]:
+    pages = []
+    for page in range(count):
+        products = [search_result_product(f"{page}-{idx}", "ja!", 100 + idx, 150) for idx in range(per_page)]
+        data = {"_embedded": {"products": products}, "pagination": {"totalPages": count}}
+        pages.append(json.dumps(data).encode())
+
+    return pages
+
+
+class ParsePageTest(unittest.TestCase):
+    def test_same_as_parser(self):
+        (raw,) = raw_pages(1)
+        expected = Parser().parse_search_results_products([json.loads(raw)], order="stream")
+
+        self.assertEqual(parse_page(raw), [product.to_row() for product in expected])
+
+    def test_product_tiles(self):
+        (expected,) = Parser().parse_product_infos([PRODUCT_TILE])
+
+        raw = json.dumps([PRODUCT_TILE]).encode()
+
+        self.assertEqual(parse_page(raw, "product-tiles"), [expected.to_row()])
+
+    def test_empty_page(self):
+        self.assertEqual(parse_page(b'{"pagination": {"totalPages": 0}}'), [])
+
+    def test_total_pages(self):
+        self.assertEqual(STORE._total_pages(raw_pages(4)[0]), 4)
+        self.assertEqual(STORE._total_pages({"pagination": {"totalPages": 4}}), 4)
+        self.assertIsNone(STORE._total_pages(b"{}"))
+
+
+class ParallelParserTest(unittest.TestCase):
+    def test_ordered(self):
+        pages = raw_pages(10)
+
+        with ParallelParser(max_workers=2, window=3) as pool:
+            batches = list(pool.batches(iter(pages)))
+
+        self.assertEqual(batches, [parse_page(raw) for raw in pages])
+
+    def test_unordered(self):
+        pages = raw_pages(10)
+
+        with ParallelParser(max_workers=2, ordered=False) as pool:
+            ids = {product.product_id for product in pool.products(pages)}
+
+        self.assertEqual(ids, {f"{page}-{idx}" for page in range(10) for idx in range(3)})
+
+    def test_parse_raw_pages(self):
+        products = list(Parser().parse_raw_pages(raw_pages(2), max_workers=2))
+
+        ids = [product.product_id for product in products]
+
+        self.assertEqual(ids, ["0-0", "0-1", "0-2", "1-0", "1-1", "1-2"])
+        self.assertEqual(products[0].saved, 50)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            ParallelParser(kind="html")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,10 +12,11 @@ import unittest
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.dirname(PROJECT_DIR))
 
-from rewe_dl.rewe import STORE
+from rewe_dl.rewe import STORE, Product
 from rewe_dl.parser import Parser
 
 from test_rewe import CustomTestCase
+from test_extract import PRODUCT_TILE, SEARCH_RESULT_PRODUCT
 
 log = logging.getLogger(__name__)
 
@@ -62,6 +63,15 @@ class ParserTest(CustomTestCase):
 
         self.assertNotEqual(bad_value, out)
 
+    def test_calculate_savings_cents(self):
+        out = Parser.calculate_savings({"old_price": 159, "price": 105})
+
+        self.assertEqual(out, 54)
+        self.assertIsInstance(out, int)
+
+        # no float error of 0.3 - 0.1
+        self.assertEqual(Parser.calculate_savings({"old_price": 0.3, "price": 0.1}), 0.2)
+
     def test_get_search_results_products(self):
         for search_results_page in self.my_search:
             self.ensure_is_dict(search_results_page)
@@ -93,7 +103,7 @@ class ParserTest(CustomTestCase):
         pseudo_rand_product = discounted_products[:1:][0]
 
         result = Parser().product_md_from_product(pseudo_rand_product)
-        self.ensure_is_dict(result)
+        self.assertIsInstance(result, Product)
 
     def test_parse_product_from_offers(self):
         """tests '_get_alternatives' and Parser().product_md_from_product
@@ -130,5 +140,34 @@ class ParserTest(CustomTestCase):
             self.ensure_is_product_md_dc(product_md)
 
 
+class CompiledParserTest(unittest.TestCase):
+    def test_product_md_from_product(self):
+        result = Parser().product_md_from_product(SEARCH_RESULT_PRODUCT)
+
+        self.assertIsInstance(result, Product)
+        self.assertEqual(
+            result.to_dict(),
+            {
+                "store": "rewe.de",
+                "product": "Gouda jung 80g",
+                "link": "https://rewe.de/produkte/2621809",
+                "product_id": "2621809",
+                "price": 129,
+                "old_price": 159,
+                "saved": 30,
+                "brand": "REWE Beste Wahl",
+                "picture": "https://img.rewe-static.de/2621809.png",
+            },
+        )
+
+    def test_parse_product_infos(self):
+        (result,) = Parser().parse_product_infos([PRODUCT_TILE])
+
+        self.assertEqual(result["product_id"], "265601")
+        self.assertEqual(result["brand"], "Weihenstephan")
+        # no 'regularPrice' - not discounted
+        self.assertEqual((result["price"], result["old_price"], result["saved"]), (119, 119, 0))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -8,6 +8,7 @@ import os
 import sys
 import json
 import logging
+import sqlite3
 import tempfile
 import unittest
 
@@ -18,9 +19,13 @@ PROJECT_ROOT = os.path.dirname(PROJECT_DIR + "/../rewe_dl/")
 sys.path.insert(0, os.path.dirname(PROJECT_DIR))
 
 from rewe_dl.utils import read_file
+from rewe_dl.constants import PRODUCT_FIELDS
 from rewe_dl.postprocessor.notify import NotifyPP
 from rewe_dl.postprocessor.output import JsonPP
 from rewe_dl.postprocessor.metadata import MetadataPP
+from rewe_dl.postprocessor.sql import SqlPP, SqlWriter
+
+from test_constants import make_product
 
 
 class NotifyTest(unittest.TestCase):
@@ -206,5 +211,93 @@ class OutputTest(MdBaseTest):
             self.assertIsNotNone(product_md)
 
 
+
+class SqlTest(unittest.TestCase):
+    def test_sql_insert(self):
+        products = [make_product(), make_product(product_id="1")]
+
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "deals.sqlite3")
+            SqlPP.sql_insert(file_name, products)
+
+            connector = sqlite3.connect(file_name)
+            rows = connector.execute("SELECT * FROM deals ORDER BY product_id").fetchall()
+            connector.close()
+
+        self.assertEqual([row[:-1] for row in rows], [products[1].to_row(), products[0].to_row()])
+        # cents in INTEGER columns
+        self.assertEqual([type(value) for value in rows[0][4:7]], [int, int, int])
+        # nothing written back into the products
+        self.assertEqual(products[0].to_dict(), make_product().to_dict())
+
+    def test_sql_writer_upsert(self):
+        date = "2026-10-17 08:00:00"
+
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "deals.sqlite3")
+
+            with SqlWriter(file_name, batch_size=2) as writer:
+                first = writer.write([make_product(product_id=str(idx)) for idx in range(3)], date)
+                # a new product and a price change, then a new product in the next batch
+                second = writer.write(
+                    [make_product(product_id="3"), make_product(product_id="0", price=99), make_product()],
+                    date,
+                )
+                journal_mode = writer.connector.execute("PRAGMA journal_mode").fetchone()[0]
+
+            connector = sqlite3.connect(file_name)
+            rows = connector.execute("SELECT product_id, price FROM deals ORDER BY product_id").fetchall()
+            connector.close()
+
+        self.assertEqual(first, {"inserted": 3, "updated": 0})
+        self.assertEqual(second, {"inserted": 2, "updated": 1})
+        self.assertEqual(rows, [("0", 99), ("1", 129), ("2", 129), ("2621809", 129), ("3", 129)])
+        self.assertEqual(journal_mode, "wal")
+
+    def test_sql_writer_migrates_euros(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "deals.sqlite3")
+
+            # the table of files written before the prices were cents
+            connector = sqlite3.connect(file_name)
+            connector.execute(
+                "CREATE TABLE deals (store TEXT, product TEXT, link TEXT, product_id TEXT, price REAL, "
+                "old_price REAL, saved REAL, brand TEXT, picture TEXT, date TEXT, "
+                "PRIMARY KEY (product_id, date)) WITHOUT ROWID"
+            )
+            connector.execute(
+                "INSERT INTO deals VALUES ('rewe.de', 'Tuc', '', '1', 4.99, 5.49, 0.5, '', '', '2024-01-01')"
+            )
+            connector.commit()
+            connector.close()
+
+            SqlPP.sql_insert(file_name, [make_product(price=199, old_price=250, saved=51)])
+
+            connector = sqlite3.connect(file_name)
+            rows = connector.execute(
+                "SELECT product_id, price, old_price, saved, typeof(price) FROM deals ORDER BY product_id"
+            ).fetchall()
+            types = [row[2] for row in connector.execute("PRAGMA table_info(deals)")]
+            connector.close()
+
+        self.assertEqual(rows, [("1", 499, 549, 50, "integer"), ("2621809", 199, 250, 51, "integer")])
+        self.assertEqual(types[4:7], ["INTEGER", "INTEGER", "INTEGER"])
+
+    def test_sql_insert_dicts(self):
+        # other order and extra keys - the columns are taken by name
+        product = dict(reversed(make_product().to_dict().items()), time="ignored")
+
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "deals.sqlite3")
+            stats = SqlPP.sql_insert(file_name, [product])
+
+            connector = sqlite3.connect(file_name)
+            row = connector.execute(f"SELECT {', '.join(PRODUCT_FIELDS)} FROM deals").fetchone()
+            connector.close()
+
+        self.assertEqual(stats, {"inserted": 1, "updated": 0})
+        self.assertEqual(row, make_product().to_row())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import random
+import logging
+import unittest
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.parser import Parser
+from rewe_dl.ranking import TopK, top_k, external_sort
+
+from test_batch import search_result_product
+from test_constants import make_product
+
+log = logging.getLogger(__name__)
+
+
+def products(count: int, seed: int = 1) -> list:
+    rand = random.Random(seed)
+    # few distinct values - many ties
+    return [make_product(product_id=str(idx), saved=rand.randrange(20)) for idx in range(count)]
+
+
+def ranked(items: list) -> list:
+    return sorted(items, key=lambda product: product.saved, reverse=True)
+
+
+class TopKTest(unittest.TestCase):
+    def test_same_as_sorted(self):
+        items = products(500)
+
+        for k in (1, 7, 100, 500, 1000):
+            self.assertEqual(top_k(items, k), ranked(items)[:k], k)
+
+    def test_incremental(self):
+        items = products(50)
+        top = TopK(5)
+
+        for item in items:
+            top.push(item)
+
+        self.assertEqual((top.seen, len(top)), (50, 5))
+        self.assertEqual(top.result(), ranked(items)[:5])
+
+    def test_dicts_and_key(self):
+        items = [{"saved": 3}, {"saved": 9}, {"saved": 1}]
+
+        self.assertEqual(top_k(items, 2), [{"saved": 9}, {"saved": 3}])
+        self.assertEqual(top_k(items, 1, key=lambda item: -item["saved"]), [{"saved": 1}])
+
+        with self.assertRaises(ValueError):
+            TopK(0)
+
+
+class ExternalSortTest(unittest.TestCase):
+    def test_in_memory(self):
+        items = products(50)
+
+        self.assertEqual(list(external_sort(items)), ranked(items))
+
+    def test_spilled_runs(self):
+        items = products(1000)
+
+        with tempfile.TemporaryDirectory() as folder:
+            result = list(external_sort(items, run_size=64, folder=folder))
+            # runs are removed afterwards
+            self.assertEqual(os.listdir(folder), [])
+
+        self.assertEqual(result, ranked(items))
+
+    def test_dicts_ascending(self):
+        items = [{"id": idx, "saved": idx % 7} for idx in range(100)]
+
+        result = list(external_sort(items, reverse=False, run_size=10))
+        self.assertEqual(result, sorted(items, key=lambda item: item["saved"]))
+
+
+class ParserOrderTest(unittest.TestCase):
+    def setUp(self):
+        # 'saved' of the products 0-3 is 5, 50, 0 and 20 - two per page
+        savings = enumerate([5, 50, 0, 20])
+        products = [search_result_product(str(idx), "ja!", 100, 100 + saved) for idx, saved in savings]
+        self.pages = [{"_embedded": {"products": products[:2]}}, {"_embedded": {"products": products[2:]}}]
+
+    def ids(self, **kwargs) -> list:
+        parsed = Parser().parse_search_results_products(self.pages, **kwargs)
+
+        return [product.product_id for product in parsed]
+
+    def test_orders(self):
+        self.assertEqual(self.ids(), ["1", "0", "3", "2"])
+        self.assertEqual(self.ids(order="stream"), ["0", "1", "2", "3"])
+        self.assertEqual(self.ids(order="global"), ["1", "3", "0", "2"])
+        self.assertEqual(self.ids(top=2), ["1", "3"])
+
+        with self.assertRaises(ValueError):
+            self.ids(order="random")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.ratelimit import TokenBucket, RateLimiter
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        tokens, updated = bucket.burst, 0.0
+
+        delays = []
+        for _ in range(5):
+            tokens, updated, delay = bucket.reserve(tokens, updated, now=0.0)
+            delays.append(delay)
+
+        self.assertEqual(delays, [0.0, 0.0, 0.0, 0.5, 1.0])
+
+    def test_refill(self):
+        bucket = TokenBucket(rate=1, burst=1)
+
+        tokens, updated, delay = bucket.reserve(1, 0.0, now=0.0)
+        self.assertEqual(delay, 0.0)
+
+        tokens, updated, delay = bucket.reserve(tokens, updated, now=10.0)
+        self.assertEqual(delay, 0.0)
+        self.assertEqual(tokens, 0.0)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_per_host(self):
+        limiter = RateLimiter(rate=1, burst=1, per_host={"example.org": (None, 1)})
+
+        self.assertEqual(limiter.reserve("https://www.rewe.de/shop/api/products"), 0.0)
+        self.assertGreater(limiter.reserve("https://www.rewe.de/shop/api/suggestions"), 0.5)
+
+        # 'None' rate disables limiting for that host
+        for _ in range(5):
+            self.assertEqual(limiter.reserve("https://example.org/"), 0.0)
+
+    def test_disabled(self):
+        limiter = RateLimiter(rate=None)
+
+        for _ in range(5):
+            self.assertEqual(limiter.acquire("https://www.rewe.de/"), 0.0)
+
+    def test_shared_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ratelimit.json")
+
+            # two limiters stand in for two processes
+            first = RateLimiter(rate=1, burst=1, path=path)
+            second = RateLimiter(rate=1, burst=1, path=path)
+
+            self.assertEqual(first.reserve("https://www.rewe.de/"), 0.0)
+            self.assertGreater(second.reserve("https://www.rewe.de/"), 0.5)
+
+    def test_acquire_async(self):
+        limiter = RateLimiter(rate=50, burst=1)
+
+        async def main():
+            return await asyncio.gather(*(limiter.acquire_async("https://www.rewe.de/") for _ in range(3)))
+
+        start = time.monotonic()
+        delays = asyncio.run(main())
+
+        self.assertEqual(delays[0], 0.0)
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+
+
+if __name__ == "__main__":
+    unittest.main()
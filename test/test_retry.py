@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import unittest
+from email.utils import formatdate
+
+import httpx
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.retry import (
+    HttpError,
+    RetryPolicy,
+    CircuitBreaker,
+    CircuitOpenError,
+    call_with_retry,
+    acall_with_retry,
+)
+
+log = logging.getLogger(__name__)
+
+URL = "https://shop.rewe.de/api/products"
+
+
+def responses(*status_codes):
+    """a 'send' function returning the 'status_codes' one after another"""
+    sent = []
+    codes = iter(status_codes)
+
+    def send():
+        sent.append(URL)
+        return httpx.Response(next(codes), request=httpx.Request("GET", URL))
+
+    send.sent = sent
+
+    return send
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_backoff_without_jitter(self):
+        policy = RetryPolicy(backoff=0.5, max_backoff=3, jitter=False)
+
+        self.assertEqual([policy.delay(attempt) for attempt in range(5)], [0.5, 1.0, 2.0, 3.0, 3.0])
+
+    def test_jitter_in_range(self):
+        policy = RetryPolicy(backoff=1, jitter=True)
+
+        for _ in range(20):
+            self.assertTrue(0 <= policy.delay(2) <= 4)
+
+    def test_retry_after_seconds(self):
+        response = httpx.Response(429, headers={"retry-after": "7"})
+
+        self.assertEqual(RetryPolicy.retry_after(response), 7.0)
+        self.assertEqual(RetryPolicy(max_backoff=5).delay(0, response), 5.0)
+
+    def test_retry_after_date(self):
+        response = httpx.Response(503, headers={"retry-after": formatdate(time.time() + 60, usegmt=True)})
+
+        self.assertAlmostEqual(RetryPolicy.retry_after(response), 60, delta=2)
+
+    def test_retry_after_ignored(self):
+        self.assertIsNone(RetryPolicy.retry_after(httpx.Response(500, headers={"retry-after": "7"})))
+        self.assertIsNone(RetryPolicy.retry_after(httpx.Response(429, headers={"retry-after": "soon"})))
+
+
+class CallWithRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.policy = RetryPolicy(attempts=3, backoff=0)
+        self.breaker = CircuitBreaker(threshold=5)
+
+    def test_retry_then_success(self):
+        send = responses(503, 502, 200)
+
+        response = call_with_retry(send, URL, self.policy, self.breaker)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(send.sent), 3)
+        self.assertFalse(self.breaker.is_open("shop.rewe.de"))
+
+    def test_gives_up(self):
+        send = responses(500, 500, 500)
+
+        with self.assertRaises(HttpError) as context:
+            call_with_retry(send, URL, self.policy, self.breaker)
+
+        self.assertEqual(context.exception.response.status_code, 500)
+        self.assertEqual(len(send.sent), 3)
+
+    def test_no_retry_on_client_error(self):
+        send = responses(404)
+
+        with self.assertRaises(HttpError):
+            call_with_retry(send, URL, self.policy, self.breaker)
+
+        self.assertEqual(len(send.sent), 1)
+
+    def test_client_error_closed(self):
+        response = httpx.Response(404, stream=httpx.ByteStream(b""), request=httpx.Request("GET", URL))
+
+        with self.assertRaises(HttpError):
+            call_with_retry(lambda: response, URL, self.policy, self.breaker)
+
+        self.assertTrue(response.is_closed)
+
+    def test_non_idempotent_sent_once(self):
+        send = responses(503, 200)
+
+        with self.assertRaises(HttpError):
+            call_with_retry(send, URL, self.policy, self.breaker, idempotent=False)
+
+        self.assertEqual(len(send.sent), 1)
+
+    def test_breaker_counts_requests(self):
+        breaker = CircuitBreaker(threshold=2)
+
+        with self.assertRaises(HttpError):
+            call_with_retry(responses(500, 500, 500), URL, self.policy, breaker)
+
+        # three attempts, one failed request
+        self.assertFalse(breaker.is_open("shop.rewe.de"))
+
+        with self.assertRaises(HttpError):
+            call_with_retry(responses(500, 500, 500), URL, self.policy, breaker)
+
+        self.assertTrue(breaker.is_open("shop.rewe.de"))
+
+    def test_connection_error(self):
+        def send():
+            raise httpx.ConnectError("no route", request=httpx.Request("GET", URL))
+
+        with self.assertRaises(HttpError) as context:
+            call_with_retry(send, URL, self.policy, self.breaker)
+
+        self.assertIsInstance(context.exception.__cause__, httpx.ConnectError)
+
+    def test_async(self):
+        send = responses(429, 200)
+
+        async def asend():
+            return send()
+
+        response = asyncio.run(acall_with_retry(asend, URL, self.policy, self.breaker))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(send.sent), 2)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_open_fails_fast(self):
+        breaker = CircuitBreaker(threshold=2, reset_timeout=60)
+        send = responses(500, 500, 500, 500, 200)
+
+        for _ in range(2):
+            with self.assertRaises(HttpError):
+                call_with_retry(send, URL, RetryPolicy(attempts=2, backoff=0), breaker)
+
+        self.assertTrue(breaker.is_open("shop.rewe.de"))
+
+        with self.assertRaises(CircuitOpenError):
+            call_with_retry(send, URL, RetryPolicy(attempts=2, backoff=0), breaker)
+
+        self.assertEqual(len(send.sent), 4)
+
+    def test_half_open(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+        breaker.failure("shop.rewe.de")
+
+        with self.assertRaises(CircuitOpenError):
+            breaker.before("shop.rewe.de")
+
+        time.sleep(0.06)
+
+        # one trial request is let through, the others still fail fast
+        breaker.before("shop.rewe.de")
+        with self.assertRaises(CircuitOpenError):
+            breaker.before("shop.rewe.de")
+
+        breaker.success("shop.rewe.de")
+        self.assertFalse(breaker.is_open("shop.rewe.de"))
+
+    def test_per_host(self):
+        breaker = CircuitBreaker(threshold=1)
+        breaker.failure("shop.rewe.de")
+
+        breaker.before("api.telegram.org")
+        self.assertFalse(breaker.is_open("api.telegram.org"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,21 +6,26 @@ from __future__ import annotations
 
 import os
 import sys
+import json
 import types
+import asyncio
 import inspect
 import logging
 import unittest
 from time import sleep
+from unittest import mock
 from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
 
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(PROJECT_DIR)
 
 sys.path.insert(0, PROJECT_ROOT)
 
-from rewe_dl import exception
-from rewe_dl.rewe import STORE, Cli, Config
-from rewe_dl.constants import Product
+from rewe_dl import rewe, exception
+from rewe_dl.rewe import STORE, Cli, Config, Product, AsyncSTORE
+
+import httpx
 
 log = logging.getLogger(__name__)
 
@@ -64,13 +69,22 @@ class CustomTestCase(unittest.TestCase):
             self.ensure_is_dict(result)
 
     def ensure_is_product_md_dc(self, product_md):
-        self.ensure_is_dict(product_md)
+        self.assertIsInstance(product_md, Product)
 
-        dict_from_dc = asdict(Product(**product_md))
-        self.assertDictEqual(product_md, dict_from_dc)
+        dict_from_dc = asdict(product_md)
+        self.assertDictEqual(product_md.to_dict(), dict_from_dc)
+        self.assertEqual(Product(**dict_from_dc), product_md)
 
 
 class TestSTORE(CustomTestCase):
+    def setUp(self):
+        # the breaker is global - failures of one test must not open it for the next ones
+        self.breaker = rewe.get_breaker()
+        rewe.set_breaker()
+
+    def tearDown(self):
+        rewe.set_breaker(self.breaker)
+
     def test_product_infos(self):
         result = self.store.product_infos(product_ids=["2621809"])
 
@@ -113,11 +127,15 @@ class TestSTORE(CustomTestCase):
                 pass
 
     def test_search(self):
-        paginated = self.store.search(search_term="ja")
+        # own store id - 'search' is memoized per store
+        session = httpx.Client(transport=httpx.MockTransport(fake_products_handler(total_pages=1)))
+        paginated = STORE(store_id="1", session=session).search(search_term="ja")
 
         self.ensure_is_generator(paginated)
 
-        for result in paginated:
+        results = list(paginated)
+        self.assertEqual(len(results), 1)
+        for result in results:
             self.ensure_is_dict(result)
 
             self.assertIn(
@@ -125,6 +143,12 @@ class TestSTORE(CustomTestCase):
                 ("search_result", "corrected_term"),
             )
 
+    def test_search_http_error(self):
+        session = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(404)))
+
+        with self.assertRaises(exception.HttpError):
+            list(STORE(store_id="2", session=session).search(search_term="ja"))
+
     def test_search_max_page(self):
         paginated = self.store.search(search_term="ja", max_page=2)
 
@@ -276,6 +300,448 @@ class TestSTORE(CustomTestCase):
         self.assertEqual(result, [])
 
 
+def fake_products_handler(total_pages: int = 3):
+    """return a 'httpx.MockTransport' handler that serves 'total_pages' search pages"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get("page", 1))
+        data = {
+            "type": "SEARCH_RESULT",
+            "pagination": {"page": page, "totalPages": total_pages},
+            "_embedded": {"products": [{"id": f"{page}-{idx}"} for idx in range(3)]},
+        }
+        return httpx.Response(200, content=json.dumps(data).encode())
+
+    return handler
+
+
+class TestAsyncSTORE(unittest.TestCase):
+    def setUp(self):
+        self.limiter = rewe.get_limiter()
+        self.policy = rewe.get_policy()
+        self.breaker = rewe.get_breaker()
+        rewe.set_limiter(rate=None)
+        rewe.set_policy(attempts=2, backoff=0)
+        rewe.set_breaker()
+
+    def tearDown(self):
+        rewe.set_limiter(self.limiter)
+        rewe.set_policy(self.policy)
+        rewe.set_breaker(self.breaker)
+
+    def run_async(self, handler, coro_func):
+        async def main():
+            rewe.set_async_session(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            async with AsyncSTORE(max_concurrency=2) as store:
+                return await coro_func(store)
+
+        return asyncio.run(main())
+
+    def test_paginate_in_order(self):
+        async def pages(store):
+            return [page async for page in store.get_discounted_products(max_page=5)]
+
+        result = self.run_async(fake_products_handler(total_pages=3), pages)
+
+        self.assertEqual([page["pagination"]["page"] for page in result], [1, 2, 3])
+
+    def test_paginate_early_stop(self):
+        async def first(store):
+            async for page in store.search("milch", max_page=3):
+                return page
+
+        result = self.run_async(fake_products_handler(total_pages=3), first)
+
+        self.assertEqual(result["pagination"]["page"], 1)
+
+    def test_search_many(self):
+        async def many(store):
+            return await store.search_many(["milch", "tuc"], max_page=2)
+
+        result = self.run_async(fake_products_handler(total_pages=2), many)
+
+        self.assertEqual(list(result.keys()), ["milch", "tuc"])
+        for pages in result.values():
+            self.assertEqual(len(pages), 2)
+
+    def test_paginate_bad_status(self):
+        async def pages(store):
+            return [page async for page in store.search("milch", max_page=2)]
+
+        requested = []
+
+        def handler(request):
+            requested.append(request.url)
+            return httpx.Response(500)
+
+        with self.assertRaises(exception.HttpError):
+            self.run_async(handler, pages)
+
+        # retried once by the policy
+        self.assertEqual(len(requested), 2)
+
+    def test_aclose_keeps_shared_session(self):
+        async def main():
+            shared = httpx.AsyncClient(transport=httpx.MockTransport(fake_products_handler()))
+            rewe.set_async_session(shared)
+            async with AsyncSTORE():
+                pass
+            async with AsyncSTORE(session=shared):
+                pass
+
+            self.assertFalse(shared.is_closed)
+            await shared.aclose()
+
+        asyncio.run(main())
+
+    def test_aclose_own_session(self):
+        async def main():
+            own = httpx.AsyncClient(transport=httpx.MockTransport(fake_products_handler()))
+            await rewe.close_async_session()
+            with mock.patch.object(AsyncSTORE, "_make_async_session", return_value=own):
+                async with AsyncSTORE() as store:
+                    self.assertIs(store.session, own)
+
+            self.assertTrue(own.is_closed)
+
+        asyncio.run(main())
+
+    def test_categories(self):
+        constraints = [{"slug": "obst", "subFacetConstraints": [{"slug": "aepfel", "name": "Äpfel"}]}]
+        facets = [{"name": "category", "facetConstraints": constraints}]
+        page = {"pagination": {"totalPages": 1}, "facets": facets}
+
+        def handler(request):
+            return httpx.Response(200, content=json.dumps(page).encode())
+
+        async def categories(store):
+            pages = [page async for page in store.get_discounted_products(max_page=1)]
+            return await store.categories(pages), await store.category_slugs(pages)
+
+        categories, slugs = self.run_async(handler, categories)
+
+        self.assertEqual([category["slug"] for category in categories], ["aepfel"])
+        self.assertEqual(slugs, ["aepfel"])
+
+    def test_recommendations(self):
+        def handler(request):
+            return httpx.Response(200, content=json.dumps({"listingIds": ["1-2-3"]}).encode())
+
+        async def recommendations(store):
+            return await store.recommendations(["2621809"])
+
+        self.assertEqual(self.run_async(handler, recommendations), {"listingIds": ["1-2-3"]})
+
+    def test_sync_streaming_blocked(self):
+        async def search_products(store):
+            return store.search_products("milch")
+
+        with self.assertRaises(NotImplementedError):
+            self.run_async(fake_products_handler(), search_products)
+
+
+class MockSessionTestCase(unittest.TestCase):
+    """swap the global session for one served by a 'httpx.MockTransport' handler"""
+
+    def setUp(self):
+        self.session = rewe.get_session(create=False)
+        self.limiter = rewe.get_limiter()
+        self.policy = rewe.get_policy()
+        self.breaker = rewe.get_breaker()
+        rewe.set_limiter(rate=None)
+        rewe.set_policy(attempts=2, backoff=0)
+        rewe.set_breaker()
+
+    def tearDown(self):
+        rewe.set_session(self.session)
+        rewe.set_limiter(self.limiter)
+        rewe.set_policy(self.policy)
+        rewe.set_breaker(self.breaker)
+
+    def use_handler(self, handler):
+        rewe.set_session(httpx.Client(transport=httpx.MockTransport(handler)))
+
+
+class TestPaginatePrefetch(MockSessionTestCase):
+    def test_prefetch_in_order(self):
+        self.use_handler(fake_products_handler(total_pages=5))
+
+        paginated = STORE().get_discounted_products(max_page=4, prefetch=2)
+        pages = [page["pagination"]["page"] for page in paginated]
+
+        self.assertEqual(pages, [1, 2, 3, 4])
+
+    def test_prefetch_same_as_serial(self):
+        self.use_handler(fake_products_handler(total_pages=3))
+
+        serial = list(STORE().products_by_attribute(max_page=5))
+        prefetched = list(STORE().products_by_attribute(max_page=5, prefetch=3))
+
+        self.assertEqual(serial, prefetched)
+
+    def test_prefetch_early_stop(self):
+        requested = []
+
+        def handler(request):
+            requested.append(int(request.url.params.get("page")))
+            return fake_products_handler(total_pages=50)(request)
+
+        self.use_handler(handler)
+
+        paginated = STORE().products_by_attribute(max_page=50, prefetch=2)
+        next(paginated)
+        paginated.close()
+
+        # first page plus at most the prefetch window
+        self.assertLessEqual(len(requested), 3)
+
+    def test_prefetch_bad_status(self):
+        self.use_handler(lambda request: httpx.Response(500))
+
+        with self.assertRaises(exception.HttpError):
+            list(STORE().products_by_attribute(max_page=3, prefetch=2))
+
+
+class TestPaginateRaw(MockSessionTestCase):
+    def test_raw_pages(self):
+        self.use_handler(fake_products_handler(total_pages=3))
+
+        for prefetch in (0, 2):
+            raw = list(STORE().products_by_attribute(max_page=5, prefetch=prefetch, raw=True))
+
+            self.assertTrue(all(isinstance(page, bytes) for page in raw))
+            decoded = list(STORE().products_by_attribute(max_page=5))
+            self.assertEqual([json.loads(page) for page in raw], decoded)
+
+
+class TestCategoriesDedup(MockSessionTestCase):
+    def test_overlapping_categories(self):
+        categories = {"obst": ["1", "2"], "obst-gemuese": ["1", "2", "3"]}
+
+        def handler(request):
+            ids = categories[request.url.params.get("categorySlug")]
+            data = {"pagination": {"totalPages": 1}, "_embedded": {"products": [{"id": _id} for _id in ids]}}
+            return httpx.Response(200, content=json.dumps(data).encode())
+
+        self.use_handler(handler)
+
+        urls = [f"https://www.rewe.de/c/{slug}" for slug in categories]
+        products = list(Cli().from_links_of_categories(urls))
+
+        self.assertEqual(sorted(product.product_id for product in products), ["1", "2", "3"])
+
+
+class TestCategories(MockSessionTestCase):
+    def test_flat_leaves(self):
+        from test_categories import PAGE
+
+        store = STORE()
+
+        slugs = [category["slug"] for category in store.categories([PAGE, PAGE])]
+
+        self.assertEqual(slugs, ["obst", "salat", "getraenke"])
+        self.assertEqual(store.category_names([PAGE]), ["Obst", "Salat", "Getränke"])
+        self.assertEqual(store.category_slugs([PAGE]), ["obst", "salat", "getraenke"])
+
+
+class TestPaginateProducts(MockSessionTestCase):
+    def test_products_and_pages(self):
+        self.use_handler(fake_products_handler(total_pages=3))
+        pages = []
+
+        products = list(STORE().search_products("milch", max_page=5, on_page=pages.append))
+
+        self.assertEqual([product["id"] for product in products[:4]], ["1-0", "1-1", "1-2", "2-0"])
+        self.assertEqual(len(products), 9)
+        self.assertEqual([page["pagination"]["page"] for page in pages], [1, 2, 3])
+        self.assertEqual(pages[0]["_embedded"]["products"], [])
+
+    def test_same_as_paginate(self):
+        self.use_handler(fake_products_handler(total_pages=2))
+
+        pages = STORE().search("tuc", max_page=2)
+        paginated = [product for page in pages for product in page["_embedded"]["products"]]
+
+        self.assertEqual(list(STORE().search_products("tuc", max_page=2)), paginated)
+
+
+class TestProductInfos(MockSessionTestCase):
+    def product_tiles_handler(self, requested: list, skip: set = set()):
+        """serve 'product-tiles' in reverse order, leave out ids in 'skip'"""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            ids = request.url.params.get("productIds").split(",")
+            requested.append(ids)
+            products = [{"productId": _id} for _id in reversed(ids) if _id not in skip]
+            return httpx.Response(200, content=json.dumps(products).encode())
+
+        return handler
+
+    def test_batches_in_input_order(self):
+        requested = []
+        self.use_handler(self.product_tiles_handler(requested, skip={"1005"}))
+
+        store = STORE()
+        store.PRODUCT_INFOS_BUDGET = 20
+        product_ids = [str(1000 + idx) for idx in range(10)]
+
+        result = store.product_infos(product_ids=product_ids)
+
+        self.assertGreater(len(requested), 1)
+        for batch in requested:
+            self.assertLessEqual(len(",".join(batch)), 20)
+
+        self.assertEqual([p["productId"] for p in result], [_id for _id in product_ids if _id != "1005"])
+        self.assertEqual(result.missing, ["1005"])
+
+    def test_single_request(self):
+        requested = []
+        self.use_handler(self.product_tiles_handler(requested))
+
+        result = STORE().product_infos(product_ids=["2621809", "265601", "2621809"])
+
+        self.assertEqual(requested, [["2621809", "265601"]])
+        self.assertIsInstance(result, list)
+        self.assertEqual(result.missing, [])
+
+    def test_no_ids(self):
+        with self.assertRaises(ValueError):
+            STORE().product_infos()
+
+    def test_error_batches_missing(self):
+        responses = [[{"listingId": "1"}, {"articleId": "9"}], {"error": "bad request"}, None]
+
+        result = STORE._merge_product_infos(["1", "2", "3"], ("listingId",), responses)
+
+        self.assertEqual(result, [{"listingId": "1"}, {"articleId": "9"}])
+        self.assertEqual(result.missing, ["2", "3"])
+
+    def test_missing_per_instance(self):
+        first = rewe.ProductInfos()
+        first.missing.append("1")
+
+        self.assertEqual(rewe.ProductInfos().missing, [])
+
+
+class TestCoalescing(MockSessionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.group = rewe.get_singleflight()
+        rewe.set_singleflight()
+
+    def tearDown(self):
+        super().tearDown()
+        rewe.set_singleflight(self.group)
+
+    def test_identical_requests_share_one_call(self):
+        requested = []
+        group = rewe.get_singleflight()
+
+        def handler(request):
+            requested.append(request.url)
+            # hold the response till every other caller is waiting for it
+            while group.shared < 5:
+                sleep(0.01)
+            return TestProductInfos().product_tiles_handler([])(request)
+
+        self.use_handler(handler)
+        store = STORE()
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            futures = [executor.submit(store.product_infos, ["2621809", "265601"]) for _ in range(6)]
+            results = [future.result(timeout=10) for future in futures]
+
+        self.assertEqual(len(requested), 1)
+        self.assertTrue(all(result == results[0] for result in results))
+
+    def test_disabled(self):
+        requested = []
+        self.use_handler(TestProductInfos().product_tiles_handler(requested))
+        rewe.disable_singleflight()
+
+        STORE().product_infos(product_ids=["2621809"])
+
+        self.assertEqual(len(requested), 1)
+
+
+class TestFanOut(MockSessionTestCase):
+    def market_handler(self, requested: list):
+        """every store gets its 'wksMarketsCookie', pages echo the market and the cookie"""
+        products = fake_products_handler(total_pages=2)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("wksmarketsearch/configuration"):
+                store_id = json.loads(request.content)["wwIdent"]
+                return httpx.Response(200, headers={"set-cookie": f"wksMarketsCookie={store_id}; Path=/"})
+
+            if "/marketselection/zipcodes/" in request.url.path:
+                return httpx.Response(
+                    200,
+                    json=[
+                        {"wwIdent": "111", "zipCode": "56073", "pickupVariant": "Abholservice"},
+                        {"wwIdent": "222", "zipCode": "56073", "pickupVariant": "Lieferservice"},
+                    ],
+                )
+
+            requested.append((request.url.params.get("market"), request.headers.get("cookie")))
+            return products(request)
+
+        return handler
+
+    def test_stream_tagged_with_store_id(self):
+        requested = []
+        handler = self.market_handler(requested)
+        self.use_handler(handler)
+
+        with rewe.FanOut(
+            store_ids=["8534540", "1940440"], zipcodes=["56073"], transport=httpx.MockTransport(handler)
+        ) as fan_out:
+            self.assertEqual(fan_out.store_ids, ["8534540", "1940440", "111"])
+
+            results = list(fan_out.run("get_discounted_products", max_page=5))
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual({store_id for store_id, _ in results}, {"8534540", "1940440", "111"})
+        # own cookie context per store
+        for market, cookie in requested:
+            self.assertEqual(cookie, f"wksMarketsCookie={market}")
+
+    def test_failing_store(self):
+        handler = self.market_handler([])
+        self.use_handler(handler)
+
+        with rewe.FanOut(store_ids=["8534540"], transport=httpx.MockTransport(handler)) as fan_out:
+            results = list(fan_out.run("product_infos"))
+
+        self.assertEqual(results, [])
+        self.assertIsInstance(fan_out.errors["8534540"], ValueError)
+
+    def test_unknown_query(self):
+        with self.assertRaises(AttributeError):
+            next(rewe.FanOut(store_ids=["8534540"]).run("no_such_query"))
+
+    def test_close_keeps_transport(self):
+        transport = httpx.MockTransport(self.market_handler([]))
+        self.use_handler(transport.handler)
+
+        with mock.patch.object(transport, "close") as close:
+            with rewe.FanOut(store_ids=["8534540", "1940440"], transport=transport) as fan_out:
+                list(fan_out.run("get_discounted_products", max_page=1))
+                sessions = [fan_out.store(store_id).session for store_id in fan_out.store_ids]
+
+        close.assert_not_called()
+        self.assertTrue(all(session.is_closed for session in sessions))
+
+    def test_from_web_closes_own_client(self):
+        made = httpx.Client(transport=httpx.MockTransport(self.market_handler([])))
+
+        with mock.patch.object(rewe, "make_client", return_value=made):
+            cookies = Config(store_id="1940440").from_web()
+
+        self.assertEqual(cookies, {"wksMarketsCookie": "1940440"})
+        self.assertTrue(made.is_closed)
+
+
 class TestConfig(CustomTestCase):
     def test_from_file(self):
         NotImplemented
@@ -340,8 +806,21 @@ class TestBranch(CustomTestCase):
     """ """
 
 
-class TestBasket(CustomTestCase):
-    """ """
+class TestBasket(MockSessionTestCase):
+    def test_add_not_retried(self):
+        requested = []
+
+        def handler(request):
+            requested.append(request.method)
+            return httpx.Response(503)
+
+        self.use_handler(handler)
+
+        with self.assertRaises(exception.HttpError):
+            next(rewe.Basket().add(["13-4001686301524-4e6503bb"]))
+
+        # the item may be in the basket already
+        self.assertEqual(requested, ["POST"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import unittest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_threads_share_one_call(self):
+        group = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return {"products": [1, 2, 3]}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(group.do, "key", fetch) for _ in range(8)]
+            while group.shared < 7:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(group.stats(), {"calls": 1, "shared": 7, "in_flight": 0})
+
+    def test_error_fans_out(self):
+        group = SingleFlight()
+        release = threading.Event()
+
+        def fetch():
+            release.wait(5)
+            raise ValueError("bad page")
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(group.do, "key", fetch) for _ in range(3)]
+            while group.shared < 2:
+                time.sleep(0.01)
+            release.set()
+
+            for future in futures:
+                with self.assertRaises(ValueError):
+                    future.result()
+
+    def test_sequential_calls_not_shared(self):
+        group = SingleFlight()
+        calls = []
+
+        for _ in range(3):
+            group.do("key", lambda: calls.append(1))
+
+        self.assertEqual(len(calls), 3)
+
+    def test_async(self):
+        group = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "page"
+
+        async def main():
+            return await asyncio.gather(
+                *(group.do_async("key", fetch) for _ in range(5)), group.do_async("other", fetch)
+            )
+
+        self.assertEqual(asyncio.run(main()), ["page"] * 6)
+        self.assertEqual(len(calls), 2)
+
+    def test_async_cancelled_waiter(self):
+        group = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "page"
+
+        async def main():
+            first = asyncio.ensure_future(group.do_async("key", fetch))
+            second = asyncio.ensure_future(group.do_async("key", fetch))
+            await asyncio.sleep(0)
+            first.cancel()
+
+            return await second
+
+        self.assertEqual(asyncio.run(main()), "page")
+
+
+if __name__ == "__main__":
+    unittest.main()
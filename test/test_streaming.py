@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2023-2024 Allen Dema
+from __future__ import annotations
+
+import os
+import sys
+import json
+import logging
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from rewe_dl.streaming import ProductStream, iter_products
+
+log = logging.getLogger(__name__)
+
+
+def search_page(products: int = 20) -> dict:
+    return {
+        "pagination": {"page": 1, "totalPages": 3, "objectsPerPage": products},
+        "facets": [{"name": "brand", "values": [{"name": 'Tricky "}]{[" brand', "count": 2}]}],
+        "_embedded": {
+            "products": [
+                {
+                    "id": str(idx),
+                    "productName": f"Käse \\ {idx} }}",
+                    "_embedded": {
+                        "articles": [{"_embedded": {"listing": {"pricing": {"currentRetailPrice": 199}}}}]
+                    },
+                    "products": [],
+                }
+                for idx in range(products)
+            ]
+        },
+    }
+
+
+def chunked(raw: bytes, size: int):
+    for start in range(0, len(raw), size):
+        yield raw[start : start + size]
+
+
+class ProductStreamTest(unittest.TestCase):
+    def test_items_and_skeleton(self):
+        page = search_page()
+        raw = json.dumps(page, ensure_ascii=False).encode()
+
+        for size in (1, 3, 17, 1024, len(raw)):
+            stream = ProductStream()
+            products = [product for chunk in chunked(raw, size) for product in stream.feed(chunk)]
+
+            self.assertEqual(products, page["_embedded"]["products"])
+            self.assertEqual(stream.count, 20)
+
+            skeleton = stream.close()
+            self.assertEqual(skeleton["pagination"], page["pagination"])
+            self.assertEqual(skeleton["facets"], page["facets"])
+            self.assertEqual(skeleton["_embedded"], {"products": []})
+
+    def test_items_arrive_early(self):
+        raw = json.dumps(search_page(products=2)).encode()
+        second_product = raw.index(b'{"id": "1"')
+
+        stream = ProductStream()
+        products = stream.feed(raw[:second_product])
+
+        self.assertEqual([product["id"] for product in products], ["0"])
+
+    def test_buffer_stays_small(self):
+        raw = json.dumps(search_page(products=500)).encode()
+        stream = ProductStream()
+
+        largest = 0
+        for chunk in chunked(raw, 256):
+            stream.feed(chunk)
+            largest = max(largest, len(stream._buffer))
+
+        self.assertLess(largest, 1024)
+
+    def test_no_products(self):
+        raw = json.dumps({"pagination": {"totalPages": 0}, "_embedded": {"products": []}}).encode()
+        page = {}
+
+        self.assertEqual(list(iter_products([raw], page=page)), [])
+        self.assertEqual(page["pagination"], {"totalPages": 0})
+
+    def test_incomplete(self):
+        stream = ProductStream()
+        stream.feed(b'{"_embedded": {"products": [{"id": 1}')
+
+        with self.assertRaises(ValueError):
+            stream.close()
+
+
+if __name__ == "__main__":
+    unittest.main()